@@ -1,6 +1,67 @@
-from django.apps import AppConfig
+from typing import Any, Set
+
+from django.apps import AppConfig, apps
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+EMAIL_INDEX = "auth_user_email_ci_uniq"
+
+# Databases known to have the email index; a missing one is looked up again.
+_indexed: Set[str] = set()
+
+
+def install_email_index(using: str = "default", **kwargs: Any) -> None:
+    """
+    Create the case-insensitive unique index on user emails after `migrate`.
+
+    Users without an email are left out, so any number of them may exist.
+    Fails the migration if existing users share an email regardless of case.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(apps.get_model("auth", "User")._meta.db_table)
+    try:
+        with transaction.atomic(using), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {EMAIL_INDEX} "
+                f"ON {table} (LOWER(email)) WHERE email <> ''"
+            )
+    except IntegrityError as exc:
+        raise CommandError(
+            "Emails are not unique: users share an email regardless of case. "
+            f"Change them and migrate again to create {EMAIL_INDEX}; until then "
+            "registration checks emails with a query."
+        ) from exc
+    _indexed.add(using)
+
+
+def has_email_index(using: str = "default") -> bool:
+    """
+    Return whether the database enforces case-insensitive unique emails.
+    """
+    if using not in _indexed:
+        connection = connections[using]
+        table = apps.get_model("auth", "User")._meta.db_table
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        if EMAIL_INDEX in constraints:
+            _indexed.add(using)
+    return using in _indexed
 
 
 class AccountConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "account"
+
+    def ready(self) -> None:
+        """
+        Revoke a user's tokens when the user changes or is deleted, and
+        index emails whenever the auth tables are migrated.
+        """
+        from django.contrib.auth import get_user_model
+
+        from .authentication import user_deleted, user_saved
+
+        post_save.connect(user_saved, sender=get_user_model())
+        post_delete.connect(user_deleted, sender=get_user_model())
+        post_migrate.connect(install_email_index, sender=apps.get_app_config("auth"))
@@ -0,0 +1,171 @@
+"""
+JWT authentication from token claims, without a user query per request.
+
+Tokens obtained from the API carry the user's username and staff flag next
+to the id, and requests are authenticated as a `TokenUser` built from them.
+Views needing the model instance, to save it as an author, load it with
+`full_user` from a short-lived cache.
+
+Claims stay valid until the token expires, so saving a user's password,
+flags or username, or deleting the user, revokes the tokens issued before:
+the time is recorded in the `AUTH_CACHE_ALIAS` cache, Redis in production,
+and every request checks its token against it. Tokens issued in the same
+second as the revocation are still accepted. While the cache is
+unreachable, and for tokens without the claims, the user is loaded from
+the database as simplejwt's `JWTAuthentication` does.
+"""
+
+import logging
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CLAIMS = ("username", "is_staff")
+
+# Saving any other field, such as `last_login`, leaves the tokens valid.
+REVOKING_FIELDS = {"username", "password", "is_active", "is_staff", "is_superuser"}
+
+
+def set_claims(token: Token, user: Any) -> None:
+    """
+    Add the claims requests are authenticated from to a token.
+    """
+    token["username"] = user.get_username()
+    token["is_staff"] = user.is_staff
+
+
+def revocation_key(user_id: Any) -> str:
+    """
+    Return the cache key of the time a user's tokens were revoked.
+    """
+    return f"auth:revoked:{user_id}"
+
+
+def user_key(user_id: Any) -> str:
+    """
+    Return the cache key of a user's model instance.
+    """
+    return f"auth:user:{user_id}"
+
+
+def is_revoked(token: Token) -> Optional[bool]:
+    """
+    Return whether the token was issued before its user's tokens were revoked.
+
+    Returns None if the revocation list cannot be read.
+    """
+    try:
+        revoked_at = caches[settings.AUTH_CACHE_ALIAS].get(
+            revocation_key(token[api_settings.USER_ID_CLAIM])
+        )
+    except Exception:
+        logger.warning("Cannot read the token revocation list.", exc_info=True)
+        return None
+    return revoked_at is not None and token.get("iat", 0) < revoked_at
+
+
+def revoke_tokens(user_id: Any) -> None:
+    """
+    Revoke the tokens issued to a user so far, and forget the cached user.
+
+    Done right away and again when the transaction commits, so a token
+    obtained from the not yet committed state in between is revoked too.
+    Entries expire with the last refresh token they can apply to.
+    """
+
+    def _revoke() -> None:
+        timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+        try:
+            cache = caches[settings.AUTH_CACHE_ALIAS]
+            cache.set(revocation_key(user_id), int(time.time()), timeout)
+            cache.delete(user_key(user_id))
+        except Exception:
+            logger.error("Cannot revoke the tokens of user %s.", user_id, exc_info=True)
+
+    _revoke()
+    transaction.on_commit(_revoke)
+
+
+def user_saved(
+    sender: Any,
+    instance: Any,
+    created: bool,
+    update_fields: Optional[frozenset] = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Revoke a user's tokens when a field their claims depend on may have changed.
+    """
+    if created:
+        return
+    if update_fields is None or REVOKING_FIELDS & update_fields:
+        revoke_tokens(instance.pk)
+
+
+def user_deleted(sender: Any, instance: Any, **kwargs: Any) -> None:
+    """
+    Revoke the tokens of a deleted user.
+    """
+    revoke_tokens(instance.pk)
+
+
+def full_user(user: Any) -> Any:
+    """
+    Return the model instance of a request user.
+
+    A `TokenUser` is loaded from the cache, or from the database and then
+    kept for `AUTH_USER_CACHE_TIMEOUT` seconds, without its password hash.
+    """
+    if not isinstance(user, TokenUser):
+        return user
+    key = user_key(user.pk)
+    try:
+        cache = caches[settings.AUTH_CACHE_ALIAS]
+        found = cache.get(key)
+    except Exception:
+        cache, found = None, None
+    if found is None:
+        found = User.objects.defer("password").filter(pk=user.pk).first()
+        if found is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if cache is not None:
+            try:
+                cache.set(key, found, settings.AUTH_USER_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    return found
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates requests as a `TokenUser` built from the token's claims.
+    """
+
+    def get_user(self, validated_token: Token) -> Any:
+        """
+        Return the token user if the token is not revoked.
+
+        Falls back to the database lookup of `JWTAuthentication` for tokens
+        without the claims and while the revocation list is unreachable.
+        """
+        if not all(claim in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+        revoked = is_revoked(validated_token)
+        if revoked is None:
+            return super().get_user(validated_token)
+        if revoked:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return api_settings.TOKEN_USER_CLASS(validated_token)
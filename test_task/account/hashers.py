@@ -0,0 +1,62 @@
+"""
+Password hashers with configurable cost, and hashing off the request thread.
+
+`PASSWORD_PBKDF2_ITERATIONS` sets the cost of new hashes; stored hashes
+with another count are upgraded at the user's next login, as Django does
+when its default changes.
+
+With `PASSWORD_HASHING_POOL` set to "thread" or "process", `hash_password`
+runs the hasher in a pool of `PASSWORD_HASHING_WORKERS`, which bounds the
+CPU a burst of signups takes from other requests. A process pool also
+runs hashers that hold the GIL in parallel; PBKDF2 releases it, so
+threads are enough for the default hasher.
+"""
+
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the iterations of `PASSWORD_PBKDF2_ITERATIONS`.
+    """
+
+    iterations = (
+        settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def executor() -> Optional[Executor]:
+    """
+    Return the pool of `PASSWORD_HASHING_POOL`, or None to hash in place.
+    """
+    if settings.PASSWORD_HASHING_POOL == "thread":
+        return ThreadPoolExecutor(
+            settings.PASSWORD_HASHING_WORKERS, thread_name_prefix="password-hashing"
+        )
+    if settings.PASSWORD_HASHING_POOL == "process":
+        # Spawned processes load the settings and hashers themselves.
+        return ProcessPoolExecutor(
+            settings.PASSWORD_HASHING_WORKERS, initializer=django.setup
+        )
+    return None
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a password with the default hasher, in the hashing pool if any.
+    """
+    pool = executor()
+    encoded: str
+    if pool is None:
+        encoded = hashers.make_password(password)
+    else:
+        hasher = hashers.get_hasher()
+        encoded = pool.submit(hasher.encode, password, hasher.salt()).result()
+    return encoded
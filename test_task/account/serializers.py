@@ -1,7 +1,20 @@
-from typing import Any, Dict
+from typing import Any, Dict, cast
 
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .apps import has_email_index
+from .authentication import is_revoked, set_claims
+from .hashers import hash_password
 
 User = get_user_model()
 
@@ -10,7 +23,10 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     """
     Serializer for user registration.
 
-    Validates that the passwords match and that the email is unique.
+    Validates that the passwords match. Emails are unique regardless of
+    case through an index, so a taken email is reported when the insert
+    fails, which also holds for concurrent signups. Where `migrate` could
+    not create the index, emails are looked up before instead.
     """
 
     password = serializers.CharField(
@@ -30,18 +46,82 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Validate that both password fields match and that the email is not already registered.
+        Validate that both password fields match, and that the email is not
+        taken if the database does not check it.
         """
         if data["password"] != data["password2"]:
             raise serializers.ValidationError("The passwords do not match.")
-        if User.objects.filter(email=data["email"]).exists():
+        email = data.get("email")
+        if (
+            email
+            and not has_email_index()
+            and User.objects.filter(email__iexact=email).exists()
+        ):
             raise serializers.ValidationError("Email already registered.")
         return data
 
     def create(self, validated_data: Dict[str, Any]) -> Any:
         """
-        Create a new user with the validated data.
+        Create a new user with the validated data, as `create_user` does.
+
+        The password is hashed by `hash_password`, in the hashing pool if
+        one is configured.
         """
-        validated_data.pop("password2")
-        user = User.objects.create_user(**validated_data)
+        user = User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data.get("email", "")),
+            password=hash_password(validated_data["password"]),
+        )
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            # The username is checked before, so it is taken only by a
+            # concurrent signup.
+            if User.objects.filter(username=user.username).exists():
+                raise serializers.ValidationError(
+                    {"username": ["A user with that username already exists."]}
+                )
+            raise serializers.ValidationError(
+                {drf_settings.NON_FIELD_ERRORS_KEY: ["Email already registered."]}
+            )
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Serializer for obtaining tokens that requests are authenticated from.
+    """
+
+    @classmethod
+    def get_token(cls, user: Any) -> RefreshToken:
+        """
+        Add the username and staff flag to the refresh token and its access tokens.
+        """
+        # simplejwt annotates the `token_class` instance as a plain Token.
+        token = cast(RefreshToken, super().get_token(user))
+        set_claims(token, user)
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Serializer for refreshing tokens, with the claims read from the database.
+
+    Refusing revoked tokens and inactive users here keeps them from getting
+    access tokens issued after the revocation.
+    """
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Refresh with the user's current claims, if the user may still log in.
+        """
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None or not user.is_active or is_revoked(refresh):
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        # Access tokens copy the claims of the refresh token they come from.
+        set_claims(refresh, user)
+        return super().validate({**attrs, "refresh": str(refresh)})
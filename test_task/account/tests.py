@@ -1,8 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Set
+from unittest import mock
+
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from blog import throttling
+from blog.models import Post
+
+from . import hashers
+from .apps import EMAIL_INDEX, has_email_index, install_email_index
+from .serializers import ClaimsTokenObtainPairSerializer
 
 
 class UserCreateViewTest(APITestCase):
@@ -39,6 +56,73 @@ class UserCreateViewTest(APITestCase):
         response: Response = self.client.post(self.url, self.invalid_payload)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_emails_are_unique_regardless_of_case(self) -> None:
+        """
+        The email index refuses an email differing only in case.
+        """
+        response: Response = self.client.post(self.url, self.valid_payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payload = {
+            **self.valid_payload,
+            "username": "otheruser",
+            "email": "TestUser@Example.com",
+        }
+        response = self.client.post(self.url, payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"non_field_errors": ["Email already registered."]}
+        )
+        self.assertFalse(User.objects.filter(username="otheruser").exists())
+
+        # Users without an email are not indexed.
+        User.objects.create_user(username="noemail1")
+        User.objects.create_user(username="noemail2")
+
+    def test_emails_are_checked_without_the_index(self) -> None:
+        """
+        Without the email index, registration looks emails up instead, and
+        migrating reports the duplicates that keep it from being created.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX {EMAIL_INDEX}")
+        unknown: Set[str] = set()
+        indexed = mock.patch("account.apps._indexed", unknown)
+        indexed.start()
+        self.addCleanup(indexed.stop)
+        response: Response = self.client.post(self.url, self.valid_payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payload = {
+            **self.valid_payload,
+            "username": "otheruser",
+            "email": "TestUser@Example.com",
+        }
+        response = self.client.post(self.url, payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"non_field_errors": ["Email already registered."]}
+        )
+
+        User.objects.create_user(username="otheruser", email="TESTUSER@example.com")
+        with self.assertRaises(CommandError):
+            install_email_index()
+        self.assertFalse(has_email_index())
+
+    def test_passwords_are_hashed_in_the_pool(self) -> None:
+        """
+        With a hashing pool, the password is hashed there and verifies.
+        """
+        pool = ThreadPoolExecutor(1)
+        self.addCleanup(pool.shutdown)
+        with mock.patch.object(
+            hashers, "executor", return_value=pool
+        ), mock.patch.object(pool, "submit", wraps=pool.submit) as submit:
+            response: Response = self.client.post(self.url, self.valid_payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submit.assert_called_once()
+        user = User.objects.get(username="testuser")
+        self.assertTrue(user.check_password(self.valid_payload["password"]))
+        self.assertEqual(user.email, "testuser@example.com")
+
     def test_create_user_authenticated(self) -> None:
         """
         Test that an authenticated user cannot create a new user.
@@ -48,3 +132,173 @@ class UserCreateViewTest(APITestCase):
         )
         response: Response = self.client.post(self.url, self.valid_payload)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_registrations_are_throttled_per_address(self) -> None:
+        """
+        An address registering too often is refused until its bucket refills.
+        """
+        rates = {"register_ip": "2/min"}
+        with mock.patch.object(
+            throttling, "local_buckets", throttling.LocalBuckets()
+        ), mock.patch.dict(throttling.RegisterIPThrottle.THROTTLE_RATES, rates):
+            for num in range(2):
+                payload = {
+                    **self.valid_payload,
+                    "username": f"user{num}",
+                    "email": f"user{num}@example.com",
+                }
+                response: Response = self.client.post(self.url, payload)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.post(self.url, self.valid_payload)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # Hashing the passwords takes a while, which refills the bucket.
+            self.assertIn(int(response["Retry-After"]), range(1, 31))
+
+            response = self.client.post(
+                self.url, self.valid_payload, REMOTE_ADDR="10.0.0.2"
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ClaimsAuthenticationTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a user and a staff user, and forget cached users and revocations.
+        """
+        caches["default"].clear()
+        self.user = User.objects.create_user(username="writer", password="pass")
+        self.staff = User.objects.create_user(
+            username="staff", password="pass", is_staff=True
+        )
+        self.post = Post.objects.create(
+            title="Post", slug="post", body="Body", author=self.user, status="PB"
+        )
+
+    def tokens(self, user: User, age: timedelta = timedelta()) -> RefreshToken:
+        """
+        Return a refresh token with claims for the user, issued `age` ago.
+        """
+        refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+        refresh.set_iat(at_time=refresh.current_time - age)
+        return refresh
+
+    def auth(self, token: AccessToken) -> Dict[str, str]:
+        """
+        Return the Authorization header of an access token.
+        """
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def test_obtained_tokens_carry_claims(self) -> None:
+        """
+        Tokens from the login endpoint carry the username and staff flag.
+        """
+        response: Response = self.client.post(
+            reverse("token_obtain_pair"), {"username": "staff", "password": "pass"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["username"], "staff")
+        self.assertTrue(access["is_staff"])
+
+    def test_requests_do_not_load_the_user(self) -> None:
+        """
+        Authenticated requests run no user query; writes load it once.
+        """
+        access = self.tokens(self.staff).access_token
+        url = reverse("post-detail", kwargs={"slug": self.post.slug})
+        with CaptureQueriesContext(connection) as queries:
+            response: Response = self.client.patch(
+                url, {"title": "Edited by staff"}, **self.auth(access)
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('FROM "auth_user"' in q["sql"] for q in queries))
+
+        access = self.tokens(self.user).access_token
+        for num in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    reverse("comment-list"),
+                    {"post": self.post.pk, "body": f"Comment {num}"},
+                    **self.auth(access),
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data["author"], self.user.pk)
+            loaded = any('FROM "auth_user"' in q["sql"] for q in queries)
+            self.assertEqual(loaded, num == 0)
+
+    def test_claims_decide_permissions(self) -> None:
+        """
+        Ownership and the staff flag are read from the claims.
+        """
+        other = User.objects.create_user(username="other", password="pass")
+        url = reverse("post-detail", kwargs={"slug": self.post.slug})
+        response: Response = self.client.patch(
+            url, {"title": "Taken"}, **self.auth(self.tokens(other).access_token)
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.patch(
+            url, {"title": "Mine"}, **self.auth(self.tokens(self.user).access_token)
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_changed_users_are_revoked(self) -> None:
+        """
+        Tokens issued before a user is deactivated or demoted are refused.
+        """
+        refresh = self.tokens(self.staff, timedelta(minutes=1))
+        self.staff.is_staff = False
+        self.staff.save()
+
+        url = reverse("post-detail", kwargs={"slug": self.post.slug})
+        response: Response = self.client.patch(
+            url, {"title": "Edited"}, **self.auth(refresh.access_token)
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Logging in again gives tokens with the current claims.
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"username": "staff", "password": "pass"}
+        )
+        self.assertFalse(AccessToken(response.data["access"])["is_staff"])
+        response = self.client.patch(
+            url,
+            {"title": "Edited"},
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access']}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Saving other fields, as logging in does, revokes nothing.
+        refresh = self.tokens(self.user, timedelta(minutes=1))
+        self.user.save(update_fields=["last_login"])
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data["access"])["username"], "writer")
+
+    def test_tokens_without_claims_load_the_user(self) -> None:
+        """
+        Tokens issued without the claims are checked against the database.
+        """
+        access = RefreshToken.for_user(self.user).access_token  # type: ignore[attr-defined]
+        url = reverse("comment-list")
+        response: Response = self.client.get(url, **self.auth(access))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(url, **self.auth(access))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unreachable_revocation_list_loads_the_user(self) -> None:
+        """
+        Without the revocation list, users are checked against the database.
+        """
+        access = self.tokens(self.user).access_token
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with mock.patch.object(
+            caches["default"], "get", side_effect=ConnectionError
+        ), self.assertLogs("account.authentication", "WARNING"):
+            response: Response = self.client.get(
+                reverse("comment-list"), **self.auth(access)
+            )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -5,6 +5,8 @@ from rest_framework import generics, status
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from blog.throttling import RegisterIPThrottle
+
 from .permissions import IsNotAuthenticated
 from .serializers import UserRegisterSerializer
 
@@ -19,6 +21,7 @@ class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegisterSerializer
     permission_classes = [IsNotAuthenticated]
+    throttle_classes = [RegisterIPThrottle]
 
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
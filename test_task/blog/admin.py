@@ -1,14 +1,26 @@
 from django.contrib import admin
 
-from blog.models import Comment, Post
+from blog.models import Comment, CommentDailyStats, Post
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ("id", "title", "slug", "author", "status")
+    list_select_related = ("author",)
     prepopulated_fields = {"slug": ("title",)}
 
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ("id", "post", "author")
+    list_display = ("id", "post", "author", "moderation")
+    list_select_related = ("post", "author")
+    list_filter = ("moderation",)
+    # The default selects would render every post, user and comment.
+    raw_id_fields = ("post", "author", "parent")
+
+
+@admin.register(CommentDailyStats)
+class CommentDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ("day", "post", "created_count", "blocked_count")
+    list_select_related = ("post",)
+    list_filter = ("day",)
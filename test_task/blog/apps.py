@@ -1,6 +1,24 @@
+from typing import Any
+
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search(using: str = "default", **kwargs: Any) -> None:
+    """
+    Create the full-text search tables or indexes after `migrate`.
+    """
+    from . import search
+
+    search.install(using)
 
 
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
+
+    def ready(self) -> None:
+        """
+        Install the search index whenever the app's tables are migrated.
+        """
+        post_migrate.connect(install_search, sender=self)
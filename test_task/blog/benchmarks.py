@@ -0,0 +1,217 @@
+"""
+Shared helpers of the benchmark commands.
+
+The commands write their results as JSON with the environment they ran in,
+so runs on two commits can be compared with `--compare`.
+"""
+
+import http.client
+import json
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.db import connections
+
+from .profanity import profanity_filter
+
+VOCABULARY = (
+    "the post about travelling with a dog through the mountains was great and "
+    "everyone in the comments shared their own stories photos tips and questions "
+    "about food weather hotels trains prices and the best time of the year"
+).split()
+
+# Method, path with query, body and headers of one HTTP request.
+HttpRequest = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+def make_body(size: int, seed: int = 0) -> str:
+    """
+    Build a clean body of roughly ``size`` characters from ordinary words.
+    """
+    rnd = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rnd.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def make_comment_body(rnd: random.Random, profane: bool = False) -> str:
+    """
+    Build a comment of 5 to 60 words, with one word from the wordlist if profane.
+    """
+    words = rnd.choices(VOCABULARY, k=rnd.randint(5, 60))
+    if profane:
+        words.insert(rnd.randrange(len(words)), rnd.choice(profanity_filter.words))
+    return " ".join(words)
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """
+    Summarize timings in milliseconds.
+    """
+    ordered = sorted(seconds)
+
+    def percentile(fraction: float) -> float:
+        return ordered[int((len(ordered) - 1) * fraction)] * 1000
+
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def hammer(
+    netloc: str, deadline: float, next_request: Callable[[], HttpRequest]
+) -> Tuple[List[float], int]:
+    """
+    Send requests over one keep-alive connection until the deadline.
+
+    Returns the latency of every successful request and the number of failed
+    ones. The connection is reopened after an error or a server-side close.
+    """
+    latencies: List[float] = []
+    errors = 0
+    conn = http.client.HTTPConnection(netloc, timeout=30)
+    while time.perf_counter() < deadline:
+        method, target, body, headers = next_request()
+        started = time.perf_counter()
+        try:
+            conn.request(method, target, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(netloc, timeout=30)
+            continue
+        if response.status >= 400:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        if response.will_close:
+            conn.close()
+    conn.close()
+    return latencies, errors
+
+
+def run_load(
+    netloc: str,
+    client_requests: Callable[[int], Callable[[], HttpRequest]],
+    concurrency: int,
+    duration: float,
+) -> Dict[str, float]:
+    """
+    Run concurrent clients for a duration and summarize their latencies.
+
+    `client_requests(index)` returns the request source of one client, so
+    clients can number requests, such as registered usernames, on their own.
+    """
+    results: List[Tuple[List[float], int]] = []
+    deadline = time.perf_counter() + duration
+
+    def client(index: int) -> None:
+        results.append(hammer(netloc, deadline, client_requests(index)))
+
+    threads = [
+        threading.Thread(target=client, args=(index,)) for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = [value for result in results for value in result[0]]
+    errors = sum(result[1] for result in results)
+    summary: Dict[str, float] = {"errors": errors, "rps": len(latencies) / duration}
+    if latencies:
+        summary.update(summarize(latencies))
+    return summary
+
+
+def metadata(**extra: Any) -> Dict[str, Any]:
+    """
+    Describe the code and environment a benchmark ran in.
+    """
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connections["default"].vendor,
+        "machine": platform.machine(),
+        **extra,
+    }
+
+
+def write_results(
+    path: str, meta: Dict[str, Any], results: Dict[str, Dict[str, float]]
+) -> None:
+    """
+    Write the results as JSON, keyed by benchmark name.
+    """
+    with open(path, "w") as file:
+        json.dump({"meta": meta, "results": results}, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def format_table(
+    results: Dict[str, Dict[str, float]],
+    columns: List[str],
+    baseline: Optional[Dict[str, Any]] = None,
+    key: str = "median_ms",
+) -> str:
+    """
+    Format the results as a table, with the change of `key` against a baseline.
+    """
+    width = max([len("benchmark")] + [len(name) for name in results])
+    header = f"{'benchmark':<{width}}" + "".join(f" {column:>11}" for column in columns)
+    if baseline is not None:
+        header += f" {'base ' + key:>16} {'change':>8}"
+    lines = [header]
+    for name, result in results.items():
+        line = f"{name:<{width}}" + "".join(
+            f" {result.get(column, float('nan')):>11.2f}" for column in columns
+        )
+        if baseline is not None:
+            before = baseline["results"].get(name, {}).get(key)
+            if before and key in result:
+                change = (result[key] - before) / before * 100
+                line += f" {before:>16.2f} {change:>+7.1f}%"
+            else:
+                line += f" {'-':>16} {'-':>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """
+    Read results written by `write_results`.
+    """
+    with open(path) as file:
+        data: Dict[str, Any] = json.load(file)
+    return data
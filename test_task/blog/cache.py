@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+POST_LIST = "post-list"
+
+# Every payload depends on this scope; it is bumped when the shared cache
+# comes back from an outage.
+ALL = "all"
+
+_outage_lock = threading.Lock()
+_down_until: Optional[float] = None
+
+
+def post_scope(slug: str) -> str:
+    """
+    Return the version scope of one post's detail payload.
+    """
+    return f"post:{slug}"
+
+
+def _call(method: str, *args: Any) -> Any:
+    """
+    Call a method on the shared response cache, or on the local one while it fails.
+
+    The shared cache is Redis in production; if it is unreachable the process
+    serves from, and invalidates, its own in-memory cache, and tries the
+    shared one again every `RESPONSE_CACHE_RETRY_AFTER` seconds. Bumps made
+    in the meantime never reached it, so the `ALL` scope is bumped there
+    before it is used again.
+    """
+    global _down_until
+    if _down_until is not None and time.monotonic() < _down_until:
+        return getattr(caches["local"], method)(*args)
+    try:
+        shared = caches[settings.RESPONSE_CACHE_ALIAS]
+        if _down_until is not None:
+            shared.set(f"version:{ALL}", time.time(), None)
+            _down_until = None
+        return getattr(shared, method)(*args)
+    except Exception:
+        with _outage_lock:
+            if _down_until is None:
+                # Versions left from an earlier outage are out of date.
+                caches["local"].clear()
+            _down_until = time.monotonic() + settings.RESPONSE_CACHE_RETRY_AFTER
+        return getattr(caches["local"], method)(*args)
+
+
+def get_versions(scopes: Iterable[str]) -> List[float]:
+    """
+    Return the version of each scope, starting unknown scopes at the current time.
+
+    Versions are the timestamps of the last change, so they double as the
+    `Last-Modified` date of every payload built from them. The version of
+    `ALL` comes first.
+    """
+    keys = [f"version:{scope}" for scope in (ALL, *scopes)]
+    found: Dict[str, float] = _call("get_many", keys)
+    missing = [key for key in keys if key not in found]
+    now = time.time()
+    if missing:
+        # `add` never overwrites a version bumped in the meantime.
+        for key in missing:
+            _call("add", key, now, None)
+        found.update(_call("get_many", missing))
+    return [found.get(key, now) for key in keys]
+
+
+def bump(*scopes: str) -> None:
+    """
+    Invalidate every cached payload built under the given scopes.
+
+    The versions are bumped right away and again when the transaction
+    commits, so a read that rebuilt a payload from the not yet committed
+    state in between is not served afterwards.
+    """
+
+    def _bump() -> None:
+        now = time.time()
+        _call("set_many", {f"version:{scope}": now for scope in scopes}, None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def cached_response(
+    request: Request,
+    scopes: List[str],
+    build: Callable[[], Response],
+    store: Callable[[Response], bool] = lambda response: True,
+) -> Response:
+    """
+    Serve an anonymous GET from the versioned cache, with conditional headers.
+
+    The cache key combines the request URL, host and scheme included since
+    payloads hold absolute links, with the versions of the scopes, so a write
+    bumping any scope makes the old entries unreachable. The ETag is derived
+    from that key, so a client revalidating with `If-None-Match` gets a 304
+    without the payload being read or built. `If-Modified-Since` alone is
+    not honoured: its whole seconds cannot tell a write in the same second
+    as the cached payload. `store` decides whether a built response is cached.
+    """
+    if request.method != "GET" or request.user.is_authenticated:
+        return build()
+
+    key, etag, last_modified = _validators(request, get_versions(scopes))
+    if _is_not_modified(request, etag):
+        return _with_validators(Response(status=304), etag, last_modified)
+
+    data: Optional[Any] = _call("get", key)
+    if data is None:
+        response = build()
+        if response.status_code != 200 or not store(response):
+            return response
+        _call("set", key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        data = response.data
+    return _with_validators(Response(data), etag, last_modified)
+
+
+async def acached_response(
+    request: Request,
+    scopes: List[str],
+    build: Callable[[], Awaitable[Response]],
+    store: Callable[[Response], bool] = lambda response: True,
+) -> Response:
+    """
+    Serve an anonymous GET from the versioned cache, for async views.
+
+    Behaves like `cached_response`; the cache calls run in a worker thread.
+    """
+    if request.method != "GET" or request.user.is_authenticated:
+        return await build()
+
+    versions = await sync_to_async(get_versions)(scopes)
+    key, etag, last_modified = _validators(request, versions)
+    if _is_not_modified(request, etag):
+        return _with_validators(Response(status=304), etag, last_modified)
+
+    data: Optional[Any] = await sync_to_async(_call)("get", key)
+    if data is None:
+        response = await build()
+        if response.status_code != 200 or not store(response):
+            return response
+        await sync_to_async(_call)(
+            "set", key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+        )
+        data = response.data
+    return _with_validators(Response(data), etag, last_modified)
+
+
+def _validators(request: Request, versions: List[float]) -> Tuple[str, str, int]:
+    """
+    Return the cache key, ETag and Last-Modified timestamp of a request.
+    """
+    query = sorted(request.query_params.lists())
+    raw_key = (
+        f"{request.scheme}://{request.get_host()}{request.path}:{query}:{versions}"
+    )
+    digest = hashlib.sha1(raw_key.encode()).hexdigest()
+    return f"response:{digest}", f'"{digest}"', int(max(versions))
+
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Return True if the client's ETag matches the current payload.
+    """
+    return get_conditional_response(request, etag=etag) is not None
+
+
+def _with_validators(response: Response, etag: str, last_modified: int) -> Response:
+    """
+    Attach the ETag, Last-Modified and revalidation headers to a response.
+    """
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "public, no-cache"
+    return response
@@ -0,0 +1,75 @@
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List
+
+import orjson
+from django.db.models import Q, QuerySet
+
+from .renderers import ORJSONRenderer
+from .serializers import CommentListSerializer
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_comment_chunks(
+    queryset: QuerySet, chunk_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the comments as `CommentListSerializer` rows, oldest first, in chunks.
+
+    Every chunk is a separate keyset query after the `(created, id)` of the
+    previous one, bounded by `created >= c` so the index scan starts there.
+    Memory stays at one chunk however many rows match, and no cursor or
+    transaction stays open while a slow client reads the stream, which
+    PgBouncer in transaction mode would not allow anyway.
+    """
+    queryset = CommentListSerializer.values(queryset.order_by("created", "id"))
+    page = queryset
+    while True:
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        # `represent` formats the rows in place, so keep the raw position.
+        created, pk = rows[-1]["created"], rows[-1]["id"]
+        yield CommentListSerializer.represent(rows)
+        if len(rows) < chunk_size:
+            return
+        page = queryset.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=pk),
+            created__gte=created,
+        )
+
+
+def ndjson_lines(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """
+    Encode each chunk of rows as JSON lines.
+    """
+    default = ORJSONRenderer.encoder_class().default
+    for rows in chunks:
+        yield b"".join(
+            orjson.dumps(row, default=default, option=orjson.OPT_APPEND_NEWLINE)
+            for row in rows
+        )
+
+
+def csv_lines(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """
+    Encode each chunk of rows as CSV, after a header line.
+    """
+    fields = CommentListSerializer.Meta.fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in chunks:
+        writer.writerows([row[field] for field in fields] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+WRITERS = {"ndjson": ndjson_lines, "csv": csv_lines}
@@ -0,0 +1,90 @@
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from blog.models import Comment, CommentDailyStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily comment rollup from comments."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rollup rows written per INSERT.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Recount approved and blocked comments per post and day in the current
+        time zone.
+
+        Comments blocked by `moderate_comments` are stored and counted from
+        their rows. Comments rejected on save are never stored, so a recorded
+        `blocked_count` is never lowered; pending comments are not counted.
+        """
+        counts = (
+            Comment.objects.exclude(moderation=Comment.Moderation.PENDING)
+            .annotate(day=TruncDate("created", tzinfo=timezone.get_current_timezone()))
+            .values("post_id", "day")
+            .annotate(
+                created=Count("id", filter=Q(moderation=Comment.Moderation.APPROVED)),
+                blocked=Count("id", filter=Q(moderation=Comment.Moderation.BLOCKED)),
+            )
+            .order_by()
+        )
+        batch_size = options["batch_size"]
+        written = 0
+        batch: List[CommentDailyStats] = []
+
+        with transaction.atomic():
+            CommentDailyStats.objects.update(created_count=0)
+            for row in counts.iterator(chunk_size=batch_size):
+                batch.append(
+                    CommentDailyStats(
+                        post_id=row["post_id"],
+                        day=row["day"],
+                        created_count=row["created"],
+                        blocked_count=row["blocked"],
+                    )
+                )
+                if len(batch) >= batch_size:
+                    written += self._upsert(batch)
+                    batch = []
+            written += self._upsert(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled {written} daily rollup rows.")
+        )
+
+    @staticmethod
+    def _upsert(rows: List[CommentDailyStats]) -> int:
+        """
+        Insert the rows, overwriting the counts where the post and day exist.
+
+        Blocked counts are raised to the stored blocked comments, never lowered.
+        """
+        recorded = {
+            (post_id, day): blocked
+            for post_id, day, blocked in CommentDailyStats.objects.filter(
+                post_id__in={row.post_id for row in rows},
+                day__in={row.day for row in rows},
+            ).values_list("post_id", "day", "blocked_count")
+        }
+        for row in rows:
+            row.blocked_count = max(
+                row.blocked_count, recorded.get((row.post_id, row.day), 0)
+            )
+        CommentDailyStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["post", "day"],
+            update_fields=["created_count", "blocked_count"],
+        )
+        return len(rows)
@@ -0,0 +1,165 @@
+import random
+import timeit
+from datetime import timedelta
+from typing import Any, Callable, Dict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from account.authentication import ClaimsJWTAuthentication
+from account.serializers import ClaimsTokenObtainPairSerializer
+from blog import export, search
+from blog.benchmarks import (
+    format_table,
+    load_results,
+    make_comment_body,
+    metadata,
+    summarize,
+    write_results,
+)
+from blog.models import Comment, Post, check_swearing_many
+from blog.profanity import profanity_filter, verdict_cache
+from blog.renderers import ORJSONRenderer
+from blog.serializers import (
+    CommentListSerializer,
+    CommentSerializer,
+    PostListSerializer,
+    PostSerializer,
+    build_comment_thread,
+)
+
+
+class Command(BaseCommand):
+    help = "Run the micro-benchmarks against the current database."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Timed runs per benchmark."
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            default=[],
+            help="Run only the benchmarks whose names start with these prefixes.",
+        )
+        parser.add_argument(
+            "--corpus",
+            type=int,
+            default=1000,
+            help="Comment bodies screened per profanity run.",
+        )
+        parser.add_argument(
+            "--profane-fraction", type=float, default=0.03, help="Profane bodies."
+        )
+        parser.add_argument("--output", help="Write the results as JSON to a file.")
+        parser.add_argument(
+            "--compare", help="Show the change against results from an earlier run."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Time every benchmark on the data in the database.
+
+        Load data with `seed_bench_data` first. Each run is timed on its own
+        and summarized; compare the JSON output of two commits with
+        `--compare`, preferably on the same data and machine.
+        """
+        post = (
+            Post.published.annotate(total=Count("comments")).order_by("-total").first()
+        )
+        if post is None or not post.total:
+            raise CommandError("No comments to benchmark; run seed_bench_data first.")
+
+        results: Dict[str, Dict[str, float]] = {}
+        for name, case in self.cases(post, options).items():
+            if options["only"] and not name.startswith(tuple(options["only"])):
+                continue
+            case()
+            results[name] = summarize(
+                timeit.repeat(case, number=1, repeat=options["repeat"])
+            )
+
+        baseline = load_results(options["compare"]) if options["compare"] else None
+        self.stdout.write(
+            format_table(results, ["median_ms", "p90_ms", "min_ms"], baseline)
+        )
+        if options["output"]:
+            meta = metadata(
+                posts=Post.objects.count(),
+                comments=Comment.objects.count(),
+                repeat=options["repeat"],
+            )
+            write_results(options["output"], meta, results)
+
+    def cases(
+        self, post: Post, options: Dict[str, Any]
+    ) -> Dict[str, Callable[[], Any]]:
+        """
+        Return the benchmarks by name.
+
+        The date range cases read the last week of the busiest post, and
+        the authentication cases authenticate 100 requests of its author.
+        """
+        rnd = random.Random(0)
+        corpus = [
+            make_comment_body(rnd, profane=rnd.random() < options["profane_fraction"])
+            for _ in range(options["corpus"])
+        ]
+        verdict_cache.contains_profanity_many(corpus)
+
+        today = timezone.localdate()
+        week = Comment.objects.filter(post=post).created_between(
+            today - timedelta(days=6), today
+        )
+        posts = Post.published.all()[:100]
+        comments = Comment.objects.filter(post=post)[:100]
+        user = post.author or get_user_model().objects.first()
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        request = APIRequestFactory().get(
+            "/v1/comments/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        return {
+            "profanity.scan": lambda: [
+                profanity_filter.contains_profanity(body) for body in corpus
+            ],
+            "profanity.check_swearing_many.cached": lambda: check_swearing_many(corpus),
+            "serializers.posts.full": lambda: JSONRenderer().render(
+                PostSerializer(posts, many=True).data
+            ),
+            "serializers.posts.lean": lambda: ORJSONRenderer().render(
+                PostListSerializer.represent(list(PostListSerializer.values(posts)))
+            ),
+            "serializers.comments.full": lambda: JSONRenderer().render(
+                CommentSerializer(comments, many=True).data
+            ),
+            "serializers.comments.lean": lambda: ORJSONRenderer().render(
+                CommentListSerializer.represent(
+                    list(CommentListSerializer.values(comments))
+                )
+            ),
+            "comments_in_date_range.query": lambda: ORJSONRenderer().render(
+                CommentSerializer(list(week), many=True).data
+            ),
+            "comments_in_date_range.export_csv": lambda: sum(
+                len(chunk)
+                for chunk in export.csv_lines(export.iter_comment_chunks(week, 2000))
+            ),
+            "thread.depth5": lambda: build_comment_thread(
+                Comment.objects.filter(post=post).thread(max_depth=5), None, 20
+            ),
+            "search.comments": lambda: search.search_comments(
+                "mountains dog", limit=11
+            ),
+            "auth.jwt.database": lambda: [
+                JWTAuthentication().authenticate(request) for _ in range(100)
+            ],
+            "auth.jwt.claims": lambda: [
+                ClaimsJWTAuthentication().authenticate(request) for _ in range(100)
+            ],
+        }
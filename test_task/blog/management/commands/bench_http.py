@@ -0,0 +1,65 @@
+from typing import Any, Callable, Dict
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from blog.benchmarks import HttpRequest, run_load
+
+
+class Command(BaseCommand):
+    help = "Measure requests per second and latency of a running server."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("urls", nargs="+", help="Absolute URLs to request.")
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent clients."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10.0, help="Seconds per URL."
+        )
+        parser.add_argument(
+            "--header",
+            action="append",
+            default=[],
+            help="Request header as 'Name: value', may be repeated.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Load each URL in turn with concurrent keep-alive clients.
+        """
+        headers: Dict[str, str] = dict(
+            (name.strip(), value.strip())
+            for name, value in (header.split(":", 1) for header in options["header"])
+        )
+        self.stdout.write(
+            f"{'url':<50} {'req/s':>9} {'p50':>9} {'p99':>9} {'errors':>7}"
+        )
+        for url in options["urls"]:
+            parts = urlsplit(url)
+            request: HttpRequest = (
+                "GET",
+                parts.path + (f"?{parts.query}" if parts.query else ""),
+                None,
+                headers,
+            )
+
+            def client_requests(index: int) -> Callable[[], HttpRequest]:
+                return lambda: request
+
+            summary = run_load(
+                parts.netloc,
+                client_requests,
+                options["concurrency"],
+                options["duration"],
+            )
+            if "median_ms" not in summary:
+                self.stdout.write(
+                    f"{url:<50} {'-':>9} {'-':>9} {'-':>9} {summary['errors']:>7}"
+                )
+                continue
+            self.stdout.write(
+                f"{url:<50} {summary['rps']:>9.0f} "
+                f"{summary['median_ms']:>7.1f}ms {summary['p99_ms']:>7.1f}ms "
+                f"{summary['errors']:>7}"
+            )
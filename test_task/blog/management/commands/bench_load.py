@@ -0,0 +1,217 @@
+import itertools
+import json
+import random
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from blog.benchmarks import (
+    HttpRequest,
+    format_table,
+    load_results,
+    make_body,
+    make_comment_body,
+    metadata,
+    run_load,
+    write_results,
+)
+
+SCENARIOS = ["post_list", "post_detail", "comment", "token", "register"]
+PASSWORD = "bench-Load-password-1"
+
+
+class Command(BaseCommand):
+    help = "Load a running server with the main API scenarios."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--base-url", default="http://127.0.0.1:8000", help="Server to load."
+        )
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            choices=SCENARIOS,
+            default=SCENARIOS,
+            help="Scenarios to run, in order.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent clients."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10.0, help="Seconds per scenario."
+        )
+        parser.add_argument(
+            "--profane-fraction",
+            type=float,
+            default=0.03,
+            help="Share of posted comments that are profane.",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to a file.")
+        parser.add_argument(
+            "--compare", help="Show the change against results from an earlier run."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Run each scenario in turn with concurrent keep-alive clients.
+
+        A user and a post are created through the API first, so any server
+        can be loaded, including one with a seeded database. Profane
+        comments are rejected by the server and counted as errors.
+        """
+        self.base_url = options["base_url"].rstrip("/")
+        self.run = f"{int(time.time())}"
+        username = f"load{self.run}"
+        self.call(
+            "/v1/api/register/",
+            {
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": PASSWORD,
+                "password2": PASSWORD,
+            },
+        )
+        self.credentials = {"username": username, "password": PASSWORD}
+        self.access = self.call("/v1/api/token/", self.credentials)["access"]
+        self.post = self.call(
+            "/v1/posts/",
+            {
+                "title": f"Load test {self.run}",
+                "slug": f"load-test-{self.run}",
+                "body": make_body(2000),
+                "status": "PB",
+            },
+            self.access,
+        )
+
+        results: Dict[str, Dict[str, float]] = {}
+        for scenario in options["scenarios"]:
+            results[scenario] = run_load(
+                urlsplit(self.base_url).netloc,
+                getattr(self, f"scenario_{scenario}")(options),
+                options["concurrency"],
+                options["duration"],
+            )
+
+        baseline = load_results(options["compare"]) if options["compare"] else None
+        self.stdout.write(
+            format_table(results, ["rps", "median_ms", "p99_ms", "errors"], baseline)
+        )
+        if options["output"]:
+            meta = metadata(
+                base_url=self.base_url,
+                concurrency=options["concurrency"],
+                duration=options["duration"],
+            )
+            write_results(options["output"], meta, results)
+
+    def call(
+        self, path: str, payload: Dict[str, Any], access: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        POST a JSON payload and return the decoded response.
+        """
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode(),
+            headers=self.headers(access),
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data: Dict[str, Any] = json.loads(response.read())
+        return data
+
+    def headers(self, access: Optional[str] = None) -> Dict[str, str]:
+        """
+        Return the headers of a JSON request, authenticated if a token is given.
+        """
+        headers = {"Content-Type": "application/json"}
+        if access:
+            headers["Authorization"] = f"Bearer {access}"
+        return headers
+
+    def scenario_post_list(
+        self, options: Dict[str, Any]
+    ) -> Callable[[int], Callable[[], HttpRequest]]:
+        """
+        Read the first page of posts anonymously.
+        """
+        request: HttpRequest = ("GET", "/v1/posts/", None, {})
+        return lambda index: lambda: request
+
+    def scenario_post_detail(
+        self, options: Dict[str, Any]
+    ) -> Callable[[int], Callable[[], HttpRequest]]:
+        """
+        Read the setup post with its first page of comments.
+        """
+        request: HttpRequest = ("GET", f"/v1/posts/{self.post['slug']}/", None, {})
+        return lambda index: lambda: request
+
+    def scenario_comment(
+        self, options: Dict[str, Any]
+    ) -> Callable[[int], Callable[[], HttpRequest]]:
+        """
+        Comment on the setup post as the setup user.
+        """
+        headers = self.headers(self.access)
+
+        def client_requests(index: int) -> Callable[[], HttpRequest]:
+            rnd = random.Random(index)
+
+            def next_request() -> HttpRequest:
+                body = make_comment_body(
+                    rnd, profane=rnd.random() < options["profane_fraction"]
+                )
+                payload = {"post": self.post["id"], "body": body}
+                return ("POST", "/v1/comments/", json.dumps(payload).encode(), headers)
+
+            return next_request
+
+        return client_requests
+
+    def scenario_token(
+        self, options: Dict[str, Any]
+    ) -> Callable[[int], Callable[[], HttpRequest]]:
+        """
+        Obtain tokens for the setup user, which hashes the password every time.
+        """
+        request: HttpRequest = (
+            "POST",
+            "/v1/api/token/",
+            json.dumps(self.credentials).encode(),
+            self.headers(),
+        )
+        return lambda index: lambda: request
+
+    def scenario_register(
+        self, options: Dict[str, Any]
+    ) -> Callable[[int], Callable[[], HttpRequest]]:
+        """
+        Register a new user with every request.
+        """
+        headers = self.headers()
+
+        def client_requests(index: int) -> Callable[[], HttpRequest]:
+            numbers = itertools.count()
+
+            def next_request() -> HttpRequest:
+                username = f"load{self.run}c{index}n{next(numbers)}"
+                payload = {
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "password": PASSWORD,
+                    "password2": PASSWORD,
+                }
+                return (
+                    "POST",
+                    "/v1/api/register/",
+                    json.dumps(payload).encode(),
+                    headers,
+                )
+
+            return next_request
+
+        return client_requests
@@ -0,0 +1,55 @@
+import timeit
+from typing import Any
+
+from better_profanity import profanity
+from django.core.management.base import BaseCommand, CommandParser
+
+from blog.benchmarks import make_body
+from blog.profanity import profanity_filter
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled profanity filter with better_profanity."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 10_000, 100_000],
+            help="Body sizes in characters.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timed runs per measurement."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Time both implementations on clean bodies, where no early exit is possible.
+        """
+        repeat = options["repeat"]
+        self.stdout.write(
+            f"{'size':>8} {'better_profanity':>18} {'compiled':>12} {'speedup':>9}"
+        )
+        for size in options["sizes"]:
+            body = make_body(size)
+            assert profanity.contains_profanity(
+                body
+            ) == profanity_filter.contains_profanity(body)
+
+            baseline = min(
+                timeit.repeat(
+                    lambda: profanity.contains_profanity(body), number=1, repeat=repeat
+                )
+            )
+            compiled = min(
+                timeit.repeat(
+                    lambda: profanity_filter.contains_profanity(body),
+                    number=1,
+                    repeat=repeat,
+                )
+            )
+            self.stdout.write(
+                f"{size:>8} {baseline * 1000:>16.2f}ms {compiled * 1000:>10.2f}ms "
+                f"{baseline / compiled:>8.1f}x"
+            )
@@ -0,0 +1,80 @@
+import timeit
+from typing import Any, Callable, Dict
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from blog.benchmarks import make_body
+from blog.models import Comment, Post
+from blog.renderers import ORJSONRenderer
+from blog.serializers import (
+    CommentListSerializer,
+    CommentSerializer,
+    PostListSerializer,
+    PostSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = "Compare full and lean list serialization, including the query."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--rows", type=int, default=1000, help="Rows fetched and rendered."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timed runs per measurement."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Time fetching, serializing and rendering one page of posts and comments.
+
+        The rows are created inside a transaction that is rolled back.
+        """
+        rows = options["rows"]
+        repeat = options["repeat"]
+        with transaction.atomic():
+            post = Post.objects.create(
+                title="Serializer benchmark", slug="bench-serializers", body="Body"
+            )
+            Post.objects.bulk_create(
+                Post(
+                    title=f"Post {num}",
+                    slug=f"bench-serializers-{num}",
+                    body=make_body(2000, seed=num),
+                    status=Post.Status.PUBLISHED,
+                )
+                for num in range(rows)
+            )
+            Comment.objects.bulk_create(
+                Comment(post=post, body=make_body(300, seed=num), path="")
+                for num in range(rows)
+            )
+            posts = Post.published.filter(slug__startswith="bench-serializers-")
+            comments = Comment.objects.filter(post=post)
+
+            cases: Dict[str, Callable[[], bytes]] = {
+                "posts, full": lambda: JSONRenderer().render(
+                    PostSerializer(posts, many=True).data
+                ),
+                "posts, lean": lambda: ORJSONRenderer().render(
+                    PostListSerializer.represent(list(PostListSerializer.values(posts)))
+                ),
+                "comments, full": lambda: JSONRenderer().render(
+                    CommentSerializer(comments, many=True).data
+                ),
+                "comments, lean": lambda: ORJSONRenderer().render(
+                    CommentListSerializer.represent(
+                        list(CommentListSerializer.values(comments))
+                    )
+                ),
+            }
+            self.stdout.write(f"{'case':<16} {'time':>10} {'bytes':>10}")
+            for name, case in cases.items():
+                elapsed = min(timeit.repeat(case, number=1, repeat=repeat))
+                self.stdout.write(
+                    f"{name:<16} {elapsed * 1000:>8.1f}ms {len(case()):>10}"
+                )
+            transaction.set_rollback(True)
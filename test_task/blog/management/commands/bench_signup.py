@@ -0,0 +1,144 @@
+import threading
+import time
+import timeit
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+
+from account import hashers
+from account.serializers import UserRegisterSerializer
+from blog.benchmarks import (
+    format_table,
+    load_results,
+    metadata,
+    summarize,
+    write_results,
+)
+from blog.management.commands.seed_bench_data import Command as SeedCommand
+
+User = get_user_model()
+
+PASSWORD = "bench-Signup-password-1"
+
+
+class Command(BaseCommand):
+    help = "Measure signup throughput with many existing users."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1_000_000,
+            help="Existing users to sign up next to; missing ones are inserted.",
+        )
+        parser.add_argument(
+            "--signups", type=int, default=50, help="Signups per thread."
+        )
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--pools",
+            nargs="+",
+            choices=["none", "thread", "process"],
+            default=["none", "thread", "process"],
+            help="Values of PASSWORD_HASHING_POOL to measure.",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to a file.")
+        parser.add_argument(
+            "--compare", help="Show the change against results from an earlier run."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Sign up users through the registration serializer from threads.
+
+        Each pool setting is measured in turn, with `PASSWORD_HASHING_WORKERS`
+        workers. The email lookup signups ran before emails were indexed
+        is timed alone as `email_lookup`, the scan each of them paid.
+        """
+        existing = User.objects.count()
+        if existing < options["users"]:
+            seed = SeedCommand()
+            for first in range(existing, options["users"], 50_000):
+                seed.create_users(min(50_000, options["users"] - first), 5000)
+            self.stdout.write(f"Inserted {options['users'] - existing} users.")
+
+        results: Dict[str, Dict[str, float]] = {
+            "email_lookup": summarize(
+                timeit.repeat(
+                    User.objects.filter(email="missing@example.com").exists,
+                    number=1,
+                    repeat=5,
+                )
+            )
+        }
+
+        run = int(time.time())
+        for pool in options["pools"]:
+            settings.PASSWORD_HASHING_POOL = pool
+            hashers.executor.cache_clear()
+            results[f"signup.{pool}"] = self.measure(
+                f"signup{run}{pool}", options["threads"], options["signups"]
+            )
+            executor = hashers.executor()
+            if executor is not None:
+                executor.shutdown()
+        hashers.executor.cache_clear()
+        User.objects.filter(username__startswith=f"signup{run}").delete()
+
+        baseline = load_results(options["compare"]) if options["compare"] else None
+        self.stdout.write(
+            format_table(
+                results, ["signups_per_s", "median_ms", "p99_ms"], baseline, "median_ms"
+            )
+        )
+        if options["output"]:
+            meta = metadata(
+                users=options["users"],
+                threads=options["threads"],
+                workers=settings.PASSWORD_HASHING_WORKERS,
+            )
+            write_results(options["output"], meta, results)
+
+    def measure(self, prefix: str, threads: int, signups: int) -> Dict[str, float]:
+        """
+        Register `signups` users from each thread, timing every signup.
+        """
+        timings: List[List[float]] = [[] for _ in range(threads)]
+
+        def run(index: int) -> None:
+            own = timings[index]
+            for num in range(signups):
+                username = f"{prefix}t{index}n{num}"
+                started = time.perf_counter()
+                serializer = UserRegisterSerializer(
+                    data={
+                        "username": username,
+                        "email": f"{username}@example.com",
+                        "password": PASSWORD,
+                        "password2": PASSWORD,
+                    }
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                own.append(time.perf_counter() - started)
+            connection.close()
+
+        workers = [
+            threading.Thread(target=run, args=(index,)) for index in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(value for own in timings for value in own)
+        return {
+            "signups_per_s": len(ordered) / elapsed,
+            "median_ms": ordered[len(ordered) // 2] * 1e3,
+            "p99_ms": ordered[int((len(ordered) - 1) * 0.99)] * 1e3,
+        }
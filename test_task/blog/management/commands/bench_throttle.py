@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blog import throttling
+from blog.benchmarks import format_table, load_results, metadata, write_results
+from blog.views import CommentViewSet
+
+User = get_user_model()
+
+# Never runs out, so every check takes the same path.
+CAPACITY = 1e12
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of throttle checks from concurrent threads."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--checks", type=int, default=20_000, help="Checks per thread."
+        )
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--keys", type=int, default=1000, help="Distinct users and posts."
+        )
+        parser.add_argument(
+            "--redis-url",
+            help="Redis to measure the shared buckets on; THROTTLE_REDIS_URL "
+            "by default.",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to a file.")
+        parser.add_argument(
+            "--compare", help="Show the change against results from an earlier run."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Time bucket takes alone and the comment throttles of a create request.
+
+        Buckets are sized so no check is refused. The throttles run against
+        the configured backend, Redis if `THROTTLE_REDIS_URL` is set.
+        """
+        keys = [f"bench:{num}" for num in range(options["keys"])]
+        local = throttling.LocalBuckets()
+        cases: Dict[str, Callable[[int], Any]] = {
+            "local.take": lambda num: local.take(keys[num % len(keys)], CAPACITY, 1.0)
+        }
+        url = options["redis_url"] or settings.THROTTLE_REDIS_URL
+        if url:
+            shared = throttling.RedisBuckets(url, 1.0, 0.0)
+            cases["redis.take"] = lambda num: shared.take(
+                keys[num % len(keys)], CAPACITY, 1.0
+            )
+        cases["throttles.comment_create"] = self.comment_throttles(options["keys"])
+
+        results = {
+            name: self.measure(case, options["threads"], options["checks"])
+            for name, case in cases.items()
+        }
+        baseline = load_results(options["compare"]) if options["compare"] else None
+        self.stdout.write(
+            format_table(
+                results, ["checks_per_s", "median_us", "p99_us"], baseline, "median_us"
+            )
+        )
+        if options["output"]:
+            meta = metadata(threads=options["threads"], keys=options["keys"])
+            write_results(options["output"], meta, results)
+
+    def comment_throttles(self, keys: int) -> Callable[[int], Any]:
+        """
+        Return a check of every comment throttle on one of `keys` requests.
+        """
+        factory = APIRequestFactory()
+        requests = []
+        for num in range(keys):
+            request = Request(
+                factory.post(
+                    "/v1/comments/",
+                    {"post": num + 1, "body": "Hi"},
+                    format="json",
+                    REMOTE_ADDR=f"10.0.{num // 256 % 256}.{num % 256}",
+                ),
+                parsers=[JSONParser()],
+            )
+            request.user = User(pk=num + 1)
+            request.data
+            requests.append(request)
+        throttles = []
+        for throttle_class in CommentViewSet.throttle_classes:
+            throttle = throttle_class()
+            throttle.num_requests, throttle.duration = int(CAPACITY), 1
+            throttles.append(throttle)
+        view = CommentViewSet()
+
+        def check(num: int) -> None:
+            request = requests[num % keys]
+            for throttle in throttles:
+                throttle.allow_request(request, view)
+
+        return check
+
+    def measure(
+        self, case: Callable[[int], Any], threads: int, checks: int
+    ) -> Dict[str, float]:
+        """
+        Run `checks` calls from each thread, timing every call.
+        """
+        timings: List[List[float]] = [[] for _ in range(threads)]
+
+        def run(index: int) -> None:
+            own = timings[index]
+            for num in range(index, index + checks):
+                started = time.perf_counter()
+                case(num)
+                own.append(time.perf_counter() - started)
+
+        workers = [
+            threading.Thread(target=run, args=(index,)) for index in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(value for own in timings for value in own)
+        return {
+            "checks_per_s": len(ordered) / elapsed,
+            "median_us": ordered[len(ordered) // 2] * 1e6,
+            "p99_us": ordered[int((len(ordered) - 1) * 0.99)] * 1e6,
+        }
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Tuple
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import OperationalError, connection, connections
+
+from blog.benchmarks import make_body
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent comment write throughput on the configured database."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--workers", type=int, default=8, help="Concurrent writer threads."
+        )
+        parser.add_argument(
+            "--writes", type=int, default=200, help="Comments written per worker."
+        )
+        parser.add_argument(
+            "--blocked-every",
+            type=int,
+            default=5,
+            help="Every n-th comment is profane, exercising the blocked counter.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Write comments from several threads, each with its own connection.
+
+        Each write runs the full `Comment.save()` path: the insert, the path
+        update and the daily rollup, or the blocked counter for profane
+        bodies. Failed writes such as "database is locked" are counted, not
+        retried. The benchmark post and its comments are deleted afterwards.
+        """
+        workers = options["workers"]
+        writes = options["writes"]
+        blocked_every = options["blocked_every"]
+        body = make_body(200)
+        post = Post.objects.create(
+            title="Write benchmark", slug=f"bench-writes-{time.time_ns()}", body=body
+        )
+
+        def write(worker: int) -> Tuple[int, int]:
+            done = failed = 0
+            try:
+                for num in range(writes):
+                    profane = blocked_every > 0 and num % blocked_every == 0
+                    try:
+                        Comment.objects.create(
+                            post=post, body="shit" if profane else body
+                        )
+                    except ValidationError:
+                        pass
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    done += 1
+            finally:
+                connection.close()
+            return done, failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(write, range(workers)))
+        elapsed = time.perf_counter() - started
+
+        done = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        post.refresh_from_db()
+        post.delete()
+
+        vendor = connections["default"].vendor
+        self.stdout.write(
+            f"{vendor}: {done} writes in {elapsed:.2f}s "
+            f"({done / elapsed:.0f}/s) by {workers} workers, {failed} failed, "
+            f"{post.amount_block_comment} blocked"
+        )
@@ -0,0 +1,49 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from blog.models import Comment
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized path of every comment, level by level."
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Set top-level paths, then extend each level from its parents' paths.
+
+        Every level is a single set-based UPDATE, so the command runs one
+        query per thread depth regardless of the number of comments.
+        """
+        step = Concat(
+            LPad(
+                Cast("id", output_field=models.TextField()),
+                Comment.PATH_STEP_WIDTH,
+                Value("0"),
+            ),
+            Value("/"),
+            output_field=models.TextField(),
+        )
+        parent_path = Subquery(
+            Comment.objects.filter(pk=OuterRef("parent_id")).values("path")[:1]
+        )
+
+        with transaction.atomic():
+            Comment.objects.update(path="")
+            updated = Comment.objects.filter(parent__isnull=True).update(path=step)
+            total, depth = updated, 0
+            while updated:
+                depth += 1
+                updated = Comment.objects.filter(
+                    path="", parent__isnull=False, parent__path__gt=""
+                ).update(
+                    path=Concat(parent_path, step, output_field=models.TextField())
+                )
+                total += updated
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {total} comment paths over {depth} levels.")
+        )
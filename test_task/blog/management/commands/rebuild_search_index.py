@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog import search
+
+
+class Command(BaseCommand):
+    help = "Create the full-text search index and fill it from every post and comment."
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Rebuild the search tables in one transaction.
+
+        On PostgreSQL the GIN indexes cover the tables themselves, so only
+        missing indexes are created.
+        """
+        with transaction.atomic():
+            posts, comments = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {posts} posts and {comments} comments.")
+        )
@@ -0,0 +1,102 @@
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from blog import cache
+from blog.models import Comment, Post
+
+
+def approved(value: Any) -> Subquery:
+    """
+    Return a subquery of one aggregate over the approved comments of a post.
+    """
+    return Subquery(
+        Comment.objects.filter(post=OuterRef("pk"))
+        .approved()
+        .order_by()
+        .values("post")
+        .annotate(value=value)
+        .values("value")
+    )
+
+
+class Command(BaseCommand):
+    help = "Recount the comment counters of posts that drifted from their comments."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Posts checked per query.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted posts without fixing them.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Compare the counters of each chunk of posts with their approved comments.
+
+        Drifted posts are fixed with one UPDATE per chunk that recounts in
+        the database, so comments written in the meantime are not lost.
+        """
+        actual = {
+            "comment_count": Coalesce(approved(Count("pk")), 0),
+            "reply_count": Coalesce(
+                approved(Count("pk", filter=Q(parent__isnull=False))), 0
+            ),
+            "last_comment_at": Subquery(
+                Comment.objects.filter(post=OuterRef("pk"))
+                .approved()
+                .order_by("-created")
+                .values("created")[:1]
+            ),
+        }
+        checked = fixed = 0
+        last = 0
+        while True:
+            ids = list(
+                Post.objects.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["chunk_size"]]
+            )
+            if not ids:
+                break
+            last = ids[-1]
+            checked += len(ids)
+            drifted = self.drifted(Post.objects.filter(pk__in=ids), actual)
+            if drifted and not options["dry_run"]:
+                Post.objects.filter(pk__in=[post.pk for post in drifted]).update(
+                    **actual
+                )
+                cache.bump(
+                    cache.POST_LIST, *(cache.post_scope(post.slug) for post in drifted)
+                )
+            fixed += len(drifted)
+
+        verb = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} posts. {verb} {fixed} drifted.")
+        )
+
+    @staticmethod
+    def drifted(posts: QuerySet, actual: Dict[str, Any]) -> List[Post]:
+        """
+        Return the posts whose counters differ from the recounted values.
+        """
+        rows = posts.annotate(
+            **{f"actual_{name}": value for name, value in actual.items()}
+        ).only("pk", "slug", *actual)
+        return [
+            post
+            for post in rows
+            if any(
+                getattr(post, name) != getattr(post, f"actual_{name}")
+                for name in actual
+            )
+        ]
@@ -0,0 +1,275 @@
+import itertools
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandParser
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog import search
+from blog.benchmarks import make_body, make_comment_body
+from blog.models import Comment, CommentDailyStats, Post
+
+User = get_user_model()
+
+BENCH_PASSWORD = "bench-password"
+
+
+@contextmanager
+def explicit_timestamps(*fields: models.DateTimeField) -> Iterator[None]:
+    """
+    Let bulk inserts keep the given values of `auto_now` and `auto_now_add` fields.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Generate users, posts and comment reply trees for benchmarks."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument(
+            "--comments", type=int, default=100_000, help="Comments attempted."
+        )
+        parser.add_argument(
+            "--days", type=int, default=90, help="Days the comments are spread over."
+        )
+        parser.add_argument(
+            "--reply-fraction",
+            type=float,
+            default=0.6,
+            help="Share of comments replying to an earlier comment.",
+        )
+        parser.add_argument(
+            "--profane-fraction",
+            type=float,
+            default=0.03,
+            help="Share of comments blocked as profane and only counted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Insert the rows in bulk with precomputed ids, paths and timestamps.
+
+        Comments per post and per author follow a long-tailed distribution,
+        and replies pick an earlier comment of the same post, so threads get
+        deep on busy posts. Profane comments are never stored, as in the API;
+        they are counted in `amount_block_comment` and the daily rollup. The
+        generated users share the password `bench-password`. Existing rows
+        are kept, and the search index is rebuilt at the end.
+        """
+        rnd = random.Random(options["seed"])
+        started = time.perf_counter()
+        now = timezone.now()
+        first_day = now - timedelta(days=options["days"])
+
+        user_ids = self.create_users(options["users"], options["batch_size"])
+        # Cumulative weights let every pick bisect instead of summing them.
+        user_weights = list(
+            itertools.accumulate(1 / (rank + 1) for rank in range(len(user_ids)))
+        )
+        posts = self.create_posts(
+            options["posts"], user_ids, user_weights, first_day, rnd
+        )
+
+        post_weights = [rnd.paretovariate(1.2) for _ in posts]
+        per_post = Counter(
+            rnd.choices(range(len(posts)), weights=post_weights, k=options["comments"])
+        )
+        next_id = (Comment.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        created_days: Counter = Counter()
+        blocked_days: Counter = Counter()
+        blocked_posts: Counter = Counter()
+        replies: Counter = Counter()
+        batch: List[Comment] = []
+        stored = 0
+
+        created_field = Comment._meta.get_field("created")
+        with explicit_timestamps(created_field):
+            for index, count in per_post.items():
+                post = posts[index]
+                window = (now - post.created).total_seconds()
+                times = sorted(
+                    post.created + timedelta(seconds=rnd.random() * window)
+                    for _ in range(count)
+                )
+                thread: List[Tuple[int, str]] = []
+                for created in times:
+                    day = timezone.localdate(created)
+                    if rnd.random() < options["profane_fraction"]:
+                        blocked_days[post.pk, day] += 1
+                        blocked_posts[post.pk] += 1
+                        continue
+                    parent_id, parent_path = None, ""
+                    if thread and rnd.random() < options["reply_fraction"]:
+                        # Recent comments get most replies.
+                        parent_id, parent_path = thread[
+                            -1 - min(int(rnd.expovariate(0.2)), len(thread) - 1)
+                        ]
+                    path = f"{parent_path}{next_id:0{Comment.PATH_STEP_WIDTH}d}/"
+                    (author_id,) = rnd.choices(user_ids, cum_weights=user_weights)
+                    batch.append(
+                        Comment(
+                            id=next_id,
+                            post_id=post.pk,
+                            author_id=author_id,
+                            parent_id=parent_id,
+                            body=make_comment_body(rnd),
+                            created=created,
+                            path=path,
+                        )
+                    )
+                    thread.append((next_id, path))
+                    created_days[post.pk, day] += 1
+                    replies[post.pk] += parent_id is not None
+                    post.last_comment_at = created
+                    next_id += 1
+                    if len(batch) >= options["batch_size"]:
+                        stored += self.flush(batch)
+                        batch = []
+            stored += self.flush(batch)
+
+        self.record_stats(posts, created_days, blocked_days, blocked_posts, replies)
+        self.reset_sequences()
+        search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(user_ids)} users, {len(posts)} posts and {stored} "
+                f"comments, blocked {sum(blocked_posts.values())}, in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+        )
+
+    def create_users(self, count: int, batch_size: int) -> List[int]:
+        """
+        Insert users named after their ids, sharing one password hash.
+
+        Returns their ids.
+        """
+        first = (User.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        password = make_password(BENCH_PASSWORD)
+        users = [
+            User(
+                id=pk,
+                username=f"bench{pk}",
+                email=f"bench{pk}@example.com",
+                password=password,
+            )
+            for pk in range(first, first + count)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=batch_size)
+        return [user.pk for user in users]
+
+    def create_posts(
+        self,
+        count: int,
+        user_ids: List[int],
+        user_weights: List[float],
+        first_day: datetime,
+        rnd: random.Random,
+    ) -> List[Post]:
+        """
+        Insert published posts created over the first half of the period.
+        """
+        first = (Post.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        span = (timezone.now() - first_day).total_seconds() / 2
+        posts = []
+        for pk in range(first, first + count):
+            created = first_day + timedelta(seconds=rnd.random() * span)
+            posts.append(
+                Post(
+                    id=pk,
+                    title=f"Benchmark post {pk}",
+                    slug=f"bench-post-{pk}",
+                    author_id=rnd.choices(user_ids, cum_weights=user_weights)[0],
+                    body=make_body(rnd.randint(500, 5000), seed=pk),
+                    status=Post.Status.PUBLISHED,
+                    created=created,
+                    updated=created,
+                )
+            )
+        fields = [Post._meta.get_field("created"), Post._meta.get_field("updated")]
+        with explicit_timestamps(*fields), transaction.atomic():
+            Post.objects.bulk_create(posts, batch_size=1000)
+        return posts
+
+    def flush(self, batch: List[Comment]) -> int:
+        """
+        Insert a batch of comments in one transaction.
+        """
+        with transaction.atomic():
+            Comment.objects.bulk_create(batch)
+        return len(batch)
+
+    def record_stats(
+        self,
+        posts: List[Post],
+        created_days: Counter,
+        blocked_days: Counter,
+        blocked_posts: Counter,
+        replies: Counter,
+    ) -> None:
+        """
+        Write the daily rollup and the comment counters of the generated posts.
+
+        Comments are stored in time order, so each post already holds its
+        `last_comment_at`.
+        """
+        stats = [
+            CommentDailyStats(
+                post_id=post_id,
+                day=day,
+                created_count=created_days[post_id, day],
+                blocked_count=blocked_days[post_id, day],
+            )
+            for post_id, day in created_days.keys() | blocked_days.keys()
+        ]
+        stored: Counter = Counter()
+        for (post_id, _), count in created_days.items():
+            stored[post_id] += count
+        for post in posts:
+            post.amount_block_comment = blocked_posts[post.pk]
+            post.comment_count = stored[post.pk]
+            post.reply_count = replies[post.pk]
+        with transaction.atomic():
+            CommentDailyStats.objects.bulk_create(stats, batch_size=1000)
+            Post.objects.bulk_update(
+                posts,
+                [
+                    "amount_block_comment",
+                    "comment_count",
+                    "reply_count",
+                    "last_comment_at",
+                ],
+                batch_size=1000,
+            )
+
+    def reset_sequences(self) -> None:
+        """
+        Move the id sequences past the explicit ids, on databases that have them.
+        """
+        statements: List[str] = connection.ops.sequence_reset_sql(
+            no_style(), [User, Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,419 @@
+"""
+Request instrumentation exported in the Prometheus text format.
+
+`MetricsMiddleware` times every request and counts the database queries it
+runs through `execute_wrapper`. Profanity checks and Celery publishes add
+their time to the current request through a context variable, and every
+total is observed per route, the URL name of the view, when the request
+ends. Work outside a request, such as in Celery workers, is observed under
+the route "-". The comment moderation backlog is read from the database
+when metrics are collected, so any process serving them reports it.
+
+With several worker processes, set `PROMETHEUS_MULTIPROC_DIR` to a shared
+empty directory so `/metrics` aggregates every worker.
+"""
+
+import functools
+import hmac
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from celery.signals import after_task_publish, before_task_publish
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Count, Min
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.registry import Collector
+
+from .profanity import verdict_cache
+
+NO_ROUTE = "-"
+UNMATCHED_ROUTE = "unmatched"
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Latency buckets from half a millisecond to ten seconds.
+SECONDS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+# Moderation lag buckets from a tenth of a second to ten minutes.
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+REQUESTS = Counter("blog_requests", "Requests served.", ["route", "method", "status"])
+REQUEST_SECONDS = Histogram(
+    "blog_request_duration_seconds",
+    "Time spent in the view and middleware below this one.",
+    ["route", "method"],
+    buckets=SECONDS_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "blog_db_queries_per_request",
+    "Database queries run by one request.",
+    ["route"],
+    buckets=QUERY_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "blog_db_duration_seconds",
+    "Time one request spent executing database queries.",
+    ["route"],
+    buckets=SECONDS_BUCKETS,
+)
+PROFANITY_SECONDS = Histogram(
+    "blog_profanity_check_duration_seconds",
+    "Time one request, or one check outside requests, spent screening text.",
+    ["route"],
+    buckets=SECONDS_BUCKETS,
+)
+PUBLISH_SECONDS = Histogram(
+    "blog_celery_publish_duration_seconds",
+    "Time to publish one Celery task message to the broker.",
+    ["task"],
+    buckets=SECONDS_BUCKETS,
+)
+THROTTLE_CHECKS = Counter(
+    "blog_throttle_checks",
+    "Throttle checks by scope and outcome.",
+    ["scope", "outcome"],
+)
+THROTTLE_BACKEND_ERRORS = Counter(
+    "blog_throttle_backend_errors",
+    "Throttle checks that fell back to in-process buckets after a Redis error.",
+)
+MODERATED = Counter(
+    "blog_comments_moderated", "Comments screened by moderation.", ["verdict"]
+)
+MODERATION_LAG_SECONDS = Histogram(
+    "blog_comment_moderation_lag_seconds",
+    "Time from a comment's creation to its moderation verdict.",
+    buckets=LAG_BUCKETS,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _route_metrics(route: str, method: str, status: int) -> Tuple[Any, ...]:
+    """
+    Return the labelled request metrics of a route, method and status.
+
+    Looking labels up takes a lock and builds a key on every call; routes
+    are URL names, so the children can be kept for the process lifetime.
+    """
+    return (
+        REQUESTS.labels(route, method, status),
+        REQUEST_SECONDS.labels(route, method),
+        DB_QUERIES.labels(route),
+        DB_SECONDS.labels(route),
+        PROFANITY_SECONDS.labels(route),
+    )
+
+
+@dataclass
+class Timings:
+    """
+    Totals accumulated while one request is served.
+    """
+
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    profanity_seconds: float = 0.0
+    publish_seconds: float = 0.0
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("blog_timings", default=None)
+_publish_started: Dict[str, float] = {}
+
+
+@contextmanager
+def profanity_timer() -> Iterator[None]:
+    """
+    Time a profanity check, for the current request or on its own.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = _current.get()
+        if timings is None:
+            PROFANITY_SECONDS.labels(NO_ROUTE).observe(elapsed)
+        else:
+            timings.profanity_seconds += elapsed
+
+
+def _count_query(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any
+) -> Any:
+    """
+    Execute a query, adding it and its duration to the current request.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_seconds += time.perf_counter() - started
+
+
+@before_task_publish.connect
+def _publish_started_handler(headers: Dict[str, Any], **kwargs: Any) -> None:
+    """
+    Note when a task message starts being published.
+    """
+    _publish_started[headers.get("id", "")] = time.perf_counter()
+
+
+@after_task_publish.connect
+def _publish_finished_handler(
+    sender: str, headers: Dict[str, Any], **kwargs: Any
+) -> None:
+    """
+    Observe how long a task message took to publish.
+    """
+    started = _publish_started.pop(headers.get("id", ""), None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    PUBLISH_SECONDS.labels(sender).observe(elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.publish_seconds += elapsed
+
+
+def observe_moderation(approved: List[Any], blocked: List[Any]) -> None:
+    """
+    Count moderated comments by verdict and observe how long they waited.
+    """
+    now = timezone.now()
+    for verdict, comments in (("approved", approved), ("blocked", blocked)):
+        if comments:
+            MODERATED.labels(verdict).inc(len(comments))
+        for comment in comments:
+            MODERATION_LAG_SECONDS.observe((now - comment.created).total_seconds())
+
+
+class MetricsMiddleware:
+    """
+    Record per-route latency, query and profanity metrics for every request.
+
+    With `METRICS_SERVER_TIMING` enabled, the totals are also sent in a
+    `Server-Timing` header, which browsers show next to the request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        """
+        Wrap the next handler, matching whether it is async.
+        """
+        self.get_response = get_response
+        self.server_timing = settings.METRICS_SERVER_TIMING
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        """
+        Serve the request with its queries and checks recorded.
+        """
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        stack = self.wrap_connections()
+        try:
+            response = self.get_response(request)
+        finally:
+            stack.close()
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        """
+        Serve the request asynchronously with its queries and checks recorded.
+
+        Connections belong to the thread running the request's ORM calls, so
+        the wrappers are installed and removed from that thread.
+        """
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        stack = await sync_to_async(self.wrap_connections)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def wrap_connections(self) -> ExitStack:
+        """
+        Count the queries of every database connection of the current thread.
+        """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_count_query))
+        return stack
+
+    def finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponseBase,
+        timings: Timings,
+        started: float,
+    ) -> HttpResponseBase:
+        """
+        Observe the totals under the request's route and add `Server-Timing`.
+        """
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else UNMATCHED_ROUTE
+        method = request.method if request.method in METHODS else "other"
+
+        requests, seconds, queries, db_seconds, profanity_seconds = _route_metrics(
+            route, method, response.status_code
+        )
+        requests.inc()
+        seconds.observe(elapsed)
+        queries.observe(timings.db_queries)
+        db_seconds.observe(timings.db_seconds)
+        if timings.profanity_seconds:
+            profanity_seconds.observe(timings.profanity_seconds)
+
+        if self.server_timing:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f"app;dur={elapsed * 1000:.2f}",
+                    f'db;dur={timings.db_seconds * 1000:.2f};desc="'
+                    f'{timings.db_queries} queries"',
+                    f"profanity;dur={timings.profanity_seconds * 1000:.2f}",
+                    f"celery;dur={timings.publish_seconds * 1000:.2f}",
+                ]
+            )
+        return response
+
+
+class VerdictCacheCollector(Collector):
+    """
+    Export the profanity verdict cache counters of the scraped process.
+    """
+
+    def collect(self) -> Iterator[Any]:
+        """
+        Yield the cache lookups by outcome and the local cache size.
+        """
+        stats = verdict_cache.stats()
+        lookups = CounterMetricFamily(
+            "blog_profanity_verdict_cache_lookups",
+            "Verdict lookups by outcome, in this process.",
+            labels=["outcome"],
+        )
+        for outcome in ("local_hits", "shared_hits", "misses", "errors"):
+            lookups.add_metric([outcome], stats[outcome])
+        yield lookups
+        yield GaugeMetricFamily(
+            "blog_profanity_verdict_cache_local_size",
+            "Verdicts held in this process's local cache.",
+            value=stats["local_size"],
+        )
+
+
+class ModerationQueueCollector(Collector):
+    """
+    Export the comments waiting for moderation and the age of the oldest one.
+    """
+
+    def describe(self) -> Iterator[Any]:
+        """
+        Yield the gauges without values, so registering does not query.
+        """
+        yield GaugeMetricFamily(
+            "blog_comments_pending_moderation", "Comments waiting for moderation."
+        )
+        yield GaugeMetricFamily(
+            "blog_comment_moderation_oldest_pending_seconds",
+            "Age of the oldest comment waiting for moderation.",
+        )
+
+    def collect(self) -> Iterator[Any]:
+        """
+        Yield the backlog gauges, or nothing if the database is unavailable.
+        """
+        Comment: Any = apps.get_model("blog", "Comment")
+        try:
+            backlog = Comment.objects.filter(
+                moderation=Comment.Moderation.PENDING
+            ).aggregate(pending=Count("id"), oldest=Min("created"))
+        except DatabaseError:
+            return
+        pending, oldest_age = self.describe()
+        pending.add_metric([], backlog["pending"])
+        oldest = backlog["oldest"]
+        oldest_age.add_metric(
+            [], (timezone.now() - oldest).total_seconds() if oldest else 0.0
+        )
+        yield pending
+        yield oldest_age
+
+
+def registry() -> CollectorRegistry:
+    """
+    Return the registry to export, aggregating workers in multiprocess mode.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    aggregated = CollectorRegistry()
+    MultiProcessCollector(aggregated)  # type: ignore[no-untyped-call]
+    aggregated.register(VerdictCacheCollector())
+    aggregated.register(ModerationQueueCollector())
+    return aggregated
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Serve the metrics in the Prometheus text format.
+
+    If `METRICS_TOKEN` is set, scrapers must send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    REGISTRY.register(VerdictCacheCollector())
+    REGISTRY.register(ModerationQueueCollector())
@@ -1,13 +1,17 @@
-from datetime import timedelta
-from typing import Any
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from better_profanity import profanity
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Length
 from django.utils import timezone
 
-from .tasks import set_auto_response_parent
+from . import cache, metrics, search, tasks
+from .profanity import verdict_cache
 
 User = get_user_model()
 
@@ -16,7 +20,44 @@ def check_swearing(text: str) -> bool:
     """
     Checks if the given text contains any profanity.
     """
-    return bool(profanity.contains_profanity(text))
+    with metrics.profanity_timer():
+        return verdict_cache.contains_profanity(text)
+
+
+def check_swearing_many(texts: List[str]) -> List[bool]:
+    """
+    Checks many texts for profanity in one batched pass through the cache.
+    """
+    with metrics.profanity_timer():
+        return verdict_cache.contains_profanity_many(texts)
+
+
+def touches_fields(update_fields: Optional[Iterable[str]], *fields: str) -> bool:
+    """
+    Returns True if a save with the given `update_fields` writes any of the fields.
+    """
+    if update_fields is None:
+        return True
+    return bool(set(update_fields) & set(fields))
+
+
+class PathField(models.TextField):
+    """
+    Text field compared byte by byte, as materialized path ranges need.
+
+    Linguistic collations such as PostgreSQL's `en_US.UTF-8` may order "/"
+    after digits or ignore it, so on PostgreSQL the column uses the "C"
+    collation. SQLite's default `BINARY` collation already compares bytes.
+    """
+
+    def db_parameters(self, connection: Any) -> Dict[str, Any]:
+        """
+        Use the "C" collation on PostgreSQL unless one is set explicitly.
+        """
+        params: Dict[str, Any] = super().db_parameters(connection)
+        if connection.vendor == "postgresql" and not self.db_collation:
+            params["collation"] = "C"
+        return params
 
 
 class PublishedManager(models.Manager):
@@ -59,22 +100,118 @@ class Post(models.Model):
     auto_response_comment = models.TextField(default="", blank=True)
     time_response = models.IntegerField(default=0)
     amount_block_comment = models.PositiveIntegerField(default=0)
+    # Approved comments only, maintained as they are created, moderated and
+    # deleted; `reconcile_comment_counts` fixes drift.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
     objects = models.Manager()
     published = PublishedManager()
 
+    # The last comment, or the publication for posts without comments.
+    ACTIVITY = Coalesce("last_comment_at", "created")
+
     def save(self, *args: Any, **kwargs: Any) -> None:
         """
         Checks if the title or body of the post contains any profane words before saving.
+        Saves restricted to other fields through `update_fields` skip the check
+        and the search index update.
         """
-        if check_swearing(self.title) or check_swearing(self.body):
+        if touches_fields(kwargs.get("update_fields"), "title", "body") and (
+            check_swearing(self.title) or check_swearing(self.body)
+        ):
             raise ValidationError("You cannot use swearing words in the title or body.")
 
-        super().save(*args, **kwargs)
+        scopes = [cache.POST_LIST, cache.post_scope(self.slug)]
+        if not self._state.adding and touches_fields(
+            kwargs.get("update_fields"), "slug"
+        ):
+            old_slug = Post.objects.filter(pk=self.pk).values_list("slug", flat=True)
+            scopes.extend(cache.post_scope(slug) for slug in old_slug)
+        # Without a savepoint, like the parent saves of `Model.save_base`.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if touches_fields(kwargs.get("update_fields"), "title", "body"):
+                search.index_posts([self])
+        cache.bump(*scopes)
+
+    def delete(self, *args: Any, **kwargs: Any) -> Tuple[int, Dict[str, int]]:
+        """
+        Deletes the post, its search entry and its cached list pages and detail.
+        """
+        pk = self.pk
+        deleted: Tuple[int, Dict[str, int]] = super().delete(*args, **kwargs)
+        search.unindex("Post", [pk])
+        cache.bump(cache.POST_LIST, cache.post_scope(self.slug))
+        return deleted
+
+    def count_blocked_comment(self) -> None:
+        """
+        Atomically increments `amount_block_comment` in a single UPDATE.
+
+        The increment is done by the database, so concurrent rejections never
+        overwrite each other, and the post is not re-saved or re-validated.
+        """
+        Post.objects.filter(pk=self.pk).update(
+            amount_block_comment=F("amount_block_comment") + 1
+        )
+        self.refresh_from_db(fields=["amount_block_comment"])
+        cache.bump(cache.post_scope(self.slug))
+
+    @classmethod
+    def add_comments(cls, comments: Iterable["Comment"]) -> None:
+        """
+        Atomically count approved comments on their posts, one UPDATE per post.
+
+        Callers bump `cache.POST_LIST`, which shows the counters.
+        """
+        counts: Counter[int] = Counter()
+        replies: Counter[int] = Counter()
+        latest: Dict[int, datetime] = {}
+        for comment in comments:
+            counts[comment.post_id] += 1
+            replies[comment.post_id] += bool(comment.parent_id)
+            latest[comment.post_id] = max(
+                comment.created, latest.get(comment.post_id, comment.created)
+            )
+        for post_id, count in counts.items():
+            last = Value(latest[post_id])
+            cls.objects.filter(pk=post_id).update(
+                comment_count=F("comment_count") + count,
+                reply_count=F("reply_count") + replies[post_id],
+                # GREATEST is NULL on SQLite while the post has no comments.
+                last_comment_at=Coalesce(Greatest("last_comment_at", last), last),
+            )
+
+    @classmethod
+    def remove_comments(cls, post_id: int, count: int, replies: int) -> None:
+        """
+        Atomically uncount deleted approved comments and find the last one left.
+
+        Callers bump `cache.POST_LIST`, which shows the counters.
+        """
+        cls.objects.filter(pk=post_id).update(
+            comment_count=F("comment_count") - count,
+            reply_count=F("reply_count") - replies,
+            last_comment_at=Subquery(
+                Comment.objects.filter(post=OuterRef("pk"))
+                .approved()
+                .order_by("-created")
+                .values("created")[:1]
+            ),
+        )
 
     class Meta:
         ordering = ["-created"]
         indexes = [
             models.Index(fields=["-created"]),
+            # Serves `?ordering=activity` on the post list and the cursor
+            # bound of its pages, so it must stay the expression of `ACTIVITY`.
+            models.Index(
+                Coalesce("last_comment_at", "created").desc(),
+                F("id").desc(),
+                name="post_activity_idx",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -84,11 +221,211 @@ class Post(models.Model):
         return f"{self.title}"
 
 
+class CommentQuerySet(models.QuerySet):
+    """
+    Custom queryset for comments.
+    """
+
+    def created_between(self, date_from: date, date_to: date) -> models.QuerySet:
+        """
+        Filter comments created from `date_from` to `date_to` inclusive.
+
+        The days are converted to half-open timestamp bounds in the current
+        time zone, so the filter compares the raw `created` column and can use
+        the `(post, created)` and `(author, created)` indexes. A
+        `created__date` lookup would wrap the column in a cast and scan.
+        """
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(
+            datetime.combine(date_to + timedelta(days=1), time.min)
+        )
+        return self.filter(created__gte=start, created__lt=end)
+
+    def thread(
+        self, root: Optional["Comment"] = None, max_depth: Optional[int] = None
+    ) -> models.QuerySet:
+        """
+        Filter a subtree by materialized path, parents before their replies.
+
+        Without a root the whole reply tree of the queryset's posts is returned.
+        The subtree is one `path` range, so it is read with a single index
+        range scan on `(post, path)`. `max_depth` counts levels below the root.
+        """
+        queryset = self
+        prefix = ""
+        if root is not None:
+            prefix = root.path
+            # Every path in the subtree starts with the prefix; "0" sorts
+            # right after the trailing "/" in the byte order of `PathField`.
+            queryset = queryset.filter(
+                post_id=root.post_id, path__gt=prefix, path__lt=prefix[:-1] + "0"
+            )
+        if max_depth is not None:
+            max_length = len(prefix) + max_depth * Comment.PATH_STEP_LENGTH
+            queryset = queryset.alias(path_length=Length("path")).filter(
+                path_length__lte=max_length
+            )
+        return queryset.order_by("path")
+
+    def approved(self) -> models.QuerySet:
+        """
+        Filter comments that passed moderation.
+        """
+        return self.filter(moderation=Comment.Moderation.APPROVED)
+
+    def visible_to(self, user: Any) -> models.QuerySet:
+        """
+        Filter the comments a user may read: approved ones and their own.
+
+        Staff also see comments that are pending or were blocked.
+        """
+        if user.is_staff:
+            return self
+        if user.is_authenticated:
+            return self.filter(
+                Q(moderation=Comment.Moderation.APPROVED) | Q(author_id=user.pk)
+            )
+        return self.approved()
+
+    def create_many(
+        self, comments: List["Comment"]
+    ) -> Tuple[List["Comment"], List["Comment"]]:
+        """
+        Screen and insert many comments with a few queries per post.
+
+        Does in bulk what `Comment.save()` does one by one: profane comments
+        are rejected and counted per post, clean ones are inserted with
+        `bulk_create`, get their paths in one `bulk_update`, are indexed for
+        search, are added to the daily rollup and their posts' counters, and
+        get their auto-responses scheduled.
+        Returns the created and the rejected comments.
+        """
+        created: List[Comment] = []
+        blocked: List[Comment] = []
+        verdicts = check_swearing_many([comment.body for comment in comments])
+        for comment, is_profane in zip(comments, verdicts):
+            (blocked if is_profane else created).append(comment)
+
+        today = timezone.localdate()
+        for post_id, count in Counter(comment.post_id for comment in blocked).items():
+            Post.objects.filter(pk=post_id).update(
+                amount_block_comment=F("amount_block_comment") + count
+            )
+            CommentDailyStats.record(post_id, today, blocked=count)
+        # Comments and blocked counts only show in the detail.
+        scopes = {cache.post_scope(comment.post.slug) for comment in comments}
+
+        if not created:
+            cache.bump(*scopes)
+            return created, blocked
+
+        with transaction.atomic():
+            self.bulk_create(created)
+            for comment in created:
+                comment.path = comment.build_path()
+            self.bulk_update(created, ["path"])
+            search.index_comments(created)
+
+            days = Counter(
+                (comment.post_id, timezone.localdate(comment.created))
+                for comment in created
+            )
+            for (post_id, day), count in days.items():
+                CommentDailyStats.record(post_id, day, created=count)
+            Post.add_comments(created)
+
+            AutoResponse.objects.bulk_create(
+                [
+                    AutoResponse.for_comment(comment)
+                    for comment in created
+                    if comment.needs_auto_response()
+                ]
+            )
+        cache.bump(cache.POST_LIST, *scopes)
+        return created, blocked
+
+    def moderate(
+        self, comments: List["Comment"]
+    ) -> Tuple[List["Comment"], List["Comment"]]:
+        """
+        Screen pending comments in one batch and approve or block them.
+
+        Approved comments get what `Comment.save()` gives clean comments in
+        synchronous mode: they are indexed for search, added to the daily
+        rollup and their posts' counters, and get their auto-responses
+        scheduled. Blocked comments are
+        kept, visible to their authors only, and counted per post and on the
+        day they were written. Run inside a transaction, with `post` loaded.
+        Returns the approved and the blocked comments.
+        """
+        approved: List[Comment] = []
+        blocked: List[Comment] = []
+        verdicts = check_swearing_many([comment.body for comment in comments])
+        for comment, is_profane in zip(comments, verdicts):
+            (blocked if is_profane else approved).append(comment)
+
+        for state, group in (
+            (Comment.Moderation.APPROVED, approved),
+            (Comment.Moderation.BLOCKED, blocked),
+        ):
+            if group:
+                self.filter(pk__in=[comment.pk for comment in group]).update(
+                    moderation=state
+                )
+            for comment in group:
+                comment.moderation = state
+
+        for post_id, count in Counter(comment.post_id for comment in blocked).items():
+            Post.objects.filter(pk=post_id).update(
+                amount_block_comment=F("amount_block_comment") + count
+            )
+        created_days = Counter(
+            (comment.post_id, timezone.localdate(comment.created))
+            for comment in approved
+        )
+        blocked_days = Counter(
+            (comment.post_id, timezone.localdate(comment.created))
+            for comment in blocked
+        )
+        for post_id, day in created_days.keys() | blocked_days.keys():
+            CommentDailyStats.record(
+                post_id,
+                day,
+                created=created_days[post_id, day],
+                blocked=blocked_days[post_id, day],
+            )
+
+        scopes = {cache.post_scope(comment.post.slug) for comment in comments}
+        if approved:
+            search.index_comments(approved)
+            Post.add_comments(approved)
+            scopes.add(cache.POST_LIST)
+        AutoResponse.objects.bulk_create(
+            [
+                AutoResponse.for_comment(comment)
+                for comment in approved
+                if comment.needs_auto_response()
+            ]
+        )
+        metrics.observe_moderation(approved, blocked)
+        cache.bump(*scopes)
+        return approved, blocked
+
+
 class Comment(models.Model):
     """
     Model representing a comment on a post.
     """
 
+    class Moderation(models.TextChoices):
+        """
+        Enum for the moderation state of a comment.
+        """
+
+        APPROVED = "AP", "Approved"
+        PENDING = "PD", "Pending"
+        BLOCKED = "BL", "Blocked"
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     author = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     body = models.TextField()
@@ -96,31 +433,130 @@ class Comment(models.Model):
     parent = models.ForeignKey(
         "self", null=True, blank=True, on_delete=models.CASCADE, related_name="replies"
     )
+    # Materialized path: the zero-padded ids of the ancestors and the comment
+    # itself, each followed by "/". Sorting by it lists a thread depth first.
+    # Annotated, as mypy would otherwise take instances' paths for the field.
+    path: str = PathField(default="", blank=True, editable=False)
+    is_auto_reply = models.BooleanField(default=False, editable=False)
+    moderation = models.CharField(
+        max_length=2,
+        choices=Moderation.choices,
+        default=Moderation.APPROVED,
+        editable=False,
+    )
+    objects = CommentQuerySet.as_manager()
+
+    PATH_STEP_WIDTH = 10
+    PATH_STEP_LENGTH = PATH_STEP_WIDTH + 1
 
     def save(self, *args: Any, **kwargs: Any) -> None:
         """
         Saves the comment instance after performing custom validation and modifications.
         If the post has an `auto_response_comment` and the comment doesn't have a parent,
-        sets the parent to the post's auto-response comment.
+        schedules the post's auto-response comment as a reply.
+        New comments get their materialized `path` right after the insert, and
+        new or edited bodies are indexed for search, in the same transaction.
+        With `COMMENT_MODERATION_ASYNC`, new comments other than auto-replies
+        are stored as pending without the profanity check and screened by the
+        `moderate_comments` task instead, which also does the rest.
         """
-        if check_swearing(self.body):
-            self.post.amount_block_comment += 1
-            self.post.save(update_fields=["amount_block_comment"])
+        is_new = self._state.adding
+        if is_new and settings.COMMENT_MODERATION_ASYNC and not self.is_auto_reply:
+            self.moderation = self.Moderation.PENDING
+            with transaction.atomic(savepoint=False):
+                super().save(*args, **kwargs)
+                self.path = self.build_path()
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
+            transaction.on_commit(tasks.schedule_moderation)
+            return
+
+        if touches_fields(kwargs.get("update_fields"), "body") and check_swearing(
+            self.body
+        ):
+            self.post.count_blocked_comment()
+            CommentDailyStats.record(self.post_id, timezone.localdate(), blocked=1)
             raise ValidationError("You cannot use swearing words in the title or body.")
 
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if touches_fields(kwargs.get("update_fields"), "body"):
+                search.index_comments([self])
+
+            if is_new:
+                self.path = self.build_path()
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
+                CommentDailyStats.record(
+                    self.post_id, timezone.localdate(self.created), created=1
+                )
+                Post.add_comments([self])
+                if self.needs_auto_response():
+                    AutoResponse.for_comment(self).save()
+        if is_new:
+            cache.bump(cache.POST_LIST, cache.post_scope(self.post.slug))
+        else:
+            cache.bump(cache.post_scope(self.post.slug))
+
+    def delete(self, *args: Any, **kwargs: Any) -> Tuple[int, Dict[str, int]]:
+        """
+        Deletes the comment, its search entry and the cached detail of its post.
 
-        if self.post.auto_response_comment and not self.parent:
-            time_response_minutes = self.post.time_response
-            set_auto_response_parent.apply_async(
-                (self.id,),
-                eta=timezone.now() + timedelta(minutes=time_response_minutes),
+        Replies are deleted with it, so the approved comments of the whole
+        subtree are uncounted from the post.
+        """
+        pk = self.pk
+        if self.path:
+            subtree = Comment.objects.filter(
+                post_id=self.post_id,
+                path__gte=self.path,
+                path__lt=self.path[:-1] + "0",
+            )
+        else:
+            subtree = Comment.objects.filter(pk=pk)
+        with transaction.atomic():
+            removed = subtree.approved().aggregate(
+                count=Count("pk"), replies=Count("pk", filter=Q(parent__isnull=False))
             )
+            deleted: Tuple[int, Dict[str, int]] = super().delete(*args, **kwargs)
+            if removed["count"]:
+                Post.remove_comments(self.post_id, removed["count"], removed["replies"])
+        search.unindex("Comment", [pk])
+        cache.bump(cache.POST_LIST, cache.post_scope(self.post.slug))
+        return deleted
+
+    def build_path(self) -> str:
+        """
+        Returns the materialized path of a saved comment from its parent's path.
+        """
+        parent_path = self.parent.path if self.parent_id else ""
+        return f"{parent_path}{self.id:0{self.PATH_STEP_WIDTH}d}/"
+
+    def needs_auto_response(self) -> bool:
+        """
+        Returns True if the comment is top-level on a post with an auto-response.
+        """
+        return not self.parent_id and bool(self.post.auto_response_comment)
 
     class Meta:
         ordering = ["-created"]
+        # `parent` is covered by the index Django creates for every foreign key.
         indexes = [
             models.Index(fields=["-created"]),
+            models.Index(fields=["post", "created"]),
+            models.Index(fields=["author", "created"]),
+            models.Index(fields=["post", "path"]),
+            # Keeps the moderation backlog cheap to drain and count.
+            models.Index(
+                fields=["created"],
+                condition=Q(moderation="PD"),
+                name="comment_pending_created_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["parent"],
+                condition=models.Q(is_auto_reply=True),
+                name="unique_auto_reply_per_parent",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -128,3 +564,93 @@ class Comment(models.Model):
         Returns a string representation of the comment.
         """
         return f"Comment by {self.author} on {self.post}"
+
+
+class CommentDailyStats(models.Model):
+    """
+    Daily rollup of created and blocked comments per post.
+
+    Rows are incremented as comments are saved or blocked, so a date range is
+    answered from at most one row per post and day instead of scanning comments.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    created_count = models.PositiveIntegerField(default=0)
+    blocked_count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def record(
+        cls, post_id: int, day: date, created: int = 0, blocked: int = 0
+    ) -> None:
+        """
+        Atomically adds the given counts to the row for the post and day.
+        """
+        changes = {
+            "created_count": F("created_count") + created,
+            "blocked_count": F("blocked_count") + blocked,
+        }
+        if cls.objects.filter(post_id=post_id, day=day).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    post_id=post_id,
+                    day=day,
+                    created_count=created,
+                    blocked_count=blocked,
+                )
+        except IntegrityError:
+            # Another writer created the row first.
+            cls.objects.filter(post_id=post_id, day=day).update(**changes)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(fields=["post", "day"], name="unique_post_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the daily stats.
+        """
+        return f"{self.day} stats for post {self.post_id}"
+
+
+class AutoResponse(models.Model):
+    """
+    Auto-reply due for a top-level comment.
+
+    Rows are drained in batches by the `send_due_auto_responses` beat task
+    instead of holding one ETA task per comment in the workers.
+    """
+
+    comment = models.OneToOneField(
+        Comment, on_delete=models.CASCADE, related_name="auto_response"
+    )
+    due_at = models.DateTimeField()
+    done = models.BooleanField(default=False)
+
+    @classmethod
+    def for_comment(cls, comment: Comment) -> "AutoResponse":
+        """
+        Returns an unsaved auto-response due after the post's `time_response`.
+        """
+        return cls(
+            comment=comment,
+            due_at=timezone.now() + timedelta(minutes=comment.post.time_response),
+        )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["done", "due_at"]),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the auto-response.
+        """
+        return f"Auto-response to comment {self.comment_id} due {self.due_at}"
@@ -0,0 +1,312 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple, Type
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+Position = Tuple[datetime, int]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on `(created, id)`, newest first.
+
+    The cursor encodes the last row of the page and the next page is fetched
+    with `created <= c AND (created < c OR (created = c AND id < i))`. The
+    plain bound lets the planner start the index scan at the cursor, so deep
+    pages cost the same as the first one.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    ordering_field = "created"
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Optional[APIView] = None
+    ) -> List[Any]:
+        """
+        Return the page of rows after the position in the request cursor.
+        """
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(
+        self, queryset: QuerySet, request: Request
+    ) -> List[Any]:
+        """
+        Return the page of rows after the position in the request cursor.
+        """
+        return self.set_page(
+            [row async for row in self.page_queryset(queryset, request)]
+        )
+
+    def page_queryset(self, queryset: QuerySet, request: Request) -> QuerySet:
+        """
+        Filter the queryset to the page after the cursor, plus one row.
+
+        The extra row only tells whether there is a next page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        queryset = queryset.order_by(f"-{field}", "-pk")
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            # The OR alone gives the planner no bound to seek the index to.
+            queryset = queryset.filter(
+                Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk}),
+                **{f"{field}__lte": value},
+            )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, rows: List[Any]) -> List[Any]:
+        """
+        Record whether a next page exists and drop the extra row.
+
+        Rows are model instances or `.values()` dicts.
+        """
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.next_position = self.get_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_position(self, row: Any) -> Position:
+        """
+        Return the ordering value and primary key of a model instance or dict.
+        """
+        if isinstance(row, dict):
+            return row[self.ordering_field], row["id"]
+        return getattr(row, self.ordering_field), row.pk
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Return the page size requested by the client, capped at `max_page_size`.
+        """
+        try:
+            page_size: int = _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size
+
+    def decode_cursor(self, request: Request) -> Optional[Position]:
+        """
+        Decode the cursor query parameter, or return None for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            value, pk = raw.rsplit("|", 1)
+            created = parse_datetime(value)
+            if created is None:
+                raise ValueError(value)
+            return created, int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: Position) -> str:
+        """
+        Return the absolute URL of the page that starts after the position.
+        """
+        value, pk = position
+        if not isinstance(value, datetime):
+            raise TypeError(f"Cannot encode a cursor at {value!r}, not a datetime.")
+        encoded = base64.urlsafe_b64encode(
+            f"{value.isoformat()}|{pk}".encode("ascii")
+        ).decode("ascii")
+        url: str = replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+        return url
+
+    def get_next_link(self) -> Optional[str]:
+        """
+        Return the URL of the next page, or None on the last page.
+        """
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Wrap the page in a response with a link to the next page.
+        """
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+class ActivityKeysetPagination(KeysetPagination):
+    """
+    Cursor pagination on `(activity, id)`, most recently active post first.
+
+    The queryset aliases `activity` to `Post.ACTIVITY`, so rows hold its
+    parts rather than the value itself, and the cursor bound seeks
+    `post_activity_idx` on the same expression.
+    """
+
+    ordering_field = "activity"
+
+    def get_position(self, row: Any) -> Position:
+        """
+        Return the last comment or creation time and primary key of a post.
+        """
+        if isinstance(row, dict):
+            return row["last_comment_at"] or row["created"], row["id"]
+        return row.last_comment_at or row.created, row.pk
+
+
+class ResultsSetPagination(PageNumberPagination):
+    """
+    Custom pagination class to control the pagination of results.
+
+    Passing a `cursor` query parameter, empty for the first page, switches to
+    `keyset_class` for clients that page deep into large lists.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    keyset_class: Type[KeysetPagination] = KeysetPagination
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Optional[APIView] = None
+    ) -> Optional[List[Any]]:
+        """
+        Paginate by page number, or by cursor when the client opts in.
+        """
+        self.keyset: Optional[KeysetPagination] = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        page: Optional[List[Any]] = super().paginate_queryset(queryset, request, view)
+        return page
+
+    async def apaginate_queryset(
+        self, queryset: QuerySet, request: Request
+    ) -> List[Any]:
+        """
+        Paginate like `paginate_queryset`, counting and fetching asynchronously.
+        """
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return await self.keyset.apaginate_queryset(queryset, request)
+
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.page.object_list = [row async for row in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Return the paginated response of whichever mode served the page.
+        """
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SearchPagination(BasePagination):
+    """
+    Page number pagination for ranked results, without a total count.
+
+    Counting every match of a common word would cost more than ranking the
+    page, so one extra row is fetched to tell whether a next page exists.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    page_query_param = "page"
+    invalid_page_message = "Invalid page."
+
+    def paginate_rows(
+        self, fetch: Callable[[int, int], List[Any]], request: Request
+    ) -> List[Any]:
+        """
+        Return the requested page of the rows `fetch(limit, offset)` returns.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page_number = _positive_int(
+                request.query_params.get(self.page_query_param, 1), strict=True
+            )
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        rows = fetch(self.page_size + 1, (self.page_number - 1) * self.page_size)
+        self.has_next = len(rows) > self.page_size
+        return rows[: self.page_size]
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Return the page size requested by the client, capped at `max_page_size`.
+        """
+        try:
+            page_size: int = _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size
+
+    def get_link(self, page_number: int) -> str:
+        """
+        Return the absolute URL of a page.
+        """
+        url: str = replace_query_param(
+            self.request.build_absolute_uri(), self.page_query_param, page_number
+        )
+        return url
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Wrap the page in a response with links to the neighbouring pages.
+        """
+        return Response(
+            {
+                "next": self.get_link(self.page_number + 1) if self.has_next else None,
+                "previous": (
+                    self.get_link(self.page_number - 1)
+                    if self.page_number > 1
+                    else None
+                ),
+                "results": data,
+            }
+        )
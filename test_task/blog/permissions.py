@@ -13,10 +13,10 @@ class IsAdminOrMyNoteOrReadOnly(permissions.BasePermission):
 
     def has_permission(self, request: Request, view: View) -> bool:
         """
-         Allow access to list and retrieve actions for everyone,
+         Allow access to list, retrieve and thread actions for everyone,
         but require authentication for other actions.
         """
-        if view.action in ["list", "retrieve"]:
+        if view.action in ["list", "retrieve", "thread"]:
             return True
 
         return bool(request.user.is_authenticated)
@@ -24,8 +24,9 @@ class IsAdminOrMyNoteOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request: Request, view: View, obj: Any) -> bool:
         """
         Allow access if the user is an admin or if the user is the owner of the object.
+        Ownership is checked on `author_id`, so the author is never loaded.
         """
         if request.user.is_staff:
             return True
 
-        return bool(obj.author == request.user)
+        return bool(request.user.is_authenticated and obj.author_id == request.user.pk)
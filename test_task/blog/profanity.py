@@ -0,0 +1,323 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from better_profanity import profanity
+from better_profanity.constants import ALLOWED_CHARACTERS
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+from django.conf import settings
+from django.core.cache import caches
+
+Span = Tuple[int, int]
+Node = Dict[str, "Node"]
+
+# Key marking the end of a word in the trie. Input characters are never empty,
+# so it cannot collide with a real edge.
+_END = ""
+
+
+class ProfanityFilter:
+    """
+    Compiled profanity matcher giving the same verdicts as ``better_profanity``.
+
+    The wordlist is compiled once into a trie of canonical words. Leetspeak
+    variants (``@`` for ``a``, ``$`` for ``s`` and so on) are resolved while
+    walking the trie through a reverse character map, so the variants never
+    have to be expanded. Text is split into words with a single compiled
+    regex and each word, together with the following words for multi-word
+    entries such as ``blow job`` or ``s.h.i.t``, is matched in one walk.
+    """
+
+    def __init__(self, words: Optional[Iterable[str]] = None) -> None:
+        """
+        Compile the given words, or the default ``better_profanity`` wordlist.
+        """
+        if words is None:
+            words = read_wordlist(get_complete_path_of_file("profanity_wordlist.txt"))
+
+        self.words = sorted({word.lower() for word in words})
+        self.version = hashlib.sha1("\n".join(self.words).encode()).hexdigest()[:12]
+        self.max_combinations = max(
+            [1]
+            + [
+                sum(char not in ALLOWED_CHARACTERS for char in word)
+                for word in self.words
+            ]
+        )
+        self._reverse_map = self._build_reverse_map(profanity.CHARS_MAPPING)
+        self._root: Node = {}
+        for word in self.words:
+            node = self._root
+            for char in word:
+                node = node.setdefault(char, {})
+            node[_END] = {}
+
+        self._word_re = re.compile(f"[{self._character_class(ALLOWED_CHARACTERS)}]+")
+
+    @staticmethod
+    def _character_class(chars: Iterable[str]) -> str:
+        """
+        Build a regex character class body, collapsing consecutive code points.
+
+        A class of individual characters is an order of magnitude slower to
+        match than the same set written as a few hundred ranges.
+        """
+        ranges: List[List[int]] = []
+        for code in sorted(ord(char) for char in chars):
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+        return "".join(
+            (
+                re.escape(chr(first))
+                if first == last
+                else f"{re.escape(chr(first))}-{re.escape(chr(last))}"
+            )
+            for first, last in ranges
+        )
+
+    @staticmethod
+    def _build_reverse_map(
+        chars_mapping: Dict[str, Tuple[str, ...]]
+    ) -> Dict[str, Tuple[str, ...]]:
+        """
+        Map every input character to the canonical characters it may stand for.
+        """
+        reverse: Dict[str, set] = {}
+        for canonical, variants in chars_mapping.items():
+            for variant in variants:
+                reverse.setdefault(variant, {variant}).add(canonical)
+        return {char: tuple(sorted(canonical)) for char, canonical in reverse.items()}
+
+    def _advance(self, states: List[Node], chunk: str) -> List[Node]:
+        """
+        Feed a chunk of lowercase text to every active trie node.
+        """
+        reverse_map = self._reverse_map
+        for char in chunk:
+            if not states:
+                break
+            candidates = reverse_map.get(char, (char,))
+            states = [
+                child
+                for node in states
+                for candidate in candidates
+                if (child := node.get(candidate)) is not None
+            ]
+        return states
+
+    @staticmethod
+    def _is_word(states: List[Node]) -> bool:
+        """
+        Return True if any active trie node terminates a word.
+        """
+        return any(_END in node for node in states)
+
+    def _match_at(self, text: str, words: List[Span], index: int) -> Optional[int]:
+        """
+        Return the index of the last word of a match starting at ``words[index]``.
+
+        Following words are tried first, both glued together and with their
+        original separators, before the word is checked on its own.
+        """
+        start, end = words[index]
+        states = self._advance([self._root], text[start:end].lower())
+        if not states:
+            return None
+
+        if end < len(text):
+            glued = separated = states
+            previous_end = end
+            lookahead = words[index + 1 : index + 1 + self.max_combinations]
+            for offset, (next_start, next_end) in enumerate(lookahead, 1):
+                if next_start >= len(text) - 1:
+                    break
+                glued = self._advance(glued, text[next_start:next_end].lower())
+                separated = self._advance(
+                    separated, text[previous_end:next_end].lower()
+                )
+                if self._is_word(glued) or self._is_word(separated):
+                    return index + offset
+                if not glued and not separated:
+                    break
+                previous_end = next_end
+
+        if self._is_word(states) and text[start:end] != "****":
+            return index
+        return None
+
+    def _scan(self, text: str, first_only: bool) -> List[Span]:
+        """
+        Scan the text left to right and collect the spans of profane words.
+        """
+        words = [match.span() for match in self._word_re.finditer(text)]
+        if not words or words[0][0] >= len(text) - 1:
+            return []
+
+        spans: List[Span] = []
+        index = 0
+        while index < len(words):
+            last = self._match_at(text, words, index)
+            if last is None:
+                index += 1
+                continue
+            spans.append((words[index][0], words[last][1]))
+            if first_only:
+                break
+            index = last + 1
+        return spans
+
+    def find(self, text: str) -> List[Span]:
+        """
+        Return the ``(start, end)`` spans of all profane words in the text.
+        """
+        return self._scan(text, first_only=False)
+
+    def contains_profanity(self, text: str) -> bool:
+        """
+        Return True if the text contains any profane word.
+        """
+        return bool(self._scan(text, first_only=True))
+
+
+class VerdictCache:
+    """
+    Two-tier cache of profanity verdicts in front of a ``ProfanityFilter``.
+
+    Verdicts are keyed by a hash of the text and the wordlist version, so a
+    changed wordlist never serves stale verdicts. The first tier is a bounded
+    in-process LRU, the second a Django cache shared by all workers (Redis in
+    production). The text is hashed exactly as given: case folding or
+    whitespace trimming can change the matcher's verdict on word boundaries.
+    """
+
+    def __init__(
+        self,
+        profanity_filter: ProfanityFilter,
+        maxsize: int = 10_000,
+        cache_alias: str = "default",
+        timeout: Optional[int] = None,
+    ) -> None:
+        self.profanity_filter = profanity_filter
+        self.maxsize = maxsize
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self._local: OrderedDict[str, bool] = OrderedDict()
+        self._version = profanity_filter.version
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "errors": 0}
+
+    def _key(self, text: str) -> str:
+        """
+        Return the cache key for the text under the current wordlist version.
+        """
+        digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+        return f"profanity:{self.profanity_filter.version}:{digest}"
+
+    def _get_local(self, key: str) -> Optional[bool]:
+        """
+        Look the key up in the in-process tier, dropping it if the wordlist changed.
+        """
+        with self._lock:
+            if self._version != self.profanity_filter.version:
+                self._local.clear()
+                self._version = self.profanity_filter.version
+            verdict = self._local.get(key)
+            if verdict is not None:
+                self._local.move_to_end(key)
+                self._stats["local_hits"] += 1
+            return verdict
+
+    def _set_local(self, key: str, verdict: bool) -> None:
+        """
+        Store a verdict in the in-process tier, evicting the least recently used.
+        """
+        with self._lock:
+            self._local[key] = verdict
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def contains_profanity(self, text: str) -> bool:
+        """
+        Return the cached verdict for the text, scanning it on a miss.
+        """
+        return self.contains_profanity_many([text])[0]
+
+    def contains_profanity_many(self, texts: List[str]) -> List[bool]:
+        """
+        Return the verdicts for many texts, in order.
+
+        Local misses are fetched from the shared tier with a single
+        `get_many`, and newly scanned verdicts stored with a single `set_many`,
+        so a batch costs at most two round trips to Redis.
+        """
+        keys = [self._key(text) for text in texts]
+        verdicts: Dict[str, bool] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            verdict = self._get_local(key)
+            if verdict is not None:
+                verdicts[key] = verdict
+            else:
+                missing[key] = text
+        if not missing:
+            return [verdicts[key] for key in keys]
+
+        shared = caches[self.cache_alias]
+        found: Dict[str, bool]
+        try:
+            found = shared.get_many(list(missing))
+        except Exception:
+            # The shared tier is an optimisation; a Redis outage must not
+            # block saves.
+            self._stats["errors"] += 1
+            found = {}
+        self._stats["shared_hits"] += len(found)
+
+        scanned = {
+            key: self.profanity_filter.contains_profanity(text)
+            for key, text in missing.items()
+            if key not in found
+        }
+        self._stats["misses"] += len(scanned)
+        if scanned:
+            try:
+                shared.set_many(scanned, self.timeout)
+            except Exception:
+                self._stats["errors"] += 1
+
+        for key, value in {**found, **scanned}.items():
+            verdict = bool(value)
+            self._set_local(key, verdict)
+            verdicts[key] = verdict
+        return [verdicts[key] for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the hit, miss and error counters and the local tier size.
+        """
+        with self._lock:
+            return {**self._stats, "local_size": len(self._local)}
+
+    def clear(self) -> None:
+        """
+        Empty the in-process tier and reset the counters.
+        """
+        with self._lock:
+            self._local.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+profanity_filter = ProfanityFilter(
+    read_wordlist(settings.PROFANITY_WORDLIST) if settings.PROFANITY_WORDLIST else None
+)
+verdict_cache = VerdictCache(
+    profanity_filter,
+    maxsize=settings.PROFANITY_CACHE_SIZE,
+    timeout=settings.PROFANITY_CACHE_TIMEOUT,
+)
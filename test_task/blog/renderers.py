@@ -0,0 +1,36 @@
+from typing import Any, Mapping, Optional
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer producing the same output as DRF's, encoded with orjson.
+
+    Datetimes and every type orjson does not know, such as lazy translation
+    strings and decimals, are passed to DRF's encoder so they are formatted
+    as before. Requests for indented output fall back to the DRF renderer.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[Mapping[str, Any]] = None,
+    ) -> bytes:
+        """
+        Render the data into compact UTF-8 JSON.
+        """
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            rendered: bytes = super().render(
+                data, accepted_media_type, renderer_context
+            )
+            return rendered
+        return orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
@@ -0,0 +1,337 @@
+"""
+Full-text search over posts and comments.
+
+On SQLite every model has an FTS5 table keyed by the row id, kept in sync by
+`Post.save`, `Comment.save` and `create_many` in the same transaction as the
+row. On PostgreSQL the tables carry GIN indexes on their `to_tsvector`
+expressions, which the database maintains itself, so the sync calls do
+nothing. `install` creates either after `migrate`, and the
+`rebuild_search_index` command fills the FTS5 tables from existing rows.
+
+Hits only carry the row id, rank and highlighted fragments; callers load the
+rows themselves. Highlights are HTML-escaped with matches wrapped in `<mark>`.
+"""
+
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.apps import apps
+from django.db import connections
+
+# Tokenized like the default PostgreSQL configuration: stemmed, case and
+# accent insensitive.
+SQLITE_TOKENIZER = "porter unicode61 remove_diacritics 2"
+POSTGRES_CONFIG = "english"
+POST_TITLE_WEIGHT = 10.0
+
+# Private use characters mark the matches in raw fragments, so user text
+# can be escaped before they become tags.
+_START = "\ue000"
+_END = "\ue001"
+_SNIPPET_TOKENS = 24
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Hit:
+    """
+    A matching row: its id, rank (higher is better) and highlighted fields.
+    """
+
+    id: int
+    rank: float
+    highlights: Dict[str, str]
+
+
+def _vendor(using: str) -> str:
+    """
+    Return the vendor of a database alias, such as "sqlite" or "postgresql".
+    """
+    vendor: str = connections[using].vendor
+    return vendor
+
+
+def _table(model_name: str, suffix: str = "") -> str:
+    """
+    Return the table name of a blog model, with an optional suffix.
+    """
+    table: str = apps.get_model("blog", model_name)._meta.db_table
+    return table + suffix
+
+
+def _post_document() -> str:
+    """
+    Return the indexed `tsvector` expression of posts, titles weighted highest.
+    """
+    return (
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', title), 'A') || "
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', body), 'D')"
+    )
+
+
+def _comment_document() -> str:
+    """
+    Return the indexed `tsvector` expression of comments.
+    """
+    return f"to_tsvector('{POSTGRES_CONFIG}', body)"
+
+
+def install(using: str = "default") -> None:
+    """
+    Create the search tables or indexes if they do not exist.
+    """
+    vendor = _vendor(using)
+    with connections[using].cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {_table('Post', '_search')} "
+                f"USING fts5(title, body, tokenize='{SQLITE_TOKENIZER}')"
+            )
+            # Rank title matches above body matches, like the PostgreSQL
+            # weights.
+            cursor.execute(
+                f"INSERT INTO {_table('Post', '_search')} "
+                f"({_table('Post', '_search')}, rank) "
+                f"VALUES ('rank', 'bm25({POST_TITLE_WEIGHT}, 1.0)')"
+            )
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {_table('Comment', '_search')} "
+                f"USING fts5(body, tokenize='{SQLITE_TOKENIZER}')"
+            )
+        elif vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {_table('Post', '_search')} "
+                f"ON {_table('Post')} USING GIN ({_post_document()})"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {_table('Comment', '_search')} "
+                f"ON {_table('Comment')} USING GIN ({_comment_document()})"
+            )
+
+
+def index_posts(posts: Iterable[Any], using: str = "default") -> None:
+    """
+    Add or replace the index entries of saved posts.
+    """
+    if _vendor(using) != "sqlite":
+        return
+    rows = [(post.pk, post.title, post.body) for post in posts]
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {_table('Post', '_search')} "
+            "(rowid, title, body) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def index_comments(comments: Iterable[Any], using: str = "default") -> None:
+    """
+    Add or replace the index entries of saved comments.
+    """
+    if _vendor(using) != "sqlite":
+        return
+    rows = [(comment.pk, comment.body) for comment in comments]
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {_table('Comment', '_search')} "
+            "(rowid, body) VALUES (%s, %s)",
+            rows,
+        )
+
+
+def unindex(model_name: str, ids: Iterable[int], using: str = "default") -> None:
+    """
+    Remove the index entries of deleted rows.
+
+    Rows deleted in bulk, such as the comments of a deleted post, may leave
+    entries behind; searches join the table, so these are never returned.
+    """
+    if _vendor(using) != "sqlite":
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {_table(model_name, '_search')} WHERE rowid = %s",
+            [(pk,) for pk in ids],
+        )
+
+
+def rebuild(using: str = "default") -> Tuple[int, int]:
+    """
+    Refill the search tables from every post and comment.
+
+    Returns the number of posts and comments indexed.
+    """
+    install(using)
+    posts = apps.get_model("blog", "Post").objects.using(using).count()
+    comments = apps.get_model("blog", "Comment").objects.using(using).count()
+    if _vendor(using) != "sqlite":
+        return posts, comments
+    with connections[using].cursor() as cursor:
+        for model_name, columns in (("Post", "title, body"), ("Comment", "body")):
+            table = _table(model_name, "_search")
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM {_table(model_name)}"
+            )
+            # Merge the index segments written by the bulk insert.
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    return posts, comments
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn user input into an FTS5 query matching all of its words.
+
+    Every word is quoted, so operators and syntax characters in the input
+    are searched for literally instead of failing the query.
+    """
+    return " ".join(f'"{word}"' for word in _WORD.findall(query))
+
+
+def _highlight(fragment: str) -> str:
+    """
+    Escape a raw fragment and turn its match markers into `<mark>` tags.
+    """
+    return (
+        html.escape(fragment or "").replace(_START, "<mark>").replace(_END, "</mark>")
+    )
+
+
+def _hits(rows: List[Tuple[Any, ...]], fields: List[str]) -> List[Hit]:
+    """
+    Build hits from `(id, rank, *fragments)` rows.
+    """
+    return [
+        Hit(
+            id=row[0],
+            rank=float(row[1]),
+            highlights={
+                field: _highlight(fragment) for field, fragment in zip(fields, row[2:])
+            },
+        )
+        for row in rows
+    ]
+
+
+def search_posts(
+    query: str, limit: int, offset: int = 0, using: str = "default"
+) -> List[Hit]:
+    """
+    Return the published posts matching every word of the query, best first.
+    """
+    vendor = _vendor(using)
+    status = apps.get_model("blog", "Post").Status.PUBLISHED
+    if vendor == "sqlite":
+        match = match_expression(query)
+        if not match:
+            return []
+        table = _table("Post", "_search")
+        sql = (
+            f"SELECT {table}.rowid, -{table}.rank, "
+            f"highlight({table}, 0, %s, %s), "
+            f"snippet({table}, 1, %s, %s, '…', {_SNIPPET_TOKENS}) "
+            f"FROM {table} JOIN {_table('Post')} p ON p.id = {table}.rowid "
+            f"WHERE {table} MATCH %s AND p.status = %s "
+            f"ORDER BY {table}.rank, {table}.rowid DESC LIMIT %s OFFSET %s"
+        )
+        params: List[Any] = [_START, _END, _START, _END, match, status]
+    elif vendor == "postgresql":
+        sql = (
+            "SELECT id, rank, "
+            f"ts_headline('{POSTGRES_CONFIG}', title, q, %s), "
+            f"ts_headline('{POSTGRES_CONFIG}', body, q, %s) FROM ("
+            f"SELECT id, title, body, q, ts_rank({_post_document()}, q) AS rank "
+            f"FROM {_table('Post')}, plainto_tsquery('{POSTGRES_CONFIG}', %s) q "
+            f"WHERE {_post_document()} @@ q AND status = %s "
+            "ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s) ranked "
+            "ORDER BY rank DESC, id DESC"
+        )
+        params = [_headline_options(0), _headline_options(), query, status]
+    else:
+        raise NotImplementedError(f"Search is not supported on {vendor}.")
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return _hits(cursor.fetchall(), ["title", "body"])
+
+
+def search_comments(
+    query: str,
+    limit: int,
+    offset: int = 0,
+    using: str = "default",
+    include_hidden: bool = False,
+    author_id: Optional[int] = None,
+) -> List[Hit]:
+    """
+    Return the comments matching every word of the query, best first.
+
+    Only approved comments and those of `author_id` match, as in
+    `CommentQuerySet.visible_to`, unless `include_hidden` is set for staff.
+    """
+    vendor = _vendor(using)
+    visibility, visibility_params = _comment_visibility(include_hidden, author_id)
+    if vendor == "sqlite":
+        match = match_expression(query)
+        if not match:
+            return []
+        table = _table("Comment", "_search")
+        sql = (
+            f"SELECT {table}.rowid, -{table}.rank, "
+            f"snippet({table}, 0, %s, %s, '…', {_SNIPPET_TOKENS}) "
+            f"FROM {table} JOIN {_table('Comment')} c ON c.id = {table}.rowid "
+            f"WHERE {table} MATCH %s{visibility} "
+            f"ORDER BY {table}.rank, {table}.rowid DESC LIMIT %s OFFSET %s"
+        )
+        params: List[Any] = [_START, _END, match, *visibility_params]
+    elif vendor == "postgresql":
+        sql = (
+            "SELECT id, rank, "
+            f"ts_headline('{POSTGRES_CONFIG}', body, q, %s) FROM ("
+            f"SELECT c.id, c.body, q, ts_rank({_comment_document()}, q) AS rank "
+            f"FROM {_table('Comment')} c, "
+            f"plainto_tsquery('{POSTGRES_CONFIG}', %s) q "
+            f"WHERE {_comment_document()} @@ q{visibility} "
+            "ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s) ranked "
+            "ORDER BY rank DESC, id DESC"
+        )
+        params = [_headline_options(), query, *visibility_params]
+    else:
+        raise NotImplementedError(f"Search is not supported on {vendor}.")
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return _hits(cursor.fetchall(), ["body"])
+
+
+def _comment_visibility(
+    include_hidden: bool, author_id: Optional[int]
+) -> Tuple[str, List[Any]]:
+    """
+    Return the condition on the comment table `c` limiting matches to the
+    readable comments, and its parameters.
+    """
+    if include_hidden:
+        return "", []
+    approved = apps.get_model("blog", "Comment").Moderation.APPROVED
+    if author_id is None:
+        return " AND c.moderation = %s", [approved]
+    return " AND (c.moderation = %s OR c.author_id = %s)", [approved, author_id]
+
+
+def _headline_options(max_words: int = _SNIPPET_TOKENS) -> str:
+    """
+    Return `ts_headline` options marking matches like the FTS5 fragments.
+
+    `max_words=0` highlights the whole text, as FTS5 `highlight()` does.
+    """
+    options = f'StartSel="{_START}", StopSel="{_END}"'
+    if max_words:
+        options += f", MaxWords={max_words}, MinWords={max_words // 2}"
+    else:
+        options += ", HighlightAll=true"
+    return options
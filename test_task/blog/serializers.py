@@ -1,6 +1,10 @@
-from typing import Union
+from typing import Any, Dict, Iterable, List, Optional, Union
 
-from rest_framework import serializers
+from django.db import models
+from django.db.models.functions import Substr
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from .models import Comment, Post
 
@@ -19,3 +23,148 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields: Union[list[str], str] = "__all__"
+
+
+class ValuesSerializerMixin:
+    """
+    Fast path for list endpoints that reads `.values()` rows.
+
+    `values()` fetches only the `Meta.fields` columns and skips building model
+    instances; `represent()` then formats the datetimes in place as DRF would
+    and leaves every other value as the database returned it, instead of
+    running each field's `to_representation` per row.
+    """
+
+    class Meta:
+        model: Any
+        fields: List[str]
+
+    @classmethod
+    def annotate(cls, queryset: models.QuerySet) -> models.QuerySet:
+        """
+        Add the computed columns listed in `Meta.fields`.
+        """
+        return queryset
+
+    @classmethod
+    def values(cls, queryset: models.QuerySet) -> models.QuerySet:
+        """
+        Return the queryset as dicts holding only the serialized fields.
+        """
+        return cls.annotate(queryset).values(*cls.Meta.fields)
+
+    @classmethod
+    def represent(cls, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Format the datetime columns of `values()` rows in place.
+
+        ISO 8601 output is built directly, as `DateTimeField` would in the
+        current time zone, which is several times faster per value.
+        """
+        names = [
+            model_field.name
+            for model_field in cls.Meta.model._meta.concrete_fields
+            if isinstance(model_field, models.DateTimeField)
+            and model_field.name in cls.Meta.fields
+        ]
+        if api_settings.DATETIME_FORMAT != ISO_8601:
+            field = serializers.DateTimeField()
+            for row in rows:
+                for name in names:
+                    row[name] = field.to_representation(row[name])
+            return rows
+
+        tz = timezone.get_current_timezone()
+        for row in rows:
+            for name in names:
+                value = row[name]
+                if value is not None:
+                    value = value.astimezone(tz).isoformat()
+                    if value.endswith("+00:00"):
+                        value = value[:-6] + "Z"
+                row[name] = value
+        return rows
+
+
+class PostListSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for posts in lists, with a body excerpt instead of the body.
+    """
+
+    excerpt = serializers.CharField(read_only=True)
+    excerpt_length = 200
+
+    class Meta:
+        model = Post
+        fields = [
+            "id",
+            "title",
+            "slug",
+            "author",
+            "status",
+            "created",
+            "updated",
+            "comment_count",
+            "reply_count",
+            "last_comment_at",
+            "excerpt",
+        ]
+
+    @classmethod
+    def annotate(cls, queryset: models.QuerySet) -> models.QuerySet:
+        """
+        Cut the excerpt in the database, so the full body is never fetched.
+        """
+        return queryset.annotate(excerpt=Substr("body", 1, cls.excerpt_length))
+
+
+class CommentListSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for comments in lists, without the internal thread columns.
+    """
+
+    class Meta:
+        model = Comment
+        fields = ["id", "post", "author", "parent", "body", "created"]
+
+
+class CommentBulkItemSerializer(serializers.Serializer):
+    """
+    Serializer for one comment of a bulk create request.
+
+    References are plain ids; the view resolves them for the whole batch
+    with one query per model instead of one per item.
+    """
+
+    post = serializers.IntegerField(min_value=1)
+    body = serializers.CharField()
+    parent = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+
+def build_comment_thread(
+    comments: Iterable[Comment], root: Optional[Comment], breadth: int
+) -> List[Dict[str, Any]]:
+    """
+    Nest comments ordered by materialized path under their parents in one pass.
+
+    Parents always precede their replies in path order, so each comment is
+    attached through a dict lookup. Replies beyond `breadth` per parent are
+    dropped together with their subtrees.
+    """
+    comments = list(comments)
+    top_level: List[Dict[str, Any]] = []
+    nodes: Dict[int, Dict[str, Any]] = {}
+    root_id = root.pk if root else None
+    for comment, data in zip(comments, CommentSerializer(comments, many=True).data):
+        if comment.parent_id == root_id:
+            siblings = top_level
+        elif comment.parent_id in nodes:
+            siblings = nodes[comment.parent_id]["replies"]
+        else:
+            continue
+        if len(siblings) >= breadth:
+            continue
+        node = {**data, "replies": []}
+        nodes[comment.pk] = node
+        siblings.append(node)
+    return top_level
@@ -1,31 +1,129 @@
+import logging
+import time
 from typing import Any, Optional
 
 from celery import shared_task
 from django.apps import apps
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError as BrokerError
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def set_auto_response_parent(comment_id: int) -> None:
+# Errors worth retrying: lost connections, lock timeouts, "database is locked".
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+# When this process may publish the next moderation run, in monotonic seconds.
+_next_moderation_publish = 0.0
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=TRANSIENT_DB_ERRORS,
+    retry_backoff=True,
+    max_retries=3,
+)
+def send_due_auto_responses(batch_size: Optional[int] = None) -> int:
+    """
+    Posts the replies of all auto-responses that are due, a batch at a time.
+
+    Each batch selects due rows, creates their replies with one bulk insert
+    and marks the rows done in the same transaction. Comments that already
+    have an auto-reply are skipped, so a rerun or a concurrent run never
+    posts a second reply or trips the unique constraint. Run periodically by
+    Celery beat, so broker load does not grow with the number of comments.
+    """
+    AutoResponse: Any = apps.get_model("blog", "AutoResponse")
+    Comment: Any = apps.get_model("blog", "Comment")
+    batch_size = batch_size or settings.AUTO_RESPONSE_BATCH_SIZE
+    sent = 0
+
+    while True:
+        with transaction.atomic():
+            due = list(
+                AutoResponse.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("comment__post")
+                .filter(done=False, due_at__lte=timezone.now())
+                .order_by("due_at")[:batch_size]
+            )
+            if not due:
+                return sent
+
+            answered = set(
+                Comment.objects.filter(
+                    parent_id__in=[row.comment_id for row in due], is_auto_reply=True
+                ).values_list("parent_id", flat=True)
+            )
+            replies = [
+                Comment(
+                    parent=auto_response.comment,
+                    post=auto_response.comment.post,
+                    body=auto_response.comment.post.auto_response_comment,
+                    author_id=auto_response.comment.post.author_id,
+                    is_auto_reply=True,
+                )
+                for auto_response in due
+                if auto_response.comment.post.auto_response_comment
+                and auto_response.comment_id not in answered
+            ]
+            created, _ = Comment.objects.create_many(replies)
+            AutoResponse.objects.filter(pk__in=[row.pk for row in due]).update(
+                done=True
+            )
+        sent += len(created)
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=TRANSIENT_DB_ERRORS,
+    retry_backoff=True,
+    max_retries=3,
+)
+def moderate_comments(batch_size: Optional[int] = None) -> int:
+    """
+    Screens pending comments, a batch at a time, until none are left.
+
+    Each batch is locked with SKIP LOCKED and settled by
+    `Comment.objects.moderate` in one transaction, so the workers of the
+    moderation queue share the backlog without screening a comment twice.
+    Queued shortly after comments are created, and run by Celery beat every
+    `COMMENT_MODERATION_MAX_LAG` seconds for comments whose run was lost.
+    """
+    Comment: Any = apps.get_model("blog", "Comment")
+    batch_size = batch_size or settings.COMMENT_MODERATION_BATCH_SIZE
+    moderated = 0
+
+    while True:
+        with transaction.atomic():
+            pending = list(
+                Comment.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("post")
+                .filter(moderation=Comment.Moderation.PENDING)
+                .order_by("created")[:batch_size]
+            )
+            if not pending:
+                return moderated
+            Comment.objects.moderate(pending)
+        moderated += len(pending)
+
+
+def schedule_moderation() -> None:
     """
-    Sets the parent of a comment to the post's auto-response comment after a delay.
+    Queues a moderation run after `COMMENT_MODERATION_DELAY` seconds.
 
-    This function is used to automatically set the `parent` field of a comment
-    to `post.auto_response_comment` if the comment was created without a parent,
-    and if the post has an `auto_response_comment`. This is executed after a delay
-    specified by the `time_response` attribute of the post.
+    A run screens every comment pending when it starts, so each process
+    publishes at most one run per delay, and comments created meanwhile
+    are screened together in batches. If the broker is unreachable, the
+    comments wait for the periodic run instead of failing the request.
     """
+    global _next_moderation_publish
+    now = time.monotonic()
+    if now < _next_moderation_publish:
+        return
+    delay = settings.COMMENT_MODERATION_DELAY
+    _next_moderation_publish = now + delay
     try:
-        Comment: Any = apps.get_model("blog", "Comment")
-        comment: Optional[Any] = Comment.objects.get(id=comment_id)
-
-        if comment is None:
-            raise RuntimeError("Comment not found")
-
-        Comment.objects.create(
-            parent=comment,
-            post=comment.post,
-            body=comment.post.auto_response_comment,
-            author=comment.post.author,
-        )
-    except Exception:
-        raise RuntimeError("Something went wrong, try again")
+        moderate_comments.apply_async(countdown=delay)
+    except BrokerError:
+        logger.warning("Could not queue comment moderation.", exc_info=True)
@@ -1,14 +1,54 @@
-from datetime import datetime
+import csv
+import gzip
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
 
+from asgiref.sync import sync_to_async
+from better_profanity import profanity
+from celery.signals import after_task_publish, before_task_publish
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
-from django.urls import reverse
+from django.core.management import call_command
+from django.db import OperationalError, connection, models
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from prometheus_client import REGISTRY
 from rest_framework import status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Comment, Post
+from . import cache, throttling
+from .models import AutoResponse, Comment, CommentDailyStats, Post
+from .pagination import ActivityKeysetPagination, KeysetPagination
+from .profanity import ProfanityFilter, VerdictCache, profanity_filter
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CommentListSerializer,
+    CommentSerializer,
+    PostListSerializer,
+    PostSerializer,
+)
+from .tasks import moderate_comments, send_due_auto_responses
+from .urls import async_urlpatterns
+from .views import CommentViewSet, PostViewSet
 
 
 class PostViewSetTest(APITestCase):
@@ -203,11 +243,1963 @@ class PostViewSetTest(APITestCase):
         self.post.time_response = 1
         self.post.save()
 
-        Comment.objects.create(
+        comment = Comment.objects.create(
             post=self.post,
             author=self.user,
             body="Hi how are you?",
         )
+        self.assertEqual(send_due_auto_responses(), 0)
+
+        AutoResponse.objects.filter(comment=comment).update(due_at=timezone.now())
+        self.assertEqual(send_due_auto_responses(), 1)
 
         last = Comment.objects.first()
         self.assertEqual(last.body, self.post.auto_response_comment)
+
+
+class ProfanityFilterTest(SimpleTestCase):
+    samples = [
+        "",
+        "f",
+        "ok f",
+        "Hello there, nice post!",
+        "Fuck you",
+        "what the fvck",
+        "you are an @$$hole",
+        "sh!t happens",
+        "s.h.i.t.",
+        "fu ck this",
+        "nice blow job there",
+        "blow  job",
+        "classic assignment",
+        "Scunthorpe is a town",
+        "****",
+        "  b1tch  ",
+        "2 girls 1 cup",
+        "multi\nline\tshit",
+    ]
+
+    def test_same_verdicts_as_better_profanity(self) -> None:
+        """
+        The compiled filter agrees with better_profanity on every sample.
+        """
+        for text in self.samples:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    profanity_filter.contains_profanity(text),
+                    profanity.contains_profanity(text),
+                )
+
+    def test_find_returns_spans(self) -> None:
+        """
+        Matches are reported as spans, multi-word entries as a single span.
+        """
+        text = "well Fuck, that blow job was sh1t"
+        spans = profanity_filter.find(text)
+        self.assertEqual(
+            [text[start:end] for start, end in spans], ["Fuck", "blow job", "sh1t"]
+        )
+
+    def test_custom_wordlist(self) -> None:
+        """
+        A filter compiled from custom words applies the leetspeak variants.
+        """
+        custom = ProfanityFilter(["potato"])
+        self.assertTrue(custom.contains_profanity("a hot P0t@to"))
+        self.assertFalse(custom.contains_profanity("Fuck you"))
+
+
+class VerdictCacheTest(TestCase):
+    def setUp(self) -> None:
+        """
+        Use a fresh cache so counters start from zero.
+        """
+        self.cache = VerdictCache(ProfanityFilter(["potato"]), maxsize=2)
+
+    def test_repeated_text_is_served_from_cache(self) -> None:
+        """
+        The second check of the same text is a local hit and does not rescan.
+        """
+        with mock.patch.object(
+            self.cache.profanity_filter,
+            "contains_profanity",
+            wraps=self.cache.profanity_filter.contains_profanity,
+        ) as scan:
+            self.assertTrue(self.cache.contains_profanity("hot potato"))
+            self.assertTrue(self.cache.contains_profanity("hot potato"))
+        self.assertEqual(scan.call_count, 1)
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["local_hits"], 1)
+
+    def test_batch_verdicts_keep_order(self) -> None:
+        """
+        A batch returns one verdict per text and scans duplicates once.
+        """
+        verdicts = self.cache.contains_profanity_many(["potato", "salad", "potato"])
+        self.assertEqual(verdicts, [True, False, True])
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_local_tier_is_bounded(self) -> None:
+        """
+        The least recently used verdict is evicted once the tier is full.
+        """
+        for text in ["one", "two", "three"]:
+            self.cache.contains_profanity(text)
+        self.assertEqual(self.cache.stats()["local_size"], 2)
+
+    def test_wordlist_change_invalidates_verdicts(self) -> None:
+        """
+        Verdicts computed under an old wordlist are not reused.
+        """
+        self.assertFalse(self.cache.contains_profanity("fresh tomato"))
+        self.cache.profanity_filter = ProfanityFilter(["tomato"])
+        self.assertTrue(self.cache.contains_profanity("fresh tomato"))
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_non_text_saves_skip_scanning(self) -> None:
+        """
+        Saves limited to non-text fields never call the profanity check.
+        """
+        post = Post.objects.create(title="Post", slug="post", body="Body")
+        with mock.patch("blog.models.check_swearing", return_value=False) as check:
+            post.amount_block_comment = 1
+            post.save(update_fields=["amount_block_comment"])
+            check.assert_not_called()
+            post.save(update_fields=["body"])
+            check.assert_called()
+
+
+class BlockedCommentCounterTest(TransactionTestCase):
+    def test_parallel_blocked_comments_are_all_counted(self) -> None:
+        """
+        Thousands of concurrent profane comments leave no lost increments.
+        """
+        post = Post.objects.create(title="Hot post", slug="hot-post", body="Body")
+        workers, attempts = 8, 250
+
+        def spam(_: int) -> int:
+            blocked = 0
+            try:
+                for _ in range(attempts):
+                    try:
+                        Comment.objects.create(
+                            post=Post.objects.get(pk=post.pk), body="shit"
+                        )
+                    except ValidationError:
+                        blocked += 1
+            finally:
+                connection.close()
+            return blocked
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            blocked = sum(executor.map(spam, range(workers)))
+
+        post.refresh_from_db()
+        self.assertEqual(blocked, workers * attempts)
+        self.assertEqual(post.amount_block_comment, workers * attempts)
+        self.assertFalse(Comment.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Checks SQLite pragmas.")
+class SqliteConnectionTest(TestCase):
+    def test_connections_use_wal_and_busy_timeout(self) -> None:
+        """
+        Every connection waits for the write lock instead of failing at once.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+
+class CommentDailyBreakdownTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a post with a few clean and blocked comments today.
+        """
+        self.admin_user = User.objects.create_superuser(
+            username="admin", password="adminpass", email="admin@example.com"
+        )
+        self.post = Post.objects.create(
+            title="Stats", slug="stats", body="Body", status="PB"
+        )
+        for body in ["Nice", "Great", "shit"]:
+            try:
+                Comment.objects.create(post=self.post, body=body)
+            except ValidationError:
+                pass
+        self.today = timezone.localdate()
+        self.url = reverse("comments-daily-breakdown")
+
+    def test_rollup_is_updated_incrementally(self) -> None:
+        """
+        Saving and blocking comments maintains a single row per post and day.
+        """
+        stats = CommentDailyStats.objects.get(post=self.post, day=self.today)
+        self.assertEqual(stats.created_count, 2)
+        self.assertEqual(stats.blocked_count, 1)
+
+    def test_breakdown(self) -> None:
+        """
+        The endpoint returns per-day counts within the range.
+        """
+        CommentDailyStats.objects.create(
+            post=self.post, day=date(2020, 2, 3), created_count=4, blocked_count=1
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        response: Response = self.client.get(
+            self.url, {"date_from": "2020-02-02", "date_to": "2022-02-15"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["days"],
+            [{"day": date(2020, 2, 3), "created": 4, "blocked": 1}],
+        )
+        self.assertEqual(response.data["created"], 4)
+
+    def test_breakdown_invalid_dates(self) -> None:
+        """
+        Malformed or reversed dates are rejected.
+        """
+        self.client.force_authenticate(user=self.admin_user)
+        for params in [
+            {"date_from": "2020-02-30", "date_to": "2020-03-01"},
+            {"date_from": "2021-01-01", "date_to": "2020-01-01"},
+            {},
+        ]:
+            response: Response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_breakdown_requires_staff(self) -> None:
+        """
+        Anonymous users cannot read the analytics.
+        """
+        response: Response = self.client.get(
+            self.url, {"date_from": "2020-02-02", "date_to": "2022-02-15"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_backfill_recounts_created_comments(self) -> None:
+        """
+        The backfill command counts approved comments as created, adds stored
+        blocked comments and keeps the blocked counts of rejected ones.
+        """
+        CommentDailyStats.objects.all().update(created_count=99)
+        Comment.objects.filter(body="Nice").update(
+            created=timezone.make_aware(datetime(2024, 6, 1, 12))
+        )
+        Comment.objects.filter(body="Great").update(
+            moderation=Comment.Moderation.PENDING
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post, body="Held back", moderation=Comment.Moderation.BLOCKED
+            )
+            for _ in range(2)
+        )
+
+        call_command("backfill_comment_stats", stdout=StringIO())
+
+        self.assertEqual(
+            CommentDailyStats.objects.get(post=self.post, day=self.today).created_count,
+            0,
+        )
+        self.assertEqual(
+            CommentDailyStats.objects.get(post=self.post, day=self.today).blocked_count,
+            2,
+        )
+        self.assertEqual(
+            CommentDailyStats.objects.get(
+                post=self.post, day=date(2024, 6, 1)
+            ).created_count,
+            1,
+        )
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Checks SQLite query plans.")
+class CommentRangeQueryPlanTest(TestCase):
+    comments = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """
+        Insert a million comments spread over 2024 across a hundred posts.
+        """
+        cls.posts = [
+            Post.objects.create(title=f"Post {num}", slug=f"post-{num}", body="Body")
+            for num in range(100)
+        ]
+        first = cls.posts[0].pk
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH RECURSIVE seq(n) AS (
+                    SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < %s
+                )
+                INSERT INTO blog_comment
+                    (post_id, body, path, is_auto_reply, moderation, created)
+                SELECT %s + n %% 100, 'Comment', '', 0, 'AP',
+                       datetime('2024-01-01', '+' || (n * 31) || ' seconds')
+                FROM seq
+                """,
+                [cls.comments, first],
+            )
+            cursor.execute("ANALYZE")
+
+    def test_date_range_uses_post_created_index(self) -> None:
+        """
+        The range filter is a single index range scan, ordered by the index.
+        """
+        queryset = Comment.objects.filter(post=self.posts[0]).created_between(
+            date(2024, 3, 1), date(2024, 3, 31)
+        )
+        plan = queryset.explain()
+        self.assertIn("USING INDEX", plan)
+        self.assertIn("post_id=? AND created>? AND created<?", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertEqual(queryset.count(), 864)
+        self.assertIn(
+            "post_id=? AND created>? AND created<?", queryset.approved().explain()
+        )
+
+    def test_author_range_uses_author_created_index(self) -> None:
+        """
+        Filtering one author's comments by date also avoids a scan.
+        """
+        plan = (
+            Comment.objects.filter(author_id=1)
+            .created_between(date(2024, 3, 1), date(2024, 3, 31))
+            .explain()
+        )
+        self.assertIn("author_id=? AND created>? AND created<?", plan)
+
+
+class CommentCursorPaginationTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a post with 25 comments, ten of which share one timestamp.
+        """
+        self.post = Post.objects.create(
+            title="Viral", slug="viral", body="Body", status="PB"
+        )
+        self.comments = [
+            Comment.objects.create(post=self.post, body=f"Comment {num}")
+            for num in range(25)
+        ]
+        Comment.objects.filter(pk__in=[c.pk for c in self.comments[:10]]).update(
+            created=timezone.make_aware(datetime(2024, 1, 1))
+        )
+        self.url_detail = reverse("post-detail", kwargs={"slug": self.post.slug})
+
+    def test_retrieve_walks_all_comments_by_cursor(self) -> None:
+        """
+        Following `next` visits every comment once, newest first.
+        """
+        seen: List[int] = []
+        url: Optional[str] = self.url_detail + "?page_size=4"
+        while url:
+            response: Response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["comments"]), 4)
+            seen.extend(comment["id"] for comment in response.data["comments"])
+            url = response.data["next"]
+
+        expected = Comment.objects.filter(post=self.post).order_by("-created", "-id")
+        self.assertEqual(seen, [comment.pk for comment in expected])
+
+    def test_deep_cursor_seeks_the_index(self) -> None:
+        """
+        A deep page starts the index scan at the cursor instead of the top.
+        """
+        url: str = self.url_detail + "?page_size=4"
+        for _ in range(4):
+            url = self.client.get(url).data["next"]
+        request = Request(APIRequestFactory().get(url))
+        queryset = KeysetPagination().page_queryset(
+            Comment.objects.filter(post=self.post), request
+        )
+        self.assertIn('"blog_comment"."created" <=', str(queryset.query))
+        self.assertIn("(post_id=? AND created<?)", queryset.explain())
+
+    def test_list_cursor_mode_is_opt_in(self) -> None:
+        """
+        List endpoints keep page numbers unless a cursor parameter is sent.
+        """
+        url_list = reverse("comment-list")
+        response: Response = self.client.get(url_list)
+        self.assertIn("count", response.data)
+
+        response = self.client.get(url_list, {"cursor": "", "page_size": 20})
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 20)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self) -> None:
+        """
+        A malformed cursor is reported as not found.
+        """
+        response: Response = self.client.get(self.url_detail, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CommentThreadTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Build a small reply tree on one post.
+        """
+        self.post = Post.objects.create(
+            title="Thread", slug="thread", body="Body", status="PB"
+        )
+        self.first = Comment.objects.create(post=self.post, body="First")
+        self.reply = Comment.objects.create(
+            post=self.post, body="Reply", parent=self.first
+        )
+        self.nested = Comment.objects.create(
+            post=self.post, body="Nested", parent=self.reply
+        )
+        self.second_reply = Comment.objects.create(
+            post=self.post, body="Second reply", parent=self.first
+        )
+        self.second = Comment.objects.create(post=self.post, body="Second")
+        self.url = reverse("post-thread", kwargs={"slug": self.post.slug})
+
+    def test_paths_are_maintained_on_save(self) -> None:
+        """
+        A reply's path extends its parent's path.
+        """
+        self.nested.refresh_from_db()
+        self.assertEqual(
+            self.nested.path,
+            f"{self.first.pk:010d}/{self.reply.pk:010d}/{self.nested.pk:010d}/",
+        )
+
+    def test_thread_is_nested_in_one_query(self) -> None:
+        """
+        The whole post thread is loaded with a single comment query.
+        """
+        with self.assertNumQueries(2):
+            response: Response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, second = response.data["comments"]
+        self.assertEqual(second["id"], self.second.pk)
+        self.assertEqual(
+            [reply["body"] for reply in first["replies"]], ["Reply", "Second reply"]
+        )
+        self.assertEqual(first["replies"][0]["replies"][0]["body"], "Nested")
+
+    def test_subtree_with_depth_and_breadth_limits(self) -> None:
+        """
+        A subtree can be limited in depth and in replies per comment.
+        """
+        response: Response = self.client.get(
+            self.url, {"root": self.first.pk, "depth": 1, "breadth": 1}
+        )
+        self.assertEqual(response.data["root"], self.first.pk)
+        self.assertEqual(len(response.data["comments"]), 1)
+        self.assertEqual(response.data["comments"][0]["id"], self.reply.pk)
+        self.assertEqual(response.data["comments"][0]["replies"], [])
+
+    def test_subtree_range_stops_at_the_separator(self) -> None:
+        """
+        A subtree excludes siblings whose path continues the root's digits,
+        such as ".../10/" next to ".../1/", and sorts before them.
+        """
+        Comment.objects.filter(pk=self.first.pk).update(path="1/")
+        Comment.objects.filter(pk=self.reply.pk).update(path="1/2/")
+        Comment.objects.filter(pk=self.nested.pk).update(path="1/2/3/")
+        Comment.objects.filter(pk=self.second_reply.pk).update(path="10/")
+        Comment.objects.filter(pk=self.second.pk).update(path="10/4/")
+        self.first.refresh_from_db()
+
+        subtree = Comment.objects.thread(root=self.first)
+        self.assertEqual(
+            list(subtree.values_list("pk", flat=True)), [self.reply.pk, self.nested.pk]
+        )
+        self.assertEqual(
+            list(Comment.objects.thread().values_list("path", flat=True)),
+            ["1/", "1/2/", "1/2/3/", "10/", "10/4/"],
+        )
+        field = Comment._meta.get_field("path")
+        self.assertEqual(
+            field.db_parameters(connection)["collation"],
+            "C" if connection.vendor == "postgresql" else None,
+        )
+
+    def test_rebuild_comment_paths(self) -> None:
+        """
+        The rebuild command restores cleared paths.
+        """
+        expected = dict(Comment.objects.values_list("pk", "path"))
+        Comment.objects.update(path="")
+        call_command("rebuild_comment_paths", stdout=StringIO())
+        self.assertEqual(dict(Comment.objects.values_list("pk", "path")), expected)
+
+
+class AutoResponseBatchTest(TestCase):
+    def setUp(self) -> None:
+        """
+        Create a post with an auto-response and a few top-level comments.
+        """
+        self.author = User.objects.create_user(username="author", password="pass")
+        self.post = Post.objects.create(
+            title="Auto",
+            slug="auto",
+            body="Body",
+            author=self.author,
+            auto_response_comment="Thanks for your comment",
+            time_response=5,
+        )
+        self.comments = [
+            Comment.objects.create(post=self.post, body=f"Comment {num}")
+            for num in range(20)
+        ]
+
+    def test_comments_are_recorded_as_due_rows(self) -> None:
+        """
+        Top-level comments are scheduled as rows, replies are not.
+        """
+        Comment.objects.create(post=self.post, body="A reply", parent=self.comments[0])
+        self.assertEqual(AutoResponse.objects.count(), 20)
+        due_at = AutoResponse.objects.get(comment=self.comments[0]).due_at
+        self.assertGreater(due_at, timezone.now() + timedelta(minutes=4))
+
+    def test_due_rows_are_drained_in_batches(self) -> None:
+        """
+        Due rows become replies in a bounded number of queries, exactly once.
+        """
+        AutoResponse.objects.update(due_at=timezone.now())
+        with self.assertNumQueries(27):
+            self.assertEqual(send_due_auto_responses(batch_size=10), 20)
+        self.assertEqual(send_due_auto_responses(), 0)
+
+        replies = Comment.objects.filter(parent__isnull=False)
+        self.assertEqual(replies.count(), 20)
+        reply = replies.select_related("parent").first()
+        self.assertTrue(reply.path.startswith(reply.parent.path))
+        self.assertEqual(reply.author, self.author)
+        self.assertFalse(AutoResponse.objects.filter(done=False).exists())
+
+    def test_rows_not_yet_due_are_kept(self) -> None:
+        """
+        Nothing is sent before the response delay has passed.
+        """
+        self.assertEqual(send_due_auto_responses(), 0)
+        self.assertEqual(AutoResponse.objects.filter(done=False).count(), 20)
+
+
+class AutoReplyIdempotencyTest(TransactionTestCase):
+    def setUp(self) -> None:
+        """
+        Create a post with an auto-response and one comment, due for a reply.
+        """
+        self.post = Post.objects.create(
+            title="Idempotent",
+            slug="idempotent",
+            body="Body",
+            auto_response_comment="Thanks!",
+        )
+        self.comment = Comment.objects.create(post=self.post, body="Hello")
+
+    def auto_replies(self) -> models.QuerySet:
+        """
+        Return the auto-replies posted to the comment.
+        """
+        return Comment.objects.filter(parent=self.comment, is_auto_reply=True)
+
+    def test_redelivered_runs_reply_once(self) -> None:
+        """
+        Running the job ten times over a row left undone posts exactly one reply.
+        """
+        for _ in range(10):
+            AutoResponse.objects.update(done=False, due_at=timezone.now())
+            result = send_due_auto_responses.apply()
+            self.assertTrue(result.successful())
+        self.assertEqual(self.auto_replies().count(), 1)
+        self.assertFalse(AutoResponse.objects.filter(done=False).exists())
+
+    def test_concurrent_runs_reply_once(self) -> None:
+        """
+        Runs racing for the same due comment post exactly one reply.
+        """
+        workers = 8
+
+        def run(_: int) -> bool:
+            try:
+                return bool(send_due_auto_responses.apply().successful())
+            finally:
+                connection.close()
+
+        for _ in range(5):
+            AutoResponse.objects.update(done=False, due_at=timezone.now())
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                self.assertTrue(all(executor.map(run, range(workers))))
+        self.assertEqual(self.auto_replies().count(), 1)
+
+    def test_transient_errors_are_retried(self) -> None:
+        """
+        A locked database is retried until the reply is written.
+        """
+        attempts: List[int] = []
+        original_update = models.QuerySet.update
+
+        def flaky_update(queryset: models.QuerySet, **kwargs: Any) -> int:
+            if queryset.model is AutoResponse:
+                attempts.append(len(attempts))
+                if len(attempts) < 3:
+                    raise OperationalError("database is locked")
+            updated: int = original_update(queryset, **kwargs)
+            return updated
+
+        AutoResponse.objects.update(due_at=timezone.now())
+        with mock.patch.object(models.QuerySet, "update", flaky_update):
+            result = send_due_auto_responses.apply()
+
+        self.assertTrue(result.successful())
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(self.auto_replies().count(), 1)
+        self.assertFalse(AutoResponse.objects.filter(done=False).exists())
+
+
+class CommentBulkCreateTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a user, a post with an auto-response and a comment to reply to.
+
+        Batches are larger than the comment buckets, so throttling is off.
+        """
+        no_throttles: List[Any] = []
+        throttles = mock.patch.object(CommentViewSet, "throttle_classes", no_throttles)
+        throttles.start()
+        self.addCleanup(throttles.stop)
+        self.user = User.objects.create_user(username="importer", password="pass")
+        self.post = Post.objects.create(
+            title="Bulk",
+            slug="bulk",
+            body="Body",
+            status="PB",
+            auto_response_comment="Thanks!",
+        )
+        self.other_post = Post.objects.create(
+            title="Other", slug="other", body="Body", status="PB"
+        )
+        self.parent = Comment.objects.create(post=self.post, body="Parent")
+        self.url = reverse("comment-bulk")
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create_reports_each_item(self) -> None:
+        """
+        Clean items are created, profane ones rejected, broken ones invalid.
+        """
+        payload = [
+            {"post": self.post.pk, "body": "First"},
+            {"post": self.post.pk, "body": "shit"},
+            {"post": self.post.pk, "body": "Reply", "parent": self.parent.pk},
+            {
+                "post": self.other_post.pk,
+                "body": "Wrong thread",
+                "parent": self.parent.pk,
+            },
+            {"post": 9999, "body": "No post"},
+            {"body": "No post at all"},
+            {"post": self.other_post.pk, "body": "fuck"},
+        ]
+        response: Response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["status"] for item in response.data["results"]],
+            [
+                "created",
+                "rejected",
+                "created",
+                "invalid",
+                "invalid",
+                "invalid",
+                "rejected",
+            ],
+        )
+        self.assertEqual(response.data["created"], 2)
+
+        reply = Comment.objects.get(pk=response.data["results"][2]["id"])
+        self.assertEqual(reply.parent, self.parent)
+        self.assertTrue(reply.path.startswith(self.parent.path))
+        self.assertEqual(reply.author, self.user)
+
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.post.amount_block_comment, 1)
+        self.assertEqual(self.other_post.amount_block_comment, 1)
+        self.assertEqual(AutoResponse.objects.count(), 2)
+
+    def test_query_count_does_not_grow_with_batch(self) -> None:
+        """
+        A larger batch costs the same number of queries.
+        """
+        payload = [{"post": self.post.pk, "body": f"Comment {num}"} for num in range(5)]
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, payload, format="json")
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, payload * 20, format="json")
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_bulk_limits(self) -> None:
+        """
+        Empty and oversized batches are refused, and anonymous users too.
+        """
+        response: Response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch("blog.views.CommentViewSet.bulk_max_size", 2):
+            response = self.client.post(
+                self.url, [{"post": self.post.pk, "body": "x"}] * 3, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(RESPONSE_CACHE_RETRY_AFTER=0)
+class PostResponseCacheTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Start from empty caches with a published post and a draft.
+        """
+        caches["default"].clear()
+        caches["local"].clear()
+        self.post = Post.objects.create(
+            title="Cached", slug="cached", body="Body", status="PB"
+        )
+        self.draft = Post.objects.create(title="Draft", slug="draft", body="Body")
+        self.url_list = reverse("post-list")
+        self.url_detail = reverse("post-detail", kwargs={"slug": self.post.slug})
+
+    def test_repeated_reads_skip_the_database(self) -> None:
+        """
+        The second anonymous read of a list page or a detail runs no queries.
+        """
+        for url in (self.url_list, f"{self.url_list}?page_size=1", self.url_detail):
+            first: Response = self.client.get(url)
+            with self.assertNumQueries(0):
+                second: Response = self.client.get(url)
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.data, first.data)
+            self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_revalidation_returns_not_modified(self) -> None:
+        """
+        A matching ETag gets an empty 304.
+        """
+        response: Response = self.client.get(self.url_detail)
+        with self.assertNumQueries(0):
+            not_modified: Response = self.client.get(
+                self.url_detail, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        self.assertEqual(not_modified["Last-Modified"], response["Last-Modified"])
+
+    def test_dates_alone_do_not_revalidate(self) -> None:
+        """
+        A write in the same second keeps Last-Modified, so the date is not
+        trusted and the client gets the new payload.
+        """
+        second = int(timezone.now().timestamp()) + 60
+        with mock.patch("blog.cache.time.time", return_value=second + 0.2):
+            # Every scope gets a version in that second.
+            cache.bump(cache.ALL, cache.POST_LIST, cache.post_scope(self.post.slug))
+            response: Response = self.client.get(self.url_detail)
+        with mock.patch("blog.cache.time.time", return_value=second + 0.7):
+            Comment.objects.create(post=self.post, body="New comment")
+            fresh: Response = self.client.get(
+                self.url_detail, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+        self.assertEqual(fresh["Last-Modified"], response["Last-Modified"])
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(fresh.data["comments"]), 1)
+
+    def test_writes_invalidate_cached_payloads(self) -> None:
+        """
+        Comment and post writes are visible on the next read.
+        """
+        detail: Response = self.client.get(self.url_detail)
+        comment = Comment.objects.create(post=self.post, body="New comment")
+        response: Response = self.client.get(
+            self.url_detail, HTTP_IF_NONE_MATCH=detail["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["comments"]), 1)
+
+        comment.delete()
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.data["comments"], [])
+
+        with self.assertRaises(ValidationError):
+            Comment.objects.create(post=self.post, body="shit")
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.data["post"]["amount_block_comment"], 1)
+
+        self.draft.status = Post.Status.PUBLISHED
+        self.draft.save()
+        response = self.client.get(self.url_list)
+        self.assertEqual(response.data["count"], 2)
+
+        self.post.slug = "renamed"
+        self.post.save()
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_drafts_and_authenticated_reads_are_not_cached(self) -> None:
+        """
+        Draft details and authenticated reads always go to the database.
+        """
+        url = reverse("post-detail", kwargs={"slug": self.draft.slug})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertGreater(len(queries.captured_queries), 0)
+
+        user = User.objects.create_user(username="reader", password="pass")
+        self.client.force_authenticate(user=user)
+        self.client.get(self.url_detail)
+        response: Response = self.client.get(self.url_detail)
+        self.assertNotIn("ETag", response)
+
+    def test_falls_back_to_local_cache(self) -> None:
+        """
+        Reads are still cached while the shared cache is unreachable.
+        """
+        unreachable = {
+            **settings.CACHES,
+            "unreachable": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:1/0",
+            },
+        }
+        with self.settings(CACHES=unreachable, RESPONSE_CACHE_ALIAS="unreachable"):
+            self.client.get(self.url_detail)
+            with self.assertNumQueries(0):
+                response: Response = self.client.get(self.url_detail)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_during_an_outage_invalidate_the_shared_cache(self) -> None:
+        """
+        Payloads cached in the shared cache before an outage are not served
+        after it if a write happened in between.
+        """
+        unreachable = {
+            **settings.CACHES,
+            "unreachable": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:1/0",
+            },
+        }
+        self.client.get(self.url_detail)
+        with self.settings(CACHES=unreachable, RESPONSE_CACHE_ALIAS="unreachable"):
+            Comment.objects.create(post=self.post, body="Written during the outage")
+
+        response: Response = self.client.get(self.url_detail)
+        self.assertEqual(len(response.data["comments"]), 1)
+
+    def test_links_follow_the_request_host(self) -> None:
+        """
+        A payload cached for one host is not served with its links to another.
+        """
+        Post.objects.create(title="Second", slug="second", body="Body", status="PB")
+        url = f"{self.url_list}?page_size=1"
+        self.client.get(url, HTTP_HOST="evil.example.com")
+        response: Response = self.client.get(url, HTTP_HOST="blog.example.com")
+        self.assertTrue(response.data["next"].startswith("http://blog.example.com/"))
+
+
+# URLconf of the ASGI application, which routes reads to the async views.
+urlpatterns = [
+    path("v1/", include(async_urlpatterns)),
+    path("", include("test_task.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadViewTest(TestCase):
+    def setUp(self) -> None:
+        """
+        Create a staff user, a reader and a published post with comments.
+        """
+        caches["default"].clear()
+        self.staff = User.objects.create_user(
+            username="staff", password="pass", is_staff=True
+        )
+        self.reader = User.objects.create_user(username="reader", password="pass")
+        self.post = Post.objects.create(
+            title="Async", slug="async", body="Body", status="PB"
+        )
+        for num in range(12):
+            Comment.objects.create(post=self.post, body=f"Comment {num}")
+        self.url_detail = reverse("post-detail", kwargs={"slug": self.post.slug})
+        today = timezone.localdate().isoformat()
+        self.url_range = f"{self.url_detail}comments-range/{today}/{today}/"
+
+    def auth(self, user: User) -> Dict[str, str]:
+        """
+        Return the Authorization header of a JWT access token for the user.
+        """
+        token = RefreshToken.for_user(user).access_token  # type: ignore[attr-defined]
+        return {"Authorization": f"Bearer {token}"}
+
+    async def test_same_payload_as_sync_viewset(self) -> None:
+        """
+        The list matches the synchronous viewset and errors keep DRF's status.
+        """
+        factory = APIRequestFactory()
+        list_view = PostViewSet.as_view({"get": "list"})
+
+        response = await self.async_client.get(reverse("post-list"))
+        expected = await sync_to_async(list_view)(factory.get(reverse("post-list")))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.data)
+
+        response = await self.async_client.get(self.url_detail)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["post"]["body"], "Body")
+        self.assertEqual(len(response.json()["comments"]), 10)
+        self.assertIsNotNone(response.json()["next"])
+
+        response = await self.async_client.get(
+            reverse("post-detail", kwargs={"slug": "missing"})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(f"{reverse('post-list')}?page=9")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_date_range_permissions(self) -> None:
+        """
+        Anonymous users get 401, non-staff users 403 and staff the comments;
+        authenticated list reads bypass the cache.
+        """
+        response = await self.async_client.get(self.url_range)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+        reader = await sync_to_async(self.auth)(self.reader)
+        response = await self.async_client.get(self.url_range, headers=reader)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        staff = await sync_to_async(self.auth)(self.staff)
+        response = await self.async_client.get(self.url_range, headers=staff)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["comments_create"], 12)
+        self.assertEqual(response.json()["block_comment"], 0)
+
+        response = await self.async_client.get(reverse("post-list"), headers=reader)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+        response = await self.async_client.get(
+            reverse("post-list"), headers={"Authorization": "Bearer broken"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_reach_the_viewset(self) -> None:
+        """
+        Methods other than GET on the same URLs are served by `PostViewSet`.
+        """
+        response = self.client.post(
+            reverse("post-list"),
+            {"title": "Created", "slug": "created", "body": "Body"},
+            headers=self.auth(self.reader),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.delete(self.url_detail)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ROOT_URLCONF=settings.ROOT_URLCONF)
+    def test_wsgi_reads_reach_the_viewset(self) -> None:
+        """
+        Without `ASYNC_READ_VIEWS` every read is served by `PostViewSet`.
+        """
+        for url in (reverse("post-list"), self.url_detail, self.url_range):
+            self.assertIs(resolve(url).func.cls, PostViewSet)
+
+
+class LeanListSerializerTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a published post with a long body and a comment.
+        """
+        caches["default"].clear()
+        self.post = Post.objects.create(
+            title="Lean", slug="lean", body="word " * 100, status="PB"
+        )
+        self.comment = Comment.objects.create(post=self.post, body="Hello")
+
+    def test_post_list_sends_trimmed_fields(self) -> None:
+        """
+        List items carry an excerpt and the same datetimes as the full serializer.
+        """
+        response: Response = self.client.get(reverse("post-list"))
+        item = response.data["results"][0]
+        self.assertEqual(list(item), PostListSerializer.Meta.fields)
+        self.assertEqual(item["excerpt"], self.post.body[:200])
+        full = PostSerializer(self.post).data
+        self.assertEqual(item["created"], full["created"])
+        self.assertEqual(item["updated"], full["updated"])
+
+    def test_comment_list_sends_trimmed_fields(self) -> None:
+        """
+        Comment list items drop the thread columns and keep the rest as is.
+        """
+        response: Response = self.client.get(reverse("comment-list"))
+        item = response.data["results"][0]
+        full = CommentSerializer(self.comment).data
+        self.assertEqual(item, {name: full[name] for name in item})
+        self.assertNotIn("path", item)
+
+    def test_orjson_renderer_matches_drf(self) -> None:
+        """
+        The orjson renderer produces the bytes of DRF's JSON renderer.
+        """
+        data = {
+            "created": timezone.now(),
+            "day": date(2024, 1, 1),
+            "amount": Decimal("1.50"),
+            "message": gettext_lazy("Not found."),
+            "errors": {"body": [ErrorDetail("Bad", code="invalid")]},
+            "text": "Ünïcode",
+            1: None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = ORJSONRenderer().render({"a": 1}, "application/json; indent=2", {})
+        self.assertEqual(indented, b'{\n  "a": 1\n}')
+
+
+class EndpointQueryCountTest(APITestCase):
+    def assertFixedQueries(
+        self, queries: int, request: Callable[[], Any], grow: Callable[[], None]
+    ) -> None:
+        """
+        Assert that a request runs exactly `queries` queries before and after
+        `grow` adds rows, so the count cannot depend on the rows returned.
+        """
+        for step in range(2):
+            if step:
+                grow()
+            with self.assertNumQueries(queries):
+                response = request()
+            self.assertLess(response.status_code, 400, getattr(response, "data", ""))
+
+    def setUp(self) -> None:
+        """
+        Create a staff user, one post with a comment thread, and authenticate.
+        """
+        caches["default"].clear()
+        self.staff = User.objects.create_superuser(username="staff", password="pass")
+        self.numbers = itertools.count(1)
+        self.post = self.make_post(0)
+        self.client.force_authenticate(user=self.staff)
+        self.client.force_login(self.staff)
+
+    def make_post(self, num: int) -> Post:
+        """
+        Create a published post by a new author, with replies by other users.
+        """
+        author = User.objects.create_user(username=f"author{num}")
+        post: Post = Post.objects.create(
+            title=f"Post {num}",
+            slug=f"post-{num}",
+            body="Body",
+            author=author,
+            status="PB",
+        )
+        parent = None
+        for depth in range(3):
+            commenter = User.objects.create_user(username=f"commenter{num}-{depth}")
+            parent = Comment.objects.create(
+                post=post, author=commenter, parent=parent, body=f"Reply {depth}"
+            )
+        return post
+
+    def grow(self) -> None:
+        """
+        Add posts, authors and comments, and more comments to the first post.
+        """
+        for _ in range(5):
+            post = self.make_post(next(self.numbers))
+            Comment.objects.filter(post=post).update(post=self.post)
+
+    def test_api_endpoints(self) -> None:
+        """
+        API reads run a fixed number of queries whatever the number of rows.
+        """
+        today = timezone.localdate().isoformat()
+        detail = reverse("post-detail", kwargs={"slug": self.post.slug})
+        endpoints = [
+            (2, reverse("post-list")),
+            (2, detail),
+            (2, reverse("post-thread", kwargs={"slug": self.post.slug})),
+            (2, reverse("comment-list")),
+            (2, f"{detail}comments-range/{today}/{today}/"),
+            (
+                1,
+                f"{reverse('comments-daily-breakdown')}"
+                f"?date_from={today}&date_to={today}",
+            ),
+        ]
+        for queries, url in endpoints:
+            with self.subTest(url=url):
+                self.assertFixedQueries(
+                    queries, lambda: self.client.get(url), self.grow
+                )
+
+    def test_owner_check_does_not_load_author(self) -> None:
+        """
+        Updating a post checks ownership without fetching its author.
+        """
+        owner = User.objects.get(username="author0")
+        self.client.force_authenticate(user=owner)
+        url = reverse("post-detail", kwargs={"slug": self.post.slug})
+        with CaptureQueriesContext(connection) as queries:
+            response: Response = self.client.patch(url, {"title": "Renamed"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('FROM "auth_user"' in query["sql"] for query in queries))
+
+        self.client.force_authenticate(user=None)
+        response = self.client.patch(url, {"title": "Anonymous"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(
+        STORAGES={
+            **settings.STORAGES,
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+            },
+        }
+    )
+    def test_admin_changelists(self) -> None:
+        """
+        Admin changelists join the posts and authors they display.
+        """
+        for queries, model in ((5, "post"), (5, "comment"), (5, "commentdailystats")):
+            with self.subTest(model=model):
+                self.assertFixedQueries(
+                    queries,
+                    lambda: self.client.get(reverse(f"admin:blog_{model}_changelist")),
+                    self.grow,
+                )
+
+
+class SearchTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create published and draft posts with comments to search.
+        """
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.post = Post.objects.create(
+            title="Brewing coffee at home",
+            slug="brewing-coffee",
+            body="Grind the beans <fresh> before brewing.",
+            status=Post.Status.PUBLISHED,
+        )
+        Post.objects.create(
+            title="Tea",
+            slug="tea",
+            body="Coffee is mentioned once here.",
+            status=Post.Status.PUBLISHED,
+        )
+        Post.objects.create(
+            title="Coffee draft", slug="coffee-draft", body="Coffee", status="DF"
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.user, body="I brewed a great espresso."
+        )
+        self.url = reverse("search-list")
+
+    def test_posts_ranked_with_highlights(self) -> None:
+        """
+        Published posts match stemmed words, best first, with escaped highlights.
+        """
+        response: Response = self.client.get(self.url, {"q": "brew coffee"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([result["slug"] for result in results], ["brewing-coffee"])
+        self.assertIn("<mark>coffee</mark>", results[0]["highlights"]["title"])
+        self.assertIn("&lt;fresh&gt;", results[0]["highlights"]["body"])
+
+        response = self.client.get(self.url, {"q": "coffee"})
+        slugs = [result["slug"] for result in response.data["results"]]
+        self.assertEqual(slugs, ["brewing-coffee", "tea"])
+        ranks = [result["rank"] for result in response.data["results"]]
+        self.assertGreater(ranks[0], ranks[1])
+
+    def test_comments_follow_edits_and_deletes(self) -> None:
+        """
+        Comments are indexed on create, reindexed on edit and removed on delete.
+        """
+        response: Response = self.client.get(
+            self.url, {"q": "espresso", "type": "comments"}
+        )
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]], [self.comment.pk]
+        )
+
+        self.comment.body = "I brewed a latte."
+        self.comment.save()
+        response = self.client.get(self.url, {"q": "espresso", "type": "comments"})
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get(self.url, {"q": "latte", "type": "comments"})
+        self.assertEqual(len(response.data["results"]), 1)
+
+        self.comment.delete()
+        response = self.client.get(self.url, {"q": "latte", "type": "comments"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_bulk_created_comments_are_indexed(self) -> None:
+        """
+        Comments created in bulk are searchable, and equally ranked matches
+        are paged newest first.
+        """
+        created, _ = Comment.objects.create_many(
+            [
+                Comment(post=self.post, body=f"Macchiato number {num}")
+                for num in range(3)
+            ]
+        )
+        response: Response = self.client.get(
+            self.url, {"q": "macchiato", "type": "comments", "page_size": 2}
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["previous"])
+        ids = [result["id"] for result in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+        ids += [result["id"] for result in response.data["results"]]
+        self.assertEqual(ids, sorted((comment.pk for comment in created), reverse=True))
+
+    def test_hidden_comments_do_not_shorten_pages(self) -> None:
+        """
+        Pages hold only readable comments, even when hidden ones rank first;
+        authors also find their own pending comments.
+        """
+        visible = [
+            Comment.objects.create(post=self.post, body=f"Ristretto {num}")
+            for num in range(2)
+        ]
+        pending = [
+            Comment.objects.create(
+                post=self.post, author=self.user, body=f"Ristretto {num}"
+            )
+            for num in range(2)
+        ]
+        Comment.objects.filter(pk__in=[comment.pk for comment in pending]).update(
+            moderation=Comment.Moderation.PENDING
+        )
+        params = {"q": "ristretto", "type": "comments", "page_size": 2}
+
+        response: Response = self.client.get(self.url, params)
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]],
+            [visible[1].pk, visible[0].pk],
+        )
+        self.assertIsNone(response.data["next"])
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {**params, "page_size": 4})
+        self.assertEqual(len(response.data["results"]), 4)
+
+    def test_query_syntax_is_literal(self) -> None:
+        """
+        Search operators and quotes in the query do not break the search.
+        """
+        for query in ["coffee AND (", '"coffee', "NEAR(coffee", "-", "*"]:
+            with self.subTest(query=query):
+                response: Response = self.client.get(self.url, {"q": query})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_requests(self) -> None:
+        """
+        A missing query or unknown type is rejected.
+        """
+        response: Response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"q": "coffee", "type": "users"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"q": "coffee", "page": "0"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_command(self) -> None:
+        """
+        The rebuild command indexes rows written without the model hooks.
+        """
+        Comment.objects.filter(pk=self.comment.pk).update(body="Cold brew tonic")
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Indexed 3 posts and 1 comments.", out.getvalue())
+        response: Response = self.client.get(
+            self.url, {"q": "tonic", "type": "comments"}
+        )
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class CommentExportTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a post with comments, several sharing a creation time.
+        """
+        self.staff = User.objects.create_user(
+            username="moderator", password="pass", is_staff=True
+        )
+        self.post = Post.objects.create(title="Export", slug="export", body="Body")
+        self.comments = [
+            Comment.objects.create(post=self.post, body=f'Comment {num}, "quoted"')
+            for num in range(5)
+        ]
+        # Rows with equal timestamps must not be skipped or repeated
+        # between chunks.
+        Comment.objects.filter(pk__in=[c.pk for c in self.comments[1:4]]).update(
+            created=self.comments[1].created
+        )
+        today = timezone.localdate().isoformat()
+        self.url = reverse("post-comments-export", kwargs={"slug": self.post.slug})
+        self.params = {"date_from": today, "date_to": today}
+        self.client.force_authenticate(user=self.staff)
+
+    def export(self, **params: str) -> bytes:
+        """
+        Return the streamed body of an export with chunks of two rows.
+        """
+        with mock.patch.object(PostViewSet, "export_chunk_size", 2):
+            response = self.client.get(self.url, {**self.params, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson(self) -> None:
+        """
+        Every comment is one JSON line, in creation order.
+        """
+        lines = self.export().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row["id"] for row in rows],
+            sorted(comment.pk for comment in self.comments),
+        )
+        self.assertEqual(rows[0]["body"], 'Comment 0, "quoted"')
+        self.assertEqual(rows[0]["post"], self.post.pk)
+
+    def test_chunks_start_at_the_previous_one(self) -> None:
+        """
+        Every chunk after the first is bounded below by the previous position.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+        chunks = [query["sql"] for query in queries if "blog_comment" in query["sql"]]
+        self.assertEqual(len(chunks), 3)
+        for sql in chunks[1:]:
+            self.assertIn('"blog_comment"."created" >=', sql)
+
+    def test_csv(self) -> None:
+        """
+        The CSV export has a header and one quoted row per comment.
+        """
+        rows = list(csv.reader(StringIO(self.export(type="csv").decode())))
+        self.assertEqual(rows[0], CommentListSerializer.Meta.fields)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][4], 'Comment 0, "quoted"')
+
+    def test_gzip(self) -> None:
+        """
+        Clients accepting gzip get the same rows compressed.
+        """
+        with mock.patch.object(PostViewSet, "export_chunk_size", 2):
+            response = self.client.get(
+                self.url, self.params, HTTP_ACCEPT_ENCODING="gzip, deflate"
+            )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, self.export())
+
+    def test_empty_range_and_errors(self) -> None:
+        """
+        An empty range streams only the header; bad input and non-staff are rejected.
+        """
+        yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+        body = self.export(type="csv", date_from=yesterday, date_to=yesterday)
+        self.assertEqual(
+            body.decode().splitlines(), [",".join(CommentListSerializer.Meta.fields)]
+        )
+
+        response: Response = self.client.get(self.url, {"date_from": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {**self.params, "type": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=User.objects.create_user(username="u"))
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MetricsTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a user and a post to request.
+        """
+        self.user = User.objects.create_user(username="metrics", password="pass")
+        self.post = Post.objects.create(
+            title="Metrics", slug="metrics", body="Body", status="PB"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def sample(self, name: str, **labels: str) -> float:
+        """
+        Return the current value of a sample, or 0 if it was never recorded.
+        """
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def test_request_latency_and_queries(self) -> None:
+        """
+        Requests are counted and timed per route with their query counts.
+        """
+        route = {"route": "post-detail"}
+        requests = self.sample(
+            "blog_requests_total", method="GET", status="200", **route
+        )
+        queries = self.sample("blog_db_queries_per_request_sum", **route)
+
+        url = reverse("post-detail", kwargs={"slug": self.post.slug})
+        response: Response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            self.sample("blog_requests_total", method="GET", status="200", **route),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample("blog_db_queries_per_request_sum", **route), queries + 2
+        )
+        self.assertGreater(
+            self.sample("blog_request_duration_seconds_count", method="GET", **route),
+            0,
+        )
+        self.assertNotIn("Server-Timing", response)
+
+    async def test_async_requests_count_queries(self) -> None:
+        """
+        Queries run by async views through the ASGI handler are counted.
+        """
+        queries = self.sample("blog_db_queries_per_request_sum", route="post-detail")
+        response = await self.async_client.get(
+            reverse("post-detail", kwargs={"slug": self.post.slug})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.sample("blog_db_queries_per_request_sum", route="post-detail"),
+            queries + 2,
+        )
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self) -> None:
+        """
+        The request totals are sent in a `Server-Timing` header when enabled.
+        """
+        response: Response = self.client.post(
+            reverse("comment-list"), {"post": self.post.pk, "body": "Nice post"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r"^app;dur=[\d.]+, db;dur=[\d.]+;desc=\"\d+ queries\"")
+        self.assertIn("profanity;dur=", timing)
+        self.assertGreater(
+            self.sample(
+                "blog_profanity_check_duration_seconds_count", route="comment-list"
+            ),
+            0,
+        )
+
+    def test_celery_publish_latency(self) -> None:
+        """
+        Task publishes are timed per task name.
+        """
+        before = self.sample(
+            "blog_celery_publish_duration_seconds_count", task="blog.tasks.example"
+        )
+        headers = {"id": "task-1"}
+        before_task_publish.send(sender="blog.tasks.example", headers=headers)
+        after_task_publish.send(sender="blog.tasks.example", headers=headers)
+        self.assertEqual(
+            self.sample(
+                "blog_celery_publish_duration_seconds_count", task="blog.tasks.example"
+            ),
+            before + 1,
+        )
+
+    def test_metrics_endpoint(self) -> None:
+        """
+        Metrics are served in the Prometheus format, behind a token if one is set.
+        """
+        self.client.get(reverse("post-list"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('blog_request_duration_seconds_bucket{le="0.0005"', body)
+        self.assertIn("blog_profanity_verdict_cache_lookups_total", body)
+
+        with self.settings(METRICS_TOKEN="secret"):
+            response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BenchmarkDataTest(TestCase):
+    def setUp(self) -> None:
+        """
+        Seed a small benchmark dataset.
+        """
+        call_command(
+            "seed_bench_data",
+            users=5,
+            posts=4,
+            comments=300,
+            days=10,
+            profane_fraction=0.1,
+            stdout=StringIO(),
+        )
+
+    def test_seeded_rows_are_consistent(self) -> None:
+        """
+        Stored and blocked comments add up, with valid paths and daily rollups.
+        """
+        stored = Comment.objects.count()
+        blocked = sum(Post.objects.values_list("amount_block_comment", flat=True))
+        self.assertEqual(stored + blocked, 300)
+        self.assertGreater(blocked, 0)
+
+        paths = dict(Comment.objects.values_list("pk", "path"))
+        for pk, parent_id in Comment.objects.values_list("pk", "parent_id"):
+            parent_path = paths[parent_id] if parent_id else ""
+            self.assertEqual(paths[pk], f"{parent_path}{pk:010d}/")
+        self.assertTrue(Comment.objects.filter(parent__isnull=False).exists())
+
+        totals = CommentDailyStats.objects.aggregate(
+            created=models.Sum("created_count"), blocked=models.Sum("blocked_count")
+        )
+        self.assertEqual(totals, {"created": stored, "blocked": blocked})
+
+        # Rows created afterwards get fresh ids past the explicit ones.
+        user = User.objects.create_user(username="after-seed", password="pass")
+        comment = Comment.objects.create(
+            post=Post.objects.first(), author=user, body="Fresh"
+        )
+        self.assertEqual(comment.pk, max(paths) + 1)
+
+    def test_bench_writes_comparable_results(self) -> None:
+        """
+        The micro-benchmarks write JSON results that a later run compares with.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "bench",
+                repeat=1,
+                only=["serializers"],
+                output=output,
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                data = json.load(file)
+            self.assertIn("database", data["meta"])
+            self.assertIn("serializers.posts.lean", data["results"])
+            self.assertEqual(data["results"]["serializers.posts.lean"]["runs"], 1)
+
+            out = StringIO()
+            call_command(
+                "bench", repeat=1, only=["serializers"], compare=output, stdout=out
+            )
+            self.assertIn("change", out.getvalue())
+            self.assertIn("%", out.getvalue())
+
+
+@override_settings(COMMENT_MODERATION_ASYNC=True)
+class CommentModerationTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create an author, a reader and a post with an auto-response.
+        """
+        self.author = User.objects.create_user(username="writer", password="pass")
+        self.reader = User.objects.create_user(username="reader", password="pass")
+        self.post = Post.objects.create(
+            title="Moderated",
+            slug="moderated",
+            body="Body",
+            status="PB",
+            auto_response_comment="Thanks!",
+        )
+        self.client.force_authenticate(user=self.author)
+        publish = mock.patch.object(moderate_comments, "apply_async")
+        self.publish = publish.start()
+        self.addCleanup(publish.stop)
+        throttle = mock.patch("blog.tasks._next_moderation_publish", 0.0)
+        throttle.start()
+        self.addCleanup(throttle.stop)
+
+    def comment(self, body: str) -> Response:
+        """
+        Post a comment as the author, running the on-commit callbacks.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("comment-list"),
+                {"post": self.post.pk, "body": body},
+                format="json",
+            )
+
+    def test_comments_are_accepted_pending(self) -> None:
+        """
+        Profane comments are accepted unchecked, and one run is queued per delay.
+        """
+        with mock.patch("blog.models.check_swearing") as check:
+            first = self.comment("Nice post")
+            second = self.comment("shit post")
+        check.assert_not_called()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data["moderation"], Comment.Moderation.PENDING)
+        self.publish.assert_called_once_with(
+            countdown=settings.COMMENT_MODERATION_DELAY
+        )
+        self.assertFalse(AutoResponse.objects.exists())
+        self.assertFalse(CommentDailyStats.objects.exists())
+
+    def test_pending_comments_are_only_shown_to_their_author(self) -> None:
+        """
+        Other users and anonymous readers see a comment once it is approved.
+        """
+        comment_id = self.comment("Nice post").data["id"]
+        detail = reverse("post-detail", kwargs={"slug": self.post.slug})
+
+        def visible() -> Dict[str, bool]:
+            return {
+                "detail": any(
+                    row["id"] == comment_id
+                    for row in self.client.get(detail).data["comments"]
+                ),
+                "list": any(
+                    row["id"] == comment_id
+                    for row in self.client.get(reverse("comment-list")).data["results"]
+                ),
+            }
+
+        self.assertEqual(visible(), {"detail": True, "list": True})
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(visible(), {"detail": False, "list": False})
+        self.client.force_authenticate(user=None)
+        self.assertEqual(visible(), {"detail": False, "list": False})
+
+        moderate_comments()
+        self.assertEqual(visible(), {"detail": True, "list": True})
+
+    def test_moderation_approves_and_blocks_in_batches(self) -> None:
+        """
+        Batches settle every pending comment, with the synchronous side effects.
+        """
+        for body in ["Nice post", "shit post", "Great coffee", "fuck"]:
+            self.comment(body)
+        lag = REGISTRY.get_sample_value("blog_comment_moderation_lag_seconds_count")
+        self.assertEqual(
+            REGISTRY.get_sample_value("blog_comments_pending_moderation"), 4
+        )
+
+        with self.assertNumQueries(22):
+            self.assertEqual(moderate_comments(batch_size=3), 4)
+        self.assertEqual(moderate_comments(), 0)
+
+        states = dict(Comment.objects.values_list("body", "moderation"))
+        self.assertEqual(
+            states,
+            {
+                "Nice post": Comment.Moderation.APPROVED,
+                "shit post": Comment.Moderation.BLOCKED,
+                "Great coffee": Comment.Moderation.APPROVED,
+                "fuck": Comment.Moderation.BLOCKED,
+            },
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.amount_block_comment, 2)
+        self.assertEqual(self.post.comment_count, 2)
+        stats = CommentDailyStats.objects.get(post=self.post)
+        self.assertEqual((stats.created_count, stats.blocked_count), (2, 2))
+        self.assertEqual(AutoResponse.objects.count(), 2)
+        response = self.client.get(
+            reverse("search-list"), {"q": "post", "type": "comments"}
+        )
+        self.assertEqual(
+            [row["body"] for row in response.data["results"]], ["Nice post"]
+        )
+        self.assertEqual(
+            REGISTRY.get_sample_value("blog_comment_moderation_lag_seconds_count"),
+            (lag or 0) + 4,
+        )
+        self.assertEqual(
+            REGISTRY.get_sample_value("blog_comments_pending_moderation"), 0
+        )
+
+
+class ThrottleTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create two users and two posts, with fresh buckets and low rates.
+        """
+        self.user = User.objects.create_user(username="chatty", password="pass")
+        self.other = User.objects.create_user(username="quiet", password="pass")
+        self.post = Post.objects.create(title="One", slug="one", body="Body")
+        self.other_post = Post.objects.create(title="Two", slug="two", body="Body")
+        buckets = mock.patch.object(
+            throttling, "local_buckets", throttling.LocalBuckets()
+        )
+        buckets.start()
+        self.addCleanup(buckets.stop)
+        rates = mock.patch.dict(
+            throttling.TokenBucketThrottle.THROTTLE_RATES,
+            {"comment_user": "2/min", "comment_ip": "100/min", "comment_post": "3/min"},
+        )
+        rates.start()
+        self.addCleanup(rates.stop)
+
+    def comment(self, user: User, post: Post) -> Response:
+        """
+        Post a comment as a user.
+        """
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            reverse("comment-list"), {"post": post.pk, "body": "Hi"}, format="json"
+        )
+
+    def test_comments_are_throttled_per_user_and_post(self) -> None:
+        """
+        Each user and each post has its own bucket; reads are never throttled.
+        """
+        statuses = [self.comment(self.user, self.post).status_code for _ in range(3)]
+        self.assertEqual(statuses, [201, 201, 429])
+        response = self.comment(self.user, self.other_post)
+        self.assertIn(int(response["Retry-After"]), range(1, 31))
+        response = self.client.get(reverse("comment-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.comment(self.other, self.post).status_code, 201)
+        # The post's third comment empties its bucket for everyone.
+        self.assertEqual(self.comment(self.other, self.post).status_code, 429)
+        third = User.objects.create_user(username="third", password="pass")
+        self.assertEqual(self.comment(third, self.other_post).status_code, 201)
+
+    def test_bulk_requests_take_a_token_per_item(self) -> None:
+        """
+        Bulk requests take a token per comment from the user's bucket and
+        from the bucket of each post.
+        """
+        url = reverse("comment-bulk")
+        items = [{"post": self.post.pk, "body": "Hi"}] * 2
+        self.client.force_authenticate(user=self.user)
+        response: Response = self.client.post(url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(url, items[:1], format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # One token is left in the post's bucket.
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_batches_larger_than_a_bucket_are_refused(self) -> None:
+        """
+        A batch that no bucket could ever admit gets 413 rather than a
+        Retry-After it can never meet, and takes no tokens.
+        """
+        url = reverse("comment-bulk")
+        items = [{"post": self.post.pk, "body": "Hi"}] * 31
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.dict(
+            throttling.TokenBucketThrottle.THROTTLE_RATES,
+            {"comment_user": "30/min", "comment_post": "600/min"},
+        ):
+            response: Response = self.client.post(url, items, format="json")
+            self.assertEqual(
+                response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+            self.assertIn("At most 30 items", response.data["detail"])
+            self.assertNotIn("Retry-After", response)
+            self.assertFalse(Comment.objects.exists())
+
+            response = self.client.post(url, items[:30], format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(Comment.objects.count(), 30)
+
+    def test_buckets_refill_continuously(self) -> None:
+        """
+        Tokens come back at the rate, up to the bucket size.
+        """
+        buckets = throttling.LocalBuckets()
+        with mock.patch("time.monotonic", return_value=100.0):
+            waits = [buckets.take("key", 2, 1.0) for _ in range(3)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0])
+        with mock.patch("time.monotonic", return_value=100.5):
+            self.assertEqual(buckets.take("key", 2, 1.0), 0.5)
+        with mock.patch("time.monotonic", return_value=110.0):
+            waits = [buckets.take("key", 2, 1.0) for _ in range(3)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0])
+
+    def test_falls_back_to_local_buckets_without_redis(self) -> None:
+        """
+        A Redis failure throttles in-process and skips Redis for a while.
+        """
+        shared = throttling.RedisBuckets("redis://localhost:6379/0", 0.05, 60)
+        errors = REGISTRY.get_sample_value("blog_throttle_backend_errors_total")
+        with mock.patch.object(
+            shared, "script", side_effect=throttling.redis.ConnectionError
+        ) as script, mock.patch.object(
+            throttling, "shared_buckets", return_value=shared
+        ), self.assertLogs(
+            "blog.throttling", "WARNING"
+        ):
+            statuses = [
+                self.comment(self.user, self.post).status_code for _ in range(3)
+            ]
+        self.assertEqual(statuses, [201, 201, 429])
+        script.assert_called_once()
+        self.assertEqual(
+            REGISTRY.get_sample_value("blog_throttle_backend_errors_total"),
+            (errors or 0) + 1,
+        )
+
+
+class CommentCounterTest(APITestCase):
+    def setUp(self) -> None:
+        """
+        Create a user and two published posts, the first one older.
+        """
+        caches["default"].clear()
+        self.user = User.objects.create_user(username="counter", password="pass")
+        self.old = Post.objects.create(
+            title="Old", slug="old", body="Body", status="PB", author=self.user
+        )
+        self.new = Post.objects.create(
+            title="New", slug="new", body="Body", status="PB", author=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def comment(self, post: Post, parent: Optional[int] = None) -> Response:
+        """
+        Comment on a post through the API.
+        """
+        return self.client.post(
+            reverse("comment-list"),
+            {"post": post.pk, "body": "Hi", "parent": parent},
+            format="json",
+        )
+
+    def counters(self, post: Post) -> Any:
+        """
+        Return the comment count, reply count and last comment time of a post.
+        """
+        post.refresh_from_db()
+        return post.comment_count, post.reply_count, post.last_comment_at
+
+    def test_counters_follow_creates_and_deletes(self) -> None:
+        """
+        Single and bulk creates count, deletes uncount the whole subtree.
+        """
+        root = self.comment(self.old).data["id"]
+        reply = self.comment(self.old, parent=root).data["id"]
+        self.client.post(
+            reverse("comment-bulk"),
+            [{"post": self.old.pk, "body": "Bulk", "parent": reply}],
+            format="json",
+        )
+        last = Comment.objects.filter(post=self.old).latest("created").created
+        self.assertEqual(self.counters(self.old), (3, 2, last))
+
+        self.client.force_authenticate(user=None)
+        listed = self.client.get(reverse("post-list")).data["results"]
+        self.assertEqual(
+            [(row["slug"], row["comment_count"], row["reply_count"]) for row in listed],
+            [("new", 0, 0), ("old", 3, 2)],
+        )
+
+        self.client.force_authenticate(user=self.user)
+        other = self.comment(self.old).data["id"]
+        Comment.objects.get(pk=root).delete()
+        created = Comment.objects.get(pk=other).created
+        self.assertEqual(self.counters(self.old), (1, 0, created))
+
+        Comment.objects.get(pk=other).delete()
+        self.assertEqual(self.counters(self.old), (0, 0, None))
+
+    def test_reconcile_fixes_drift(self) -> None:
+        """
+        The command recounts drifted posts in chunks and leaves the others.
+        """
+        self.comment(self.old)
+        self.comment(self.new)
+        expected = self.counters(self.old)
+        Post.objects.filter(pk=self.old.pk).update(
+            comment_count=7, reply_count=3, last_comment_at=None
+        )
+
+        out = StringIO()
+        call_command("reconcile_comment_counts", "--dry-run", stdout=out)
+        self.assertIn("Checked 2 posts. Found 1 drifted.", out.getvalue())
+        self.assertEqual(self.counters(self.old)[0], 7)
+
+        call_command("reconcile_comment_counts", "--chunk-size", "1", stdout=out)
+        self.assertIn("Fixed 1 drifted.", out.getvalue())
+        self.assertEqual(self.counters(self.old), expected)
+
+    def test_list_ordered_by_activity(self) -> None:
+        """
+        `ordering=activity` puts recently commented posts first, in both modes.
+        """
+        self.comment(self.old)
+        self.client.force_authenticate(user=None)
+        url = reverse("post-list")
+
+        response: Response = self.client.get(url, {"ordering": "activity"})
+        self.assertEqual(
+            [row["slug"] for row in response.data["results"]], ["old", "new"]
+        )
+        self.assertEqual(
+            [row["slug"] for row in self.client.get(url).data["results"]],
+            ["new", "old"],
+        )
+
+        response = self.client.get(
+            url, {"ordering": "activity", "cursor": "", "page_size": 1}
+        )
+        self.assertEqual([row["slug"] for row in response.data["results"]], ["old"])
+        next_url = response.data["next"]
+        response = self.client.get(next_url)
+        self.assertEqual([row["slug"] for row in response.data["results"]], ["new"])
+        self.assertIsNone(response.data["next"])
+
+        plan = (
+            Post.published.alias(activity=Post.ACTIVITY)
+            .order_by("-activity", "-pk")
+            .explain()
+        )
+        self.assertIn("post_activity_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+        # Cursor pages start the index scan at the cursor.
+        request = Request(APIRequestFactory().get(next_url))
+        queryset = ActivityKeysetPagination().page_queryset(
+            Post.published.alias(activity=Post.ACTIVITY), request
+        )
+        plan = queryset.explain()
+        self.assertIn("post_activity_idx (<expr><?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
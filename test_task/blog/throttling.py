@@ -0,0 +1,304 @@
+"""
+Token bucket throttles for the write endpoints, kept in Redis.
+
+A bucket holds up to the number of requests of its rate, such as 30 for
+"30/min", and refills continuously, so clients may burst up to the limit
+and are then held to the rate. Bulk requests take a token per item, and
+batches larger than a bucket are refused outright with 413. Each
+check is one EVALSHA of a Lua script that refills and takes the tokens
+atomically with the Redis clock, so every worker shares exact limits at one
+round trip.
+
+Without `THROTTLE_REDIS_URL`, or while Redis is unreachable, buckets are
+kept in each process instead, which multiplies the limits by the number
+of processes but keeps them in force.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] is the bucket, ARGV the capacity, the refill rate per second and
+# the tokens to take. Returns the seconds until they are available, 0 if
+# they were taken.
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "at")
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local wait = 0
+if tokens >= count then
+    tokens = tokens - count
+else
+    wait = (count - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "at", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate))
+return tostring(wait)
+"""
+
+
+class BatchTooLarge(APIException):
+    """
+    A request takes more tokens than its bucket can ever hold.
+    """
+
+    status_code = 413
+    default_detail = "Too many items for the rate limit."
+    default_code = "batch_too_large"
+
+
+class LocalBuckets:
+    """
+    Token buckets of this process, for the most recently used keys.
+    """
+
+    def __init__(self, max_keys: int = 10_000) -> None:
+        """
+        Keep at most `max_keys` buckets; evicted ones start full again.
+        """
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, count: int = 1) -> float:
+        """
+        Take `count` tokens, as the Lua script does, and return the seconds to wait.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, at = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - at) * rate)
+            wait = 0.0
+            if tokens >= count:
+                tokens -= count
+            else:
+                wait = (count - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class RedisBuckets:
+    """
+    Token buckets shared by every process through a Lua script in Redis.
+    """
+
+    def __init__(self, url: str, timeout: float, retry_after: float) -> None:
+        """
+        Connect lazily, giving up on a call after `timeout` seconds.
+
+        After an error, Redis is skipped for `retry_after` seconds, so an
+        outage does not add a timeout to every request.
+        """
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self.script = self.client.register_script(TOKEN_BUCKET)
+        self.retry_after = retry_after
+        self.down_until = 0.0
+
+    def take(
+        self, key: str, capacity: float, rate: float, count: int = 1
+    ) -> Optional[float]:
+        """
+        Take `count` tokens and return the seconds to wait, or None if Redis failed.
+        """
+        if time.monotonic() < self.down_until:
+            return None
+        try:
+            return float(self.script(keys=[key], args=[capacity, rate, count]))
+        except redis.RedisError:
+            self.down_until = time.monotonic() + self.retry_after
+            metrics.THROTTLE_BACKEND_ERRORS.inc()
+            logger.warning("Throttling in-process: Redis failed.", exc_info=True)
+            return None
+
+
+local_buckets = LocalBuckets()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_buckets() -> Optional[RedisBuckets]:
+    """
+    Return the Redis buckets of `THROTTLE_REDIS_URL`, if it is set.
+    """
+    if not settings.THROTTLE_REDIS_URL:
+        return None
+    return RedisBuckets(
+        settings.THROTTLE_REDIS_URL,
+        settings.THROTTLE_REDIS_TIMEOUT,
+        settings.THROTTLE_REDIS_RETRY_AFTER,
+    )
+
+
+def take(key: str, capacity: float, rate: float, count: int = 1) -> float:
+    """
+    Take `count` tokens from the shared bucket, or the local one without Redis.
+
+    Returns 0 if they were taken, else the seconds until they are available.
+    A count above the capacity is never available.
+    """
+    shared = shared_buckets()
+    wait = shared.take(key, capacity, rate, count) if shared is not None else None
+    if wait is None:
+        wait = local_buckets.take(key, capacity, rate, count)
+    return wait
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Throttle taking a token per item of a request from a bucket per scope and key.
+
+    Rates come from `DEFAULT_THROTTLE_RATES` like DRF's throttles, and
+    subclasses return the key from `get_cache_key`, or None to not throttle
+    the request.
+    """
+
+    def get_charges(self, request: Request, view: Any) -> Dict[str, int]:
+        """
+        Return the tokens to take from each bucket: one per item of a list.
+        """
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return {}
+        return {key: len(request.data) if isinstance(request.data, list) else 1}
+
+    def allow_request(self, request: Request, view: Any) -> bool:
+        """
+        Take the tokens, refusing the request at the first bucket short of them.
+
+        A batch larger than the bucket would wait forever, so it is refused
+        with `BatchTooLarge` before any token is taken.
+        """
+        if self.rate is None:
+            return True
+        charges = self.get_charges(request, view)
+        if not charges:
+            return True
+        if max(charges.values()) > self.num_requests:
+            metrics.THROTTLE_CHECKS.labels(self.scope, "too_large").inc()
+            raise BatchTooLarge(
+                f"At most {self.num_requests} items per request "
+                f"under the {self.scope} rate."
+            )
+        rate = self.num_requests / self.duration
+        for key, count in charges.items():
+            self.delay = take(key, self.num_requests, rate, count)
+            if self.delay:
+                break
+        allowed = self.delay == 0
+        metrics.THROTTLE_CHECKS.labels(
+            self.scope, "allowed" if allowed else "throttled"
+        ).inc()
+        return allowed
+
+    def wait(self) -> Optional[float]:
+        """
+        Return the seconds until the next token, sent as `Retry-After`.
+        """
+        return self.delay
+
+
+class CommentUserThrottle(TokenBucketThrottle):
+    """
+    Limits the comments one user can create.
+    """
+
+    scope = "comment_user"
+
+    def get_cache_key(self, request: Request, view: Any) -> Optional[str]:
+        """
+        Key by user; anonymous requests are refused by the permissions.
+        """
+        if not request.user.is_authenticated:
+            return None
+        key: str = self.cache_format % {"scope": self.scope, "ident": request.user.pk}
+        return key
+
+
+class CommentIPThrottle(TokenBucketThrottle):
+    """
+    Limits the comments created from one client address.
+    """
+
+    scope = "comment_ip"
+
+    def get_cache_key(self, request: Request, view: Any) -> Optional[str]:
+        """
+        Key by the client address, honouring `NUM_PROXIES`.
+        """
+        key: str = self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+        return key
+
+
+class CommentPostThrottle(TokenBucketThrottle):
+    """
+    Limits the comments created on one post, by everyone together.
+    """
+
+    scope = "comment_post"
+
+    def get_cache_key(self, request: Request, view: Any) -> Optional[str]:
+        """
+        Key by the post of a single comment.
+        """
+        return self.post_key(request.data)
+
+    def get_charges(self, request: Request, view: Any) -> Dict[str, int]:
+        """
+        Charge each post's bucket a token per item of the request on it.
+        """
+        items = request.data if isinstance(request.data, list) else [request.data]
+        keys = Counter(self.post_key(item) for item in items)
+        return {key: count for key, count in keys.items() if key is not None}
+
+    def post_key(self, item: Any) -> Optional[str]:
+        """
+        Return the bucket key of the post of one comment, if it names one.
+        """
+        post = item.get("post") if isinstance(item, dict) else None
+        if not str(post).isdigit():
+            return None
+        key: str = self.cache_format % {"scope": self.scope, "ident": post}
+        return key
+
+
+class RegisterIPThrottle(TokenBucketThrottle):
+    """
+    Limits the accounts registered from one client address.
+    """
+
+    scope = "register_ip"
+
+    def get_cache_key(self, request: Request, view: Any) -> Optional[str]:
+        """
+        Key by the client address, honouring `NUM_PROXIES`.
+        """
+        key: str = self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+        return key
@@ -1,4 +1,5 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework import routers
 
 from . import views
@@ -6,8 +7,49 @@ from . import views
 router = routers.DefaultRouter()
 router.register(r"posts", views.PostViewSet)
 router.register(r"comments", views.CommentViewSet)
+router.register(r"search", views.SearchViewSet, basename="search")
 
 
 urlpatterns = [
     path("", include(router.urls)),
+    path(
+        "api/comments-daily-breakdown/",
+        views.CommentsDailyBreakdownView.as_view(),
+        name="comments-daily-breakdown",
+    ),
 ]
+
+# GET on the post list, detail and comment date range is served by async
+# views under ASGI; they hand other methods to the viewset, so they are
+# listed before the router's patterns.
+async_urlpatterns = [
+    re_path(
+        r"^posts/$",
+        views.AsyncPostListView.as_view(
+            fallback=views.PostViewSet.as_view({"get": "list", "post": "create"})
+        ),
+        name="post-list",
+    ),
+    re_path(
+        r"^posts/(?P<slug>[^/.]+)/$",
+        views.AsyncPostDetailView.as_view(
+            fallback=views.PostViewSet.as_view(
+                {
+                    "get": "retrieve",
+                    "put": "update",
+                    "patch": "partial_update",
+                    "delete": "destroy",
+                }
+            )
+        ),
+        name="post-detail",
+    ),
+    re_path(
+        r"^posts/(?P<slug>[^/.]+)/comments-range/(?P<date_from>\d{4}-\d{2}-\d{2})/(?P<date_to>\d{4}-\d{2}-\d{2})/$",
+        views.AsyncCommentsInDateRangeView.as_view(),
+        name="post-comments-in-date-range",
+    ),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
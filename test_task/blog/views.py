@@ -1,56 +1,228 @@
-from typing import Any, Optional
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
-from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet, Sum
+from django.http import HttpRequest, HttpResponseBase, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.utils.dateparse import parse_date
-from rest_framework import status, viewsets
+from django.utils.text import compress_sequence
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import (
+    AuthenticationFailed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+from rest_framework.pagination import _positive_int
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework.views import APIView, exception_handler
 
-from .models import Comment, Post
+from account.authentication import full_user
+
+from . import cache, export, search
+from .models import Comment, CommentDailyStats, Post
+from .pagination import (
+    ActivityKeysetPagination,
+    KeysetPagination,
+    ResultsSetPagination,
+    SearchPagination,
+)
 from .permissions import IsAdminOrMyNoteOrReadOnly
-from .serializers import CommentSerializer, PostSerializer
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CommentBulkItemSerializer,
+    CommentListSerializer,
+    CommentSerializer,
+    PostListSerializer,
+    PostSerializer,
+    build_comment_thread,
+)
+from .throttling import CommentIPThrottle, CommentPostThrottle, CommentUserThrottle
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
 
 
-class ResultsSetPagination(PageNumberPagination):
-    """Custom pagination class to control the pagination of results."""
+def order_posts(
+    queryset: QuerySet, request: Request, paginator: ResultsSetPagination
+) -> QuerySet:
+    """
+    Order posts as the `ordering` query parameter asks, newest first by default.
+
+    `ordering=activity` sorts by the last comment, or the creation for posts
+    without comments, which `post_activity_idx` serves without a sort.
+    """
+    if request.query_params.get("ordering") != "activity":
+        return queryset
+    paginator.keyset_class = ActivityKeysetPagination
+    return queryset.alias(activity=Post.ACTIVITY).order_by("-activity", "-pk")
 
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 1000
 
+class ValuesListMixin(mixins.ListModelMixin):
+    """
+    List action serving `.values()` rows through a `ValuesSerializerMixin`.
 
-class PostViewSet(viewsets.ModelViewSet):
+    Other actions keep `serializer_class`.
+    """
+
+    list_serializer_class: Any
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        List rows with the trimmed fields of `list_serializer_class`.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(self.list_serializer_class.values(queryset))
+        return self.get_paginated_response(self.list_serializer_class.represent(page))
+
+    def get_serializer_class(self) -> Type[BaseSerializer]:
+        """
+        Describe list pages with the list serializer.
+        """
+        serializer_class: Type[BaseSerializer] = (
+            self.list_serializer_class
+            if self.action == "list"
+            else self.serializer_class
+        )
+        return serializer_class
+
+
+class PostViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing posts.
 
     Admin users can update or delete any post.
     Regular users can update or delete only their own posts.
+    Under ASGI, GET requests on the list, detail and comment date range are
+    served by `AsyncPostListView`, `AsyncPostDetailView` and
+    `AsyncCommentsInDateRangeView` instead.
     """
 
     queryset = Post.published.all()
     serializer_class = PostSerializer
+    list_serializer_class = PostListSerializer
     pagination_class = ResultsSetPagination
     permission_classes = [IsAdminOrMyNoteOrReadOnly]
     lookup_field = "slug"
+    thread_depth = 5
+    max_thread_depth = 50
+    thread_breadth = 20
+    max_thread_breadth = 100
+    export_chunk_size = settings.COMMENT_EXPORT_CHUNK_SIZE
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Order the list as `order_posts` does.
+        """
+        queryset = super().get_queryset()
+        if self.action == "list":
+            return order_posts(queryset, self.request, self.paginator)
+        return queryset
 
     def perform_create(self, serializer: BaseSerializer) -> None:
         """
         Automatically set the author field to the current user when creating a comment.
         """
-        serializer.save(author=self.request.user)
+        serializer.save(author=full_user(self.request.user))
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        List published posts, serving anonymous reads from the response cache.
+        """
+        return cache.cached_response(
+            request,
+            [cache.POST_LIST],
+            lambda: super(PostViewSet, self).list(request, *args, **kwargs),
+        )
 
     def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        """Retrieve a post and its comments."""
+        """
+        Retrieve a post and the first page of its comments.
+
+        Comments are paginated by cursor; `next` links to the following page.
+        Anonymous reads of published posts are served from the response cache.
+        """
+        return cache.cached_response(
+            request,
+            [cache.post_scope(self.kwargs[self.lookup_field])],
+            lambda: self._retrieve(request),
+            store=lambda response: response.data["post"]["status"]
+            == Post.Status.PUBLISHED,
+        )
+
+    def _retrieve(self, request: Request) -> Response:
+        """
+        Build the detail payload of a post from the database.
+        """
         post = get_object_or_404(Post, slug=self.kwargs[self.lookup_field])
-        comments = Comment.objects.filter(post=post)
-        post_serializer = PostSerializer(post)
-        comments_serializer = CommentSerializer(comments, many=True)
+        paginator = KeysetPagination()
+        comments = paginator.paginate_queryset(
+            CommentListSerializer.values(
+                Comment.objects.filter(post=post).visible_to(request.user)
+            ),
+            request,
+            view=self,
+        )
         return Response(
-            {"post": post_serializer.data, "comments": comments_serializer.data},
+            {
+                "post": PostSerializer(post).data,
+                "comments": CommentListSerializer.represent(comments),
+                "next": paginator.get_next_link(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"])
+    def thread(self, request: Request, slug: Optional[str] = None) -> Response:
+        """
+        Retrieve the comments of a post as nested reply threads.
+
+        `root` limits the thread to the replies of one comment, `depth` to the
+        number of reply levels and `breadth` to the replies shown per comment.
+        """
+        post = get_object_or_404(Post, slug=slug)
+        try:
+            depth = _positive_int(
+                request.query_params.get("depth", self.thread_depth),
+                strict=True,
+                cutoff=self.max_thread_depth,
+            )
+            breadth = _positive_int(
+                request.query_params.get("breadth", self.thread_breadth),
+                strict=True,
+                cutoff=self.max_thread_breadth,
+            )
+        except ValueError:
+            return Response(
+                {"error": "depth and breadth must be positive integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        root = None
+        if "root" in request.query_params:
+            root = get_object_or_404(
+                Comment.objects.visible_to(request.user),
+                post=post,
+                pk=request.query_params["root"],
+            )
+        comments = (
+            Comment.objects.filter(post=post)
+            .visible_to(request.user)
+            .thread(root, max_depth=depth)
+        )
+        return Response(
+            {
+                "root": root.pk if root else None,
+                "comments": build_comment_thread(comments, root, breadth),
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -63,8 +235,8 @@ class PostViewSet(viewsets.ModelViewSet):
         self,
         request: Request,
         slug: Optional[str] = None,
-        date_from: Optional[str] = None,
-        date_to: Optional[str] = None,
+        date_from: str = "",
+        date_to: str = "",
     ) -> Response:
         """
         Retrieve comments for a specific post within a specified date range.
@@ -75,42 +247,538 @@ class PostViewSet(viewsets.ModelViewSet):
             )
         post = get_object_or_404(Post, slug=slug)
 
-        date_from = parse_date(date_from)
-        date_to = parse_date(date_to)
+        try:
+            start = parse_date(date_from)
+            end = parse_date(date_to)
+        except ValueError:
+            start = end = None
 
-        if not date_from or not date_to:
+        if not start or not end:
             return Response(
                 {"error": "Invalid date format. Use YYYY-MM-DD."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        comments = Comment.objects.filter(
-            post=post, created__date__gte=date_from, created__date__lte=date_to
+        comments = list(
+            Comment.objects.filter(post=post).approved().created_between(start, end)
         )
-
-        serializer = CommentSerializer(comments, many=True)
-        comments_count = comments.count()
-        amount_block_comment = post.amount_block_comment
         response_data = {
-            "comments": serializer.data,
-            "comments_create": comments_count,
-            "block_comment": amount_block_comment,
+            "comments": CommentSerializer(comments, many=True).data,
+            "comments_create": len(comments),
+            "block_comment": post.amount_block_comment,
         }
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["get"], url_path="comments-export")
+    def comments_export(
+        self, request: Request, slug: Optional[str] = None
+    ) -> HttpResponseBase:
+        """
+        Stream the comments of a post between `date_from` and `date_to`, for staff.
 
-class CommentViewSet(viewsets.ModelViewSet):
+        `type` selects `ndjson` (the default) or `csv`. Rows are read and
+        written one chunk at a time, so memory does not grow with the range,
+        and are gzipped on the fly for clients accepting it.
+        """
+        if not request.user.is_staff:
+            raise PermissionDenied(
+                "Unfortunately you dont have permission to perform this action."
+            )
+        post = get_object_or_404(Post, slug=slug)
+        try:
+            date_from = parse_date(request.query_params.get("date_from", ""))
+            date_to = parse_date(request.query_params.get("date_to", ""))
+        except ValueError:
+            date_from = date_to = None
+        if not date_from or not date_to:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        kind = request.query_params.get("type", "ndjson")
+        if kind not in export.WRITERS:
+            return Response(
+                {"error": f"type must be one of: {', '.join(export.WRITERS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        comments = (
+            Comment.objects.filter(post=post)
+            .approved()
+            .created_between(date_from, date_to)
+        )
+        content = export.WRITERS[kind](
+            export.iter_comment_chunks(comments, self.export_chunk_size)
+        )
+        response = StreamingHttpResponse(
+            content, content_type=export.CONTENT_TYPES[kind]
+        )
+        if ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            response.streaming_content = compress_sequence(content)
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        response["Content-Disposition"] = (
+            f'attachment; filename="{post.slug}-comments-{date_from}-{date_to}.{kind}"'
+        )
+        return response
+
+
+class CommentViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for managing comments."""
 
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    list_serializer_class = CommentListSerializer
     pagination_class = ResultsSetPagination
     permission_classes = [IsAdminOrMyNoteOrReadOnly]
     lookup_field = "slug"
+    bulk_max_size = settings.COMMENT_BULK_MAX_SIZE
+    throttle_classes = [CommentUserThrottle, CommentIPThrottle, CommentPostThrottle]
+    throttled_actions = {"create", "bulk"}
+
+    def get_throttles(self) -> List[BaseThrottle]:
+        """
+        Throttle only the actions creating comments.
+        """
+        if self.action not in self.throttled_actions:
+            return []
+        throttles: List[BaseThrottle] = super().get_throttles()
+        return throttles
+
+    def check_throttles(self, request: Request) -> None:
+        """
+        Stop at the first throttle refusing the request.
+
+        A refused request then takes no tokens from the buckets checked
+        after, so a throttled user cannot use up the shared bucket of a post.
+        """
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Show other users' comments only once they are approved.
+        """
+        return Comment.objects.visible_to(self.request.user)
 
     def perform_create(self, serializer: BaseSerializer) -> None:
         """
         Automatically set the author field to the current user when creating a comment.
         """
-        serializer.save(author=self.request.user)
+        serializer.save(author=full_user(self.request.user))
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request: Request) -> Response:
+        """
+        Create up to `bulk_max_size` comments in one request.
+
+        Items are validated without queries, their posts and parents are
+        loaded in one query each, and the batch is screened and inserted by
+        `Comment.objects.create_many`. The response reports every item as
+        created, rejected for profanity, or invalid.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Expected a non-empty list of comments."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_size:
+            return Response(
+                {"error": f"At most {self.bulk_max_size} comments per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results: List[Dict[str, Any]] = [{} for _ in items]
+        valid = []
+        for index, item in enumerate(items):
+            serializer = CommentBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"status": "invalid", "errors": serializer.errors}
+
+        posts = Post.objects.in_bulk({data["post"] for _, data in valid})
+        parents = Comment.objects.only("id", "post_id", "path").in_bulk(
+            {data["parent"] for _, data in valid if data.get("parent")}
+        )
+        author = full_user(request.user)
+        pending = []
+        for index, data in valid:
+            post = posts.get(data["post"])
+            parent = parents.get(data.get("parent") or 0)
+            if post is None:
+                results[index] = {
+                    "status": "invalid",
+                    "errors": {"post": ["Post not found."]},
+                }
+            elif data.get("parent") and (parent is None or parent.post_id != post.pk):
+                results[index] = {
+                    "status": "invalid",
+                    "errors": {"parent": ["Parent comment not found on this post."]},
+                }
+            else:
+                comment = Comment(
+                    post=post, parent=parent, body=data["body"], author=author
+                )
+                pending.append((index, comment))
+
+        created, _ = Comment.objects.create_many([comment for _, comment in pending])
+        created_ids = {id(comment) for comment in created}
+        for index, comment in pending:
+            if id(comment) in created_ids:
+                results[index] = {"status": "created", "id": comment.pk}
+            else:
+                results[index] = {
+                    "status": "rejected",
+                    "errors": {
+                        "body": ["You cannot use swearing words in the title or body."]
+                    },
+                }
+
+        return Response(
+            {
+                "created": len(created),
+                "rejected": len(items) - len(created),
+                "results": [
+                    {"index": index, **result} for index, result in enumerate(results)
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Full-text search over published posts or comments.
+    """
+
+    permission_classes = [IsAdminOrMyNoteOrReadOnly]
+    searches: Dict[
+        str,
+        Tuple[Callable[..., List[search.Hit]], Any, Callable[[Any], QuerySet]],
+    ] = {
+        "posts": (
+            lambda query, limit, offset, user: search.search_posts(
+                query, limit, offset
+            ),
+            PostListSerializer,
+            lambda user: Post.published.all(),
+        ),
+        "comments": (
+            lambda query, limit, offset, user: search.search_comments(
+                query,
+                limit,
+                offset,
+                include_hidden=user.is_staff,
+                author_id=user.pk if user.is_authenticated else None,
+            ),
+            CommentListSerializer,
+            Comment.objects.visible_to,
+        ),
+    }
+
+    def list(self, request: Request) -> Response:
+        """
+        Return the matches of `q`, best first, with highlighted fragments.
+
+        `type` selects `posts` (the default) or `comments`. Every result has
+        the fields of the list endpoint plus its `rank` and `highlights`,
+        HTML-escaped fragments with the matched words in `<mark>` tags.
+        """
+        query = request.query_params.get("q", "").strip()
+        kind = request.query_params.get("type", "posts")
+        if not query:
+            return Response(
+                {"error": "A search query `q` is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if kind not in self.searches:
+            return Response(
+                {"error": f"type must be one of: {', '.join(self.searches)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        run, serializer, readable = self.searches[kind]
+        queryset = readable(request.user)
+        paginator = SearchPagination()
+        # Matches are limited to readable rows in SQL, so pages are full.
+        hits = paginator.paginate_rows(
+            lambda limit, offset: run(query, limit, offset, request.user), request
+        )
+        rows = {
+            row["id"]: row
+            for row in serializer.represent(
+                list(
+                    serializer.values(queryset.filter(pk__in=[hit.id for hit in hits]))
+                )
+            )
+        }
+        return paginator.get_paginated_response(
+            [
+                {**rows[hit.id], "rank": hit.rank, "highlights": hit.highlights}
+                for hit in hits
+                if hit.id in rows
+            ]
+        )
+
+
+class CommentsDailyBreakdownView(APIView):
+    """
+    Daily breakdown of created and blocked comments within a date range.
+
+    Answered from the `CommentDailyStats` rollup, never by scanning comments.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request: Request) -> Response:
+        """
+        Return per-day counts between `date_from` and `date_to` inclusive.
+
+        An optional `post` query parameter limits the breakdown to one post slug.
+        """
+        try:
+            date_from = parse_date(request.query_params.get("date_from", ""))
+            date_to = parse_date(request.query_params.get("date_to", ""))
+        except ValueError:
+            date_from = date_to = None
+
+        if not date_from or not date_to:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if date_from > date_to:
+            return Response(
+                {"error": "date_from must not be after date_to."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stats = CommentDailyStats.objects.filter(day__gte=date_from, day__lte=date_to)
+        slug = request.query_params.get("post")
+        if slug:
+            stats = stats.filter(post__slug=slug)
+
+        days = list(
+            stats.values("day")
+            .annotate(created=Sum("created_count"), blocked=Sum("blocked_count"))
+            .order_by("day")
+        )
+        return Response(
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "created": sum(day["created"] for day in days),
+                "blocked": sum(day["blocked"] for day in days),
+                "days": days,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class AsyncReadView(View):
+    """
+    Base class for async API views serving GET requests with the async ORM.
+
+    They are routed only when `ASYNC_READ_VIEWS` is on, as it is for the
+    ASGI application; under WSGI each request would run in its own event
+    loop, and the synchronous viewset is faster.
+
+    The request is wrapped in a DRF `Request`, authenticated and checked
+    against `IsAdminOrMyNoteOrReadOnly` as the viewset action `action`, and
+    errors are turned into the same responses as in DRF views. Other methods
+    are passed to `fallback`, the synchronous DRF view sharing the URL.
+    """
+
+    action = ""
+    fallback: Optional[Callable[..., HttpResponseBase]] = None
+    permission_classes = [IsAdminOrMyNoteOrReadOnly]
+
+    @classmethod
+    def as_view(cls, **initkwargs: Any) -> Callable[..., Any]:
+        """
+        Return the view function, exempt from CSRF checks like DRF views.
+        """
+        view: Callable[..., Any] = csrf_exempt(super().as_view(**initkwargs))
+        return view
+
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+        """
+        Serve GET and HEAD here and pass other methods to the fallback view.
+        """
+        if request.method not in ("GET", "HEAD") and self.fallback is not None:
+            return sync_to_async(self.fallback)(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        """
+        Authenticate, check permissions and build the response with `read`.
+        """
+        drf_request = Request(
+            request,
+            authenticators=[
+                auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ],
+        )
+        try:
+            # Looking the user up may query the database.
+            await sync_to_async(self.initial)(drf_request)
+            response = await self.read(drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(drf_request, exc)
+
+        response.accepted_renderer = ORJSONRenderer()
+        response.accepted_media_type = ORJSONRenderer.media_type
+        response.renderer_context = {
+            "view": self,
+            "request": drf_request,
+            "response": response,
+        }
+        return response
+
+    async def read(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Build the response of a GET request.
+        """
+        raise NotImplementedError
+
+    def initial(self, request: Request) -> None:
+        """
+        Authenticate the request and raise if it is not permitted.
+
+        Mirrors `APIView.perform_authentication` and `check_permissions`.
+        """
+        request.user
+        for permission_class in self.permission_classes:
+            if not permission_class().has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+
+    def handle_exception(self, request: Request, exc: Exception) -> Response:
+        """
+        Turn an exception into an error response, as `APIView.handle_exception`.
+        """
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            if request.authenticators:
+                exc.auth_header = request.authenticators[0].authenticate_header(request)
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        response = exception_handler(exc, {"view": self, "request": request})
+        if response is None:
+            raise exc
+        return response
+
+
+class AsyncPostListView(AsyncReadView):
+    """
+    Published posts, paginated like `PostViewSet`.
+    """
+
+    action = "list"
+
+    async def read(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        List published posts, serving anonymous reads from the response cache.
+
+        Ordered as `order_posts` does.
+        """
+
+        async def build() -> Response:
+            paginator = ResultsSetPagination()
+            queryset = order_posts(Post.published.all(), request, paginator)
+            posts = await paginator.apaginate_queryset(
+                PostListSerializer.values(queryset), request
+            )
+            return paginator.get_paginated_response(PostListSerializer.represent(posts))
+
+        return await cache.acached_response(request, [cache.POST_LIST], build)
+
+
+class AsyncPostDetailView(AsyncReadView):
+    """
+    A post with the first page of its comments.
+    """
+
+    action = "retrieve"
+
+    async def read(self, request: Request, slug: str) -> Response:
+        """
+        Retrieve a post and the first page of its comments.
+
+        Comments are paginated by cursor; `next` links to the following page.
+        Anonymous reads of published posts are served from the response cache.
+        """
+
+        async def build() -> Response:
+            post = await aget_object_or_404(Post, slug=slug)
+            paginator = KeysetPagination()
+            comments = await paginator.apaginate_queryset(
+                CommentListSerializer.values(
+                    Comment.objects.filter(post=post).visible_to(request.user)
+                ),
+                request,
+            )
+            return Response(
+                {
+                    "post": PostSerializer(post).data,
+                    "comments": CommentListSerializer.represent(comments),
+                    "next": paginator.get_next_link(),
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        return await cache.acached_response(
+            request,
+            [cache.post_scope(slug)],
+            build,
+            store=lambda response: response.data["post"]["status"]
+            == Post.Status.PUBLISHED,
+        )
+
+
+class AsyncCommentsInDateRangeView(AsyncReadView):
+    """
+    Comments of a post within a date range, for staff users.
+    """
+
+    action = "comments_in_date_range"
+
+    async def read(
+        self, request: Request, slug: str, date_from: str, date_to: str
+    ) -> Response:
+        """
+        Retrieve comments for a specific post within a specified date range.
+        """
+        if not request.user.is_staff:
+            raise PermissionDenied(
+                "Unfortunately you dont have permission to perform this action."
+            )
+        post = await aget_object_or_404(Post, slug=slug)
+
+        try:
+            start = parse_date(date_from)
+            end = parse_date(date_to)
+        except ValueError:
+            start = end = None
+
+        if not start or not end:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        comments = (
+            Comment.objects.filter(post=post).approved().created_between(start, end)
+        )
+        rows = [comment async for comment in comments]
+        response_data = {
+            "comments": CommentSerializer(rows, many=True).data,
+            "comments_create": len(rows),
+            "block_comment": post.amount_block_comment,
+        }
+
+        return Response(response_data, status=status.HTTP_200_OK)
@@ -0,0 +1,50 @@
+"""
+Gunicorn settings for serving the project, read from the environment.
+
+Run with `gunicorn -c gunicorn.conf.py`. The default gthread workers serve
+the WSGI application; setting GUNICORN_WORKER_CLASS to
+`uvicorn.workers.UvicornWorker` serves the ASGI application instead.
+"""
+
+import multiprocessing
+import os
+from typing import Any
+
+import environ
+
+env = environ.Env()
+
+bind = env("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = env.int("WEB_CONCURRENCY", default=multiprocessing.cpu_count() * 2 + 1)
+worker_class = env("GUNICORN_WORKER_CLASS", default="gthread")
+threads = env.int("GUNICORN_THREADS", default=4)
+wsgi_app = env(
+    "GUNICORN_APP",
+    default=(
+        "test_task.asgi:application"
+        if worker_class.startswith("uvicorn")
+        else "test_task.wsgi:application"
+    ),
+)
+
+# Keep idle client connections open behind a load balancer, and recycle
+# workers after a number of requests, with jitter so they do not all restart
+# at once, to bound memory growth.
+keepalive = env.int("GUNICORN_KEEPALIVE", default=5)
+max_requests = env.int("GUNICORN_MAX_REQUESTS", default=10_000)
+max_requests_jitter = env.int("GUNICORN_MAX_REQUESTS_JITTER", default=1000)
+timeout = env.int("GUNICORN_TIMEOUT", default=30)
+graceful_timeout = env.int("GUNICORN_GRACEFUL_TIMEOUT", default=30)
+
+accesslog = env("GUNICORN_ACCESS_LOG", default="-")
+errorlog = "-"
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    """
+    Drop the metrics of a dead worker when metrics are shared between workers.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)  # type: ignore[no-untyped-call]
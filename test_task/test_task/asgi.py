@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_task.settings")
+os.environ.setdefault("ASYNC_READ_VIEWS", "True")
 
 application = get_asgi_application()
@@ -49,7 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "blog.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -83,16 +85,87 @@ WSGI_APPLICATION = "test_task.wsgi.application"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+    "default": env.db_url(
+        "DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+    )
+}
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    # Web and Celery processes connect through PgBouncer, which pools server
+    # connections. PgBouncer in transaction mode cannot keep server-side
+    # cursors open between transactions.
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = env.bool(
+        "DB_DISABLE_SERVER_SIDE_CURSORS", default=True
+    )
+    # Nor can it keep the statements psycopg prepares automatically: the next
+    # transaction may run on a server connection that never prepared them.
+    if env.bool("DB_DISABLE_PREPARED_STATEMENTS", default=True):
+        DATABASES["default"]["OPTIONS"] = {
+            **DATABASES["default"].get("OPTIONS", {}),
+            "prepare_threshold": None,
+        }
+    DB_POOL_MAX_SIZE = env.int("DB_POOL_MAX_SIZE", default=0)
+    if DB_POOL_MAX_SIZE:
+        # psycopg's in-process pool replaces persistent connections.
+        DATABASES["default"]["OPTIONS"] = {
+            **DATABASES["default"].get("OPTIONS", {}),
+            "pool": {
+                "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+                "max_size": DB_POOL_MAX_SIZE,
+                "timeout": env.int("DB_POOL_TIMEOUT", default=10),
+            },
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["OPTIONS"] = {
+        # WAL lets readers run next to the single writer, busy_timeout makes a
+        # writer wait for the lock instead of failing with "database is
+        # locked", and IMMEDIATE transactions take the write lock up front so
+        # the wait is not skipped by a deadlocked read-to-write upgrade.
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            f"PRAGMA busy_timeout={env.int('SQLITE_BUSY_TIMEOUT', default=5000)};"
+        ),
+        "transaction_mode": "IMMEDIATE",
     }
+    # A file-backed test database lets concurrency tests use several
+    # connections; the in-memory one allows only one writer table lock.
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+    # Per-process fallback used while the shared cache is unreachable.
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "local",
+    },
 }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+PASSWORD_HASHERS = [
+    "account.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# Cost of new password hashes; None keeps Django's default.
+PASSWORD_PBKDF2_ITERATIONS = env.int("PASSWORD_PBKDF2_ITERATIONS", default=None)
+# Hash signup passwords in place, or in a "thread" or "process" pool.
+PASSWORD_HASHING_POOL = env("PASSWORD_HASHING_POOL", default="none")
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -125,6 +198,16 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# WhiteNoise serves the admin and Swagger assets from the app server, with
+# hashed names cached forever and gzip copies made at collectstatic time.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -136,10 +219,73 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly"
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "account.authentication.ClaimsJWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": [
+        "blog.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "comment_user": env("THROTTLE_COMMENT_USER_RATE", default="30/min"),
+        "comment_ip": env("THROTTLE_COMMENT_IP_RATE", default="120/min"),
+        "comment_post": env("THROTTLE_COMMENT_POST_RATE", default="600/min"),
+        "register_ip": env("THROTTLE_REGISTER_IP_RATE", default="20/hour"),
+    },
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=None),
 }
 
+# Authentication
+
+# Cache holding the token revocation list, which must not evict its keys.
+AUTH_CACHE_ALIAS = env("AUTH_CACHE_ALIAS", default="default")
+AUTH_USER_CACHE_TIMEOUT = env.int("AUTH_USER_CACHE_TIMEOUT", default=60)
+
+# Throttling
+
+THROTTLE_REDIS_URL = env("THROTTLE_REDIS_URL", default="")
+THROTTLE_REDIS_TIMEOUT = env.float("THROTTLE_REDIS_TIMEOUT", default=0.05)
+THROTTLE_REDIS_RETRY_AFTER = env.float("THROTTLE_REDIS_RETRY_AFTER", default=5.0)
+
+# Profanity
+
+PROFANITY_WORDLIST = env("PROFANITY_WORDLIST", default=None)
+PROFANITY_CACHE_SIZE = env.int("PROFANITY_CACHE_SIZE", default=10_000)
+PROFANITY_CACHE_TIMEOUT = env.int("PROFANITY_CACHE_TIMEOUT", default=60 * 60 * 24)
+
+# Response cache
+
+RESPONSE_CACHE_ALIAS = env("RESPONSE_CACHE_ALIAS", default="default")
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", default=60 * 60)
+RESPONSE_CACHE_RETRY_AFTER = env.float("RESPONSE_CACHE_RETRY_AFTER", default=5.0)
+
+# Async views
+
+# Serve GET on the post list, detail and comment date range from async views;
+# test_task.asgi turns it on.
+ASYNC_READ_VIEWS = env.bool("ASYNC_READ_VIEWS", default=False)
+
+# Auto-responses
+
+AUTO_RESPONSE_BATCH_SIZE = env.int("AUTO_RESPONSE_BATCH_SIZE", default=500)
+
+# Metrics
+
+METRICS_SERVER_TIMING = env.bool("METRICS_SERVER_TIMING", default=False)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Comments
+
+COMMENT_BULK_MAX_SIZE = env.int("COMMENT_BULK_MAX_SIZE", default=500)
+COMMENT_EXPORT_CHUNK_SIZE = env.int("COMMENT_EXPORT_CHUNK_SIZE", default=2000)
+
+# Comment moderation
+
+COMMENT_MODERATION_ASYNC = env.bool("COMMENT_MODERATION_ASYNC", default=False)
+COMMENT_MODERATION_BATCH_SIZE = env.int("COMMENT_MODERATION_BATCH_SIZE", default=500)
+COMMENT_MODERATION_DELAY = env.float("COMMENT_MODERATION_DELAY", default=1.0)
+COMMENT_MODERATION_MAX_LAG = env.float("COMMENT_MODERATION_MAX_LAG", default=30.0)
+COMMENT_MODERATION_QUEUE = env("COMMENT_MODERATION_QUEUE", default="moderation")
+
 # JWT
 
 SIMPLE_JWT = {
@@ -168,8 +314,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "account.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "account.serializers.ClaimsTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -184,5 +330,18 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_TASK_ACKS_LATE = True
 CELERY_TASK_RETRY = True
 CELERY_TIMEZONE = "UTC"
+CELERY_BEAT_SCHEDULE = {
+    "send-due-auto-responses": {
+        "task": "blog.tasks.send_due_auto_responses",
+        "schedule": env.float("AUTO_RESPONSE_INTERVAL", default=30.0),
+    },
+    "moderate-comments": {
+        "task": "blog.tasks.moderate_comments",
+        "schedule": COMMENT_MODERATION_MAX_LAG,
+    },
+}
+CELERY_TASK_ROUTES = {
+    "blog.tasks.moderate_comments": {"queue": COMMENT_MODERATION_QUEUE},
+}
 USE_TZ = True
 # CELERY_TASK_ALWAYS_EAGER = True